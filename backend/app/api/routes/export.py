@@ -1,6 +1,6 @@
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import StreamingResponse, PlainTextResponse
-from ....models.query import ExportRequest
+from ...models.query import ExportRequest
 from io import StringIO
 import csv
 
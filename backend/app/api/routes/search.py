@@ -1,8 +1,15 @@
+import json
 from fastapi import APIRouter, HTTPException
-from typing import List
-from ....models.query import SearchQuery, SearchResult, QARequest, QAResponse
-from ....services.search_service import search as search_service
-from ....services.ai_service import answer_question
+from fastapi.responses import StreamingResponse
+from typing import Any, AsyncIterator, Dict, List
+from ...config import settings
+from ...models.query import BatchSearchQuery, ConflictFinding, ConflictRequest, SearchQuery, SearchResult, QARequest, QAResponse
+from ...services.conflict_service import find_conflicts
+from ...services.search_service import search as search_service, search_batch as search_batch_service
+from ...services.ai_service import answer_question
+from ...core.result_cache import global_result_cache
+from ...core.query_embedder import global_query_embedder
+from ...utils.patterns import TOPIC_PATTERNS
 
 router = APIRouter(prefix="", tags=["search"])
 
@@ -11,7 +18,46 @@ async def search(q: SearchQuery):
     results = await search_service(q.query, q.top_k, q.alpha, q.filters)
     return results
 
+@router.post("/search/batch")
+async def search_batch(q: BatchSearchQuery):
+    """
+    Run a list of queries (e.g. a bid-review checklist) in one pass. The response
+    is NDJSON, one {"index", "query", "results"} line per query in the order
+    they finish; index is the query's position in the request.
+    """
+    if len(q.queries) > settings.SEARCH_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {settings.SEARCH_BATCH_MAX_QUERIES} queries per batch")
+    results = search_batch_service(q.queries, q.top_k, q.alpha, q.filters)
+    # Wait for the first result before streaming, so a failed embedding call
+    # is still an error status rather than a truncated 200
+    try:
+        first = [await results.__anext__()]
+    except StopAsyncIteration:
+        first = []
+
+    async def lines() -> AsyncIterator[str]:
+        if not first:
+            return
+        i, res = first[0]
+        yield json.dumps({"index": i, "query": q.queries[i], "results": res}) + "\n"
+        async for i, res in results:
+            yield json.dumps({"index": i, "query": q.queries[i], "results": res}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
 @router.post("/qa", response_model=QAResponse)
 async def qa(req: QARequest):
     resp = await answer_question(req)
     return resp
+
+@router.post("/conflicts", response_model=List[ConflictFinding])
+async def conflicts(req: ConflictRequest):
+    if req.scope not in ("all", "filtered"):
+        raise HTTPException(status_code=400, detail="scope must be 'all' or 'filtered'")
+    if req.topic is not None and req.topic not in TOPIC_PATTERNS:
+        raise HTTPException(status_code=400, detail=f"Unknown topic {req.topic!r}; one of {', '.join(TOPIC_PATTERNS)}")
+    return await find_conflicts(req)
+
+@router.get("/search/stats")
+async def search_stats() -> Dict[str, Any]:
+    return {"result_cache": global_result_cache.stats(), "query_embedder": global_query_embedder.stats()}
@@ -1,30 +1,84 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import os
 import tempfile
-from ....utils.validators import is_allowed_pdf, safe_filename
-from ....services.document_service import store_upload, process_pdf, list_documents, get_page_text
+import uuid
+from ...config import settings
+from ...core import db
+from ...utils.validators import is_allowed_pdf, safe_filename, MAX_FILE_SIZE_MB
+from ...services.document_service import store_upload, list_documents, get_page_text, get_document, delete_document
+from ...services.job_service import create_job, get_job
 
 router = APIRouter(prefix="", tags=["upload"])
 
-@router.post("/upload")
-async def upload_documents(files: List[UploadFile] = File(...)) -> List[Dict[str, Any]]:
-    results = []
+async def _save_to_disk(f: UploadFile) -> str:
+    # Stream in chunks so a large spec book is never held in memory
+    size = 0
+    with tempfile.NamedTemporaryFile(dir=settings.STORAGE_PATH, suffix=".part", delete=False) as tmp:
+        try:
+            while chunk := await f.read(settings.UPLOAD_CHUNK_BYTES):
+                size += len(chunk)
+                if size > MAX_FILE_SIZE_MB * 1024 * 1024:
+                    raise HTTPException(status_code=400, detail=f"Invalid file: {f.filename}")
+                tmp.write(chunk)
+        except BaseException:
+            tmp.close()
+            os.unlink(tmp.name)
+            raise
+    return tmp.name
+
+@router.post("/upload", status_code=202)
+async def upload_documents(files: List[UploadFile] = File(...), replace: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Store each file and queue it for ingestion; poll GET /jobs/{id} for progress.
+    With ?replace={document_id}, the single file is a new revision of that
+    document and only the chunks that changed are re-indexed.
+    """
+    if replace is not None:
+        if len(files) != 1:
+            raise HTTPException(status_code=400, detail="Replace takes exactly one file")
+        try:
+            await db.read(get_document, replace)
+        except FileNotFoundError:
+            raise HTTPException(status_code=404, detail="Document not found")
     for f in files:
-        data = await f.read()
-        if not is_allowed_pdf(f.filename, f.content_type or "application/pdf", len(data)):
+        if not is_allowed_pdf(f.filename, f.content_type or "application/pdf", 0):
             raise HTTPException(status_code=400, detail=f"Invalid file: {f.filename}")
-        with tempfile.NamedTemporaryFile(delete=False) as tmp:
-            tmp.write(data)
-            tmp_path = tmp.name
-        stored_path = store_upload(tmp_path, safe_filename(f.filename))
-        res = await process_pdf(stored_path, safe_filename(f.filename))
-        results.append(res)
-    return results
+    # Spool every file before queueing any, so a rejected file fails the whole request
+    tmp_paths: List[str] = []
+    try:
+        for f in files:
+            tmp_paths.append(await _save_to_disk(f))
+    except BaseException:
+        for path in tmp_paths:
+            os.unlink(path)
+        raise
+    jobs = []
+    for f, tmp_path in zip(files, tmp_paths):
+        name = safe_filename(f.filename)
+        # Unique stored name: queued uploads with the same filename must not overwrite each other
+        stored_path = store_upload(tmp_path, f"{uuid.uuid4().hex}_{name}")
+        jobs.append(await create_job(stored_path, name, replace))
+    return jobs
+
+@router.get("/jobs/{job_id}")
+async def job_status(job_id: str) -> Dict[str, Any]:
+    try:
+        return await get_job(job_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Job not found")
 
 @router.get("/documents")
 async def documents() -> List[Dict[str, Any]]:
-    return list_documents()
+    return await db.read(list_documents)
+
+@router.delete("/documents/{doc_id}")
+async def remove_document(doc_id: str) -> Dict[str, Any]:
+    try:
+        return await delete_document(doc_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Document not found")
 
 @router.get("/documents/{doc_id}/pages/{page_number}")
 async def document_page(doc_id: str, page_number: int) -> Dict[str, Any]:
-    return get_page_text(doc_id, page_number)
+    return await db.read(lambda conn: get_page_text(doc_id, page_number, conn))
@@ -6,9 +6,15 @@ import json
 import sys
 import sqlite3
 from pathlib import Path
+from .utils.patterns import MODAL_VERBS_REGEX
+from .utils.tags import chunk_tags
+from .utils.page_text import compress_text, page_slice, resolve_codec
+
+logger = logging.getLogger(__name__)
 
 class Settings(BaseSettings):
     OPENAI_API_KEY: Optional[str] = None
+    OPENAI_BASE_URL: Optional[str] = None
     PINECONE_API_KEY: Optional[str] = None
     PINECONE_ENV: Optional[str] = None
     PINECONE_INDEX: str = "specscope-mvp"
@@ -21,9 +27,53 @@ class Settings(BaseSettings):
     SQLITE_PATH: str = "./data/specscope.db"
     STORAGE_PATH: str = "./data/storage"
     LOG_LEVEL: str = "INFO"
+    SQLITE_CACHE_MB: int = 64
+    SQLITE_MMAP_MB: int = 256
+    SQLITE_READ_WORKERS: int = 8  # 0 runs reads inline on the event loop
     RATE_LIMIT_RPM: int = 300
+    RATE_LIMIT_TPM: int = 1000000
     LANGCHAIN_TRACING_V2: bool = False
     MAX_PAGES_PER_UPLOAD: int = 3000
+    PDF_PARALLEL_MIN_PAGES: int = 64  # smaller documents are extracted in-thread
+    PDF_PAGES_PER_TASK: int = 100
+    INGEST_QUEUE_PAGES: int = 64  # extracted pages waiting to be chunked and written
+    INGEST_EMBED_BATCH_CHUNKS: int = 256
+    INGEST_QUEUE_BATCHES: int = 4  # chunk batches waiting to be embedded
+    INGEST_WORKERS: int = 2  # documents ingested concurrently by the job queue
+    INGEST_HEARTBEAT_SECONDS: float = 10.0
+    INGEST_STALE_SECONDS: float = 60.0  # running jobs without a heartbeat this long are requeued
+    UPLOAD_CHUNK_BYTES: int = 1048576
+    VECTOR_BACKEND: str = "memory"  # memory | mmap | ivf | hnsw
+    VECTOR_SEGMENT_ROWS: int = 262144
+    VECTOR_SCAN_BLOCK_ROWS: int = 65536
+    IVF_NLIST: int = 1024
+    IVF_NPROBE: int = 16
+    HNSW_M: int = 16
+    HNSW_EF_CONSTRUCTION: int = 100
+    HNSW_EF_SEARCH: int = 64
+    VECTOR_CODEC: str = "f32"  # f32 | sq8 | pq, in-memory storage for the memory backend
+    VECTOR_PQ_M: int = 0  # PQ subquantizers; 0 means dim // 8
+    VECTOR_RERANK_FACTOR: int = 4
+    VECTOR_PERSIST_CODEC: str = "f32"  # f32 | sq8, chunk_vectors blob format
+    EMBEDDING_BATCH_TOKENS: int = 32000
+    EMBEDDING_BATCH_MAX_INPUTS: int = 2048
+    QUERY_EMBED_WINDOW_MS: float = 5.0
+    QUERY_EMBED_MAX_BATCH: int = 64
+    QUERY_EMBED_CACHE_SIZE: int = 4096
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 0  # 0 = unbounded, otherwise LRU-evicted
+    SEARCH_CACHE_SIZE: int = 1024  # cached search results; 0 disables the cache
+    SEARCH_CACHE_TTL_SECONDS: float = 300.0
+    SEARCH_BATCH_MAX_QUERIES: int = 256  # queries accepted by one /search/batch request
+    CONFLICT_MIN_SIMILARITY: float = 0.6  # how alike two claims' wording must be to compare their values
+    CONFLICT_MAX_CITATIONS: int = 10  # per side of a finding
+    CONFLICT_MAX_FINDINGS: int = 200
+    FTS_DETAIL: str = "full"  # full | column | none; column/none shrink the index but lose phrases, and bm25 re-tokenizes matches
+    FTS_PREFIX: str = ""  # prefix index lengths, e.g. "2 3", for fast term* queries
+    FTS_MERGE_PAGES: int = 256  # index pages merged per background step after ingest
+    FTS_MAINTENANCE_IDLE_SECONDS: float = 30.0  # quiet time after the last ingest before merging
+    FTS_OPTIMIZE_CHUNKS: int = 50000  # chunks written since the last full optimize that trigger another
+    PAGE_CODEC: str = "auto"  # auto | zstd | zlib | none; auto is zstd when zstandard is installed
 
     @validator("ALLOWED_ORIGINS")
     def parse_origins(cls, v: str) -> str:
@@ -39,13 +89,25 @@ settings = Settings()
 Path(settings.STORAGE_PATH).mkdir(parents=True, exist_ok=True)
 Path(os.path.dirname(settings.SQLITE_PATH)).mkdir(parents=True, exist_ok=True)
 
-def get_sqlite_conn() -> sqlite3.Connection:
-    conn = sqlite3.connect(settings.SQLITE_PATH, check_same_thread=False)
+def get_sqlite_conn(path: Optional[str] = None) -> sqlite3.Connection:
+    conn = sqlite3.connect(path or settings.SQLITE_PATH, check_same_thread=False)
     conn.row_factory = sqlite3.Row
     # Enable FTS5, foreign keys
     conn.execute("PRAGMA foreign_keys = ON;")
+    # WAL lets readers run alongside the writer; NORMAL sync is durable across app
+    # crashes in WAL mode and only fsyncs at checkpoints
+    conn.execute("PRAGMA journal_mode = WAL;")
+    conn.execute("PRAGMA synchronous = NORMAL;")
+    conn.execute(f"PRAGMA cache_size = -{settings.SQLITE_CACHE_MB * 1024};")
+    conn.execute(f"PRAGMA mmap_size = {settings.SQLITE_MMAP_MB * 1024 * 1024};")
+    conn.execute("PRAGMA temp_store = MEMORY;")
+    register_functions(conn)
     return conn
 
+def register_functions(conn: sqlite3.Connection) -> None:
+    # Chunk text is sliced out of its compressed page (see chunks_text)
+    conn.create_function("page_slice", 4, page_slice, deterministic=True)
+
 def init_sqlite_schema(conn: sqlite3.Connection) -> None:
     # documents, pages, chunks, FTS5 on chunks
     conn.executescript(
@@ -60,7 +122,8 @@ def init_sqlite_schema(conn: sqlite3.Connection) -> None:
         CREATE TABLE IF NOT EXISTS pages (
             document_id TEXT NOT NULL,
             page_number INTEGER NOT NULL,
-            text TEXT NOT NULL,
+            content BLOB NOT NULL,
+            codec TEXT NOT NULL DEFAULT '',
             width REAL,
             height REAL,
             PRIMARY KEY (document_id, page_number),
@@ -72,29 +135,137 @@ def init_sqlite_schema(conn: sqlite3.Connection) -> None:
             filename TEXT NOT NULL,
             page_number INTEGER NOT NULL,
             section TEXT,
-            text TEXT NOT NULL,
             char_start INTEGER NOT NULL,
             char_end INTEGER NOT NULL,
             hash TEXT NOT NULL,
             created_at TEXT NOT NULL,
+            has_modal INTEGER,
+            tags INTEGER NOT NULL DEFAULT 0,
             FOREIGN KEY(document_id) REFERENCES documents(id) ON DELETE CASCADE
         );
-        CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(
-            text,
-            content='chunks',
-            content_rowid='rowid',
-            tokenize = 'porter'
-        );
         CREATE TABLE IF NOT EXISTS chunk_vectors (
             chunk_id TEXT PRIMARY KEY,
             dim INTEGER NOT NULL,
+            codec TEXT NOT NULL DEFAULT 'f32',
             vector BLOB NOT NULL,
             FOREIGN KEY(chunk_id) REFERENCES chunks(id) ON DELETE CASCADE
         );
+        CREATE TABLE IF NOT EXISTS embedding_cache (
+            model TEXT NOT NULL,
+            text_hash TEXT NOT NULL,
+            dim INTEGER NOT NULL,
+            vector BLOB NOT NULL,
+            last_used INTEGER NOT NULL,
+            PRIMARY KEY (model, text_hash)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used ON embedding_cache(last_used);
+        CREATE TABLE IF NOT EXISTS ingest_jobs (
+            id TEXT PRIMARY KEY,
+            filename TEXT NOT NULL,
+            path TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued',
+            document_id TEXT,
+            pages_extracted INTEGER NOT NULL DEFAULT 0,
+            chunks_indexed INTEGER NOT NULL DEFAULT 0,
+            vectors_embedded INTEGER NOT NULL DEFAULT 0,
+            error TEXT,
+            owner TEXT,
+            heartbeat_at TEXT,
+            replace_document_id TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_ingest_jobs_status ON ingest_jobs(status, created_at);
         """
     )
+    # Columns added after the first release; CREATE TABLE IF NOT EXISTS won't add them
+    ensure_column(conn, "chunk_vectors", "codec", "TEXT NOT NULL DEFAULT 'f32'")
+    ensure_column(conn, "ingest_jobs", "owner", "TEXT")
+    ensure_column(conn, "ingest_jobs", "heartbeat_at", "TEXT")
+    ensure_column(conn, "ingest_jobs", "replace_document_id", "TEXT")
+    if ensure_column(conn, "chunks", "has_modal", "INTEGER"):
+        # Chunks ingested before the flag existed, which still have their text column
+        conn.create_function("has_modal", 1, lambda text: int(bool(MODAL_VERBS_REGEX.search(text or ""))), deterministic=True)
+        conn.execute("UPDATE chunks SET has_modal = has_modal(text)")
+    tags_added = ensure_column(conn, "chunks", "tags", "INTEGER NOT NULL DEFAULT 0")
+    # Tag filters scan this narrow index (rowid, tags) rather than the chunk rows
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_tags ON chunks(tags)")
+    migrate_text_storage(conn)
+    # Chunk text, sliced from the page it came from; chunks_fts indexes this view
+    conn.execute(
+        """
+        CREATE VIEW IF NOT EXISTS chunks_text AS
+        SELECT c.rowid AS chunk_rowid, page_slice(p.content, p.codec, c.char_start, c.char_end) AS text
+        FROM chunks c JOIN pages p ON p.document_id = c.document_id AND p.page_number = c.page_number
+        """
+    )
+    if tags_added:
+        # Chunks ingested before tagging, tagged from their page text
+        conn.create_function("chunk_tags", 2, chunk_tags, deterministic=True)
+        conn.execute("UPDATE chunks SET tags = (SELECT chunk_tags(t.text, chunks.section) FROM chunks_text t WHERE t.chunk_rowid = chunks.rowid)")
+    ensure_fts_table(conn)
     conn.commit()
 
+def migrate_text_storage(conn: sqlite3.Connection) -> None:
+    """
+    Databases from before page compression stored page text in pages.text and
+    each chunk's text again in chunks.text. Compress the pages into content and
+    drop both text columns (and the FTS triggers that read chunks.text; they are
+    recreated by init_indices). The file only shrinks after a VACUUM.
+    """
+    migrated = False
+    if "text" in table_columns(conn, "pages"):
+        codec = resolve_codec(settings.PAGE_CODEC)
+        ensure_column(conn, "pages", "content", "BLOB")
+        ensure_column(conn, "pages", "codec", "TEXT NOT NULL DEFAULT ''")
+        conn.create_function("compress_text", 1, lambda text: compress_text(text, codec))
+        conn.execute("UPDATE pages SET content = compress_text(text), codec = ?", (codec,))
+        conn.execute("ALTER TABLE pages DROP COLUMN text")
+        migrated = True
+    if "text" in table_columns(conn, "chunks"):
+        for trigger in ("chunks_ai", "chunks_ad", "chunks_au"):
+            conn.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        conn.execute("ALTER TABLE chunks DROP COLUMN text")
+        migrated = True
+    if migrated:
+        logger.info("Moved chunk text into compressed pages; VACUUM the database to reclaim the space")
+
+def fts_table_args() -> str:
+    options = ["text", "content='chunks_text'", "content_rowid='chunk_rowid'", "tokenize='porter'"]
+    if settings.FTS_DETAIL != "full":
+        options.append(f"detail={settings.FTS_DETAIL}")
+    if settings.FTS_PREFIX.strip():
+        options.append(f"prefix='{' '.join(settings.FTS_PREFIX.split())}'")
+    return "fts5(" + ", ".join(options) + ")"
+
+def ensure_fts_table(conn: sqlite3.Connection) -> bool:
+    """
+    Create chunks_fts with the configured detail/prefix options, recreating and
+    rebuilding it from chunks_text when they changed. Returns True if (re)built.
+    """
+    args = fts_table_args()
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'chunks_fts'").fetchone()
+    if row is not None:
+        current = row[0][row[0].index("USING") + len("USING"):]
+        if "".join(current.split()).lower() == "".join(args.split()).lower():
+            return False
+        logger.info(f"Rebuilding chunks_fts as {args}")
+        conn.execute("DROP TABLE chunks_fts")
+    conn.execute(f"CREATE VIRTUAL TABLE chunks_fts USING {args}")
+    if row is not None:
+        conn.execute("INSERT INTO chunks_fts(chunks_fts) VALUES('rebuild')")
+    return True
+
+def table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [r[1] for r in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+
+def ensure_column(conn: sqlite3.Connection, table: str, column: str, decl: str) -> bool:
+    """Add a column to an existing table if it is missing. Returns True if added."""
+    if column in table_columns(conn, table):
+        return False
+    conn.execute(f"ALTER TABLE {table} ADD COLUMN {column} {decl}")
+    return True
+
 # JSON logging setup
 class JsonFormatter(logging.Formatter):
     def format(self, record: logging.LogRecord) -> str:
@@ -0,0 +1,555 @@
+import heapq
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+import logging
+import numpy as np
+from .embeddings import BaseVectorIndex, VectorIndex, normalize_rows
+from .quantization import get_codec
+
+logger = logging.getLogger(__name__)
+
+def spherical_kmeans(data: np.ndarray, k: int, iters: int = 10, seed: int = 0, block_rows: int = 65_536) -> np.ndarray:
+    """
+    k-means on unit vectors (cosine). Returns (k, dim) normalized centroids.
+    """
+    rng = np.random.default_rng(seed)
+    k = min(k, len(data))
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    for _ in range(iters):
+        assign = assign_to_centroids(data, centroids, block_rows)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        counts = np.bincount(assign, minlength=k)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters from random points
+            sums[empty] = data[rng.choice(len(data), size=int(empty.sum()), replace=False)]
+        centroids = normalize_rows(sums)
+    return centroids
+
+def assign_to_centroids(data: np.ndarray, centroids: np.ndarray, block_rows: int = 65_536) -> np.ndarray:
+    assign = np.empty(len(data), dtype=np.int32)
+    for start in range(0, len(data), block_rows):
+        stop = start + block_rows
+        assign[start:stop] = np.argmax(data[start:stop] @ centroids.T, axis=1)
+    return assign
+
+class IVFFlatIndex(VectorIndex):
+    """
+    Inverted-file index over the flat matrix. Rows are bucketed by their nearest
+    k-means centroid and a query scans only the nprobe closest buckets. Once
+    enough rows have been written (and again whenever the index has grown by
+    retrain_growth), k-means runs on a background thread and the new centroids
+    and list assignments are swapped in together; until the first training
+    finishes, queries fall back to brute force. With auto_train=False the
+    caller trains explicitly.
+    """
+    # Approximate search: each query walks its own candidates
+    query_batch = BaseVectorIndex.query_batch
+    upsert_in_thread = True
+
+    def __init__(self, nlist: int = 1024, nprobe: int = 16, train_min_rows: Optional[int] = None,
+                 train_sample_rows: Optional[int] = None, retrain_growth: float = 4.0, auto_train: bool = True, **kwargs):
+        super().__init__(**kwargs)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        # k-means needs a few dozen points per centroid to be meaningful
+        self.train_min_rows = train_min_rows or nlist * 39
+        self.train_sample_rows = train_sample_rows or nlist * 256
+        self.retrain_growth = retrain_growth
+        self.auto_train = auto_train
+        self._centroids: Optional[np.ndarray] = None
+        self._trained_rows = 0
+        self._assign = np.empty(0, dtype=np.int32)
+        self._list_order: Optional[np.ndarray] = None
+        self._list_offsets: Optional[np.ndarray] = None
+        # Guards the index against the training thread; k-means itself runs unlocked
+        self._lock = threading.RLock()
+        self._trainer: Optional[threading.Thread] = None
+        # Rows written while a training run is in flight, reassigned when it lands
+        self._dirty: Optional[List[np.ndarray]] = None
+        # Bumped by compaction, which moves rows under a training run's feet
+        self._generation = 0
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids is not None
+
+    def _needs_training(self) -> bool:
+        n_live = len(self._rows)
+        if not self.is_trained:
+            return n_live >= self.train_min_rows
+        return n_live >= self._trained_rows * self.retrain_growth
+
+    def train(self) -> None:
+        """Train on the current rows and swap the centroids in, blocking until done."""
+        self.wait_for_training()
+        self._train()
+
+    def wait_for_training(self, timeout: Optional[float] = None) -> bool:
+        """Wait for an in-flight background training run; returns is_trained."""
+        trainer = self._trainer
+        if trainer is not None:
+            trainer.join(timeout)
+        return self.is_trained
+
+    def _schedule_training(self) -> None:
+        if self._trainer is not None and self._trainer.is_alive():
+            return
+        self._trainer = threading.Thread(target=self._train, name="ivf-train", daemon=True)
+        self._trainer.start()
+
+    def _train(self) -> None:
+        with self._lock:
+            live = np.flatnonzero(self._alive[:self._size])
+            if not len(live):
+                return
+            rng = np.random.default_rng(0)
+            sample = live if len(live) <= self.train_sample_rows else rng.choice(live, size=self.train_sample_rows, replace=False)
+            data = self._matrix[np.sort(sample)]
+            matrix, size, generation = self._matrix, self._size, self._generation
+            self._dirty = []
+        try:
+            centroids = spherical_kmeans(data, self.nlist)
+            assign = assign_to_centroids(matrix[:size], centroids)
+        except BaseException:
+            with self._lock:
+                self._dirty = None
+            raise
+        with self._lock:
+            dirty, self._dirty = self._dirty, None
+            if generation != self._generation:
+                logger.info("Discarded IVF training run: rows were compacted meanwhile")
+                return
+            full = np.full(self.capacity, -1, dtype=np.int32)
+            full[:size] = assign
+            if dirty:
+                rows = np.unique(np.concatenate(dirty))
+                full[rows] = assign_to_centroids(self._matrix[rows], centroids)
+            self._assign = full
+            self._centroids = centroids
+            self._trained_rows = len(live)
+            self._list_order = None
+        logger.info(f"Trained IVF index with {len(centroids)} lists on {len(sample)} rows")
+
+    def upsert(self, *args, **kwargs) -> None:
+        with self._lock:
+            super().upsert(*args, **kwargs)
+
+    def delete(self, ids: List[str]) -> int:
+        with self._lock:
+            return super().delete(ids)
+
+    def _rows_written(self, rows: np.ndarray) -> None:
+        if not len(rows):
+            return
+        if self._dirty is not None:
+            self._dirty.append(rows)
+        if self.is_trained:
+            if len(self._assign) < self.capacity:
+                assign = np.full(self.capacity, -1, dtype=np.int32)
+                assign[:len(self._assign)] = self._assign
+                self._assign = assign
+            self._assign[rows] = assign_to_centroids(self._matrix[rows], self._centroids)
+            self._list_order = None
+        if self.auto_train and self._needs_training():
+            self._schedule_training()
+
+    def _rows_compacted(self, keep: np.ndarray) -> None:
+        self._generation += 1
+        if self.is_trained:
+            self._assign[:len(keep)] = self._assign[keep]
+            self._assign[len(keep):] = -1
+            self._list_order = None
+
+    def _ensure_lists(self) -> None:
+        if self._list_order is not None:
+            return
+        assign = self._assign[:self._size]
+        self._list_order = np.argsort(assign, kind="stable")
+        self._list_offsets = np.searchsorted(assign[self._list_order], np.arange(len(self._centroids) + 1))
+
+    def query(self, query_vec: np.ndarray, top_k: int, filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
+        with self._lock:
+            return self._query(query_vec, top_k, filters)
+
+    def _query(self, query_vec: np.ndarray, top_k: int, filters: Optional[Dict[str, Any]]) -> List[Tuple[str, float]]:
+        if top_k <= 0 or not self._rows:
+            return []
+        if not self.is_trained:
+            return super().query(query_vec, top_k, filters)
+        nprobe = min(self.nprobe, len(self._centroids))
+        allowed = self.filter_rows(filters)
+        # A selective filter is cheaper to scan exactly than the probed lists
+        if allowed is not None and len(allowed) <= self._size * nprobe / len(self._centroids):
+            return super().query(query_vec, top_k, filters)
+        self._ensure_lists()
+        q = np.asarray(query_vec, dtype=np.float32).ravel()
+        q = q / (np.linalg.norm(q) + 1e-8)
+        probe = np.argpartition(-(self._centroids @ q), nprobe - 1)[:nprobe]
+        rows = np.concatenate([self._list_order[self._list_offsets[c]:self._list_offsets[c + 1]] for c in probe])
+        if allowed is not None:
+            keep = np.zeros(self._size, dtype=bool)
+            keep[allowed] = True
+            rows = rows[keep[rows]]
+        elif self._tombstones:
+            rows = rows[self._alive[rows]]
+        hits = self._top_k(self._matrix[rows] @ q, top_k, rows)
+        if allowed is not None and len(hits) < min(top_k, len(allowed)):
+            # The probed lists held too few matches; keep the full top_k promise
+            return super().query(query_vec, top_k, filters)
+        return hits
+
+class HNSWIndex(VectorIndex):
+    """
+    Hierarchical navigable small-world graph over the flat matrix. Graph
+    construction is pure Python, so inserts are far slower than the other
+    backends: upsert stores the vectors, then links new rows (and rows whose
+    vector changed) one at a time, taking the lock per row so queries interleave
+    with a large batch. Deleted rows stay in the graph as waypoints, and edges
+    into a re-linked row still reflect its old vector, until compaction; once
+    either passes compact_ratio of the rows, the graph is rebuilt over the live
+    rows on a background thread and swapped in, replaying writes that landed
+    meanwhile, so neither delete nor upsert pays for a rebuild.
+    """
+    # Approximate search: each query walks its own candidates
+    query_batch = BaseVectorIndex.query_batch
+    upsert_in_thread = True
+    # Everything the rebuilt graph replaces when it is swapped in
+    _GRAPH_STATE = ("_matrix", "_ids", "_alive", "_rows", "_size", "_tombstones", "_meta",
+                    "_levels", "_layer0", "_layer0_count", "_upper", "_entry", "_max_level")
+
+    def __init__(self, m: int = 16, ef_construction: int = 100, ef_search: int = 64, seed: int = 0,
+                 exact_filter_rows: int = 20_000, **kwargs):
+        kwargs.setdefault("compact_ratio", 0.5)
+        super().__init__(**kwargs)
+        self.exact_filter_rows = exact_filter_rows
+        self.m = m
+        self.m0 = 2 * m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._level_mult = 1.0 / math.log(max(m, 2))
+        self._rng = np.random.default_rng(seed)
+        self._levels = np.empty(0, dtype=np.int8)
+        self._layer0 = np.empty((0, self.m0), dtype=np.int32)
+        self._layer0_count = np.empty(0, dtype=np.int16)
+        self._upper: Dict[int, Dict[int, List[int]]] = {}
+        self._entry = -1
+        self._max_level = -1
+        self._lock = threading.RLock()
+        self._rebuilder: Optional[threading.Thread] = None
+        # Ids written while a rebuild is in flight, replayed onto the new graph
+        self._touched: Optional[Set[str]] = None
+        # Ids stored but not yet linked (or re-linked) into the graph
+        self._unlinked: Deque[str] = deque()
+        # Rows re-linked since the graph was last built
+        self._relinked = 0
+
+    def _grow_graph(self) -> None:
+        old = len(self._levels)
+        if old >= self.capacity:
+            return
+        levels = np.full(self.capacity, -1, dtype=np.int8)
+        levels[:old] = self._levels
+        layer0 = np.full((self.capacity, self.m0), -1, dtype=np.int32)
+        layer0[:old] = self._layer0
+        count = np.zeros(self.capacity, dtype=np.int16)
+        count[:old] = self._layer0_count
+        self._levels, self._layer0, self._layer0_count = levels, layer0, count
+
+    def _neighbors(self, row: int, level: int) -> np.ndarray:
+        if level == 0:
+            return self._layer0[row, :self._layer0_count[row]]
+        return np.asarray(self._upper.get(level, {}).get(row, ()), dtype=np.int64)
+
+    def _set_neighbors(self, row: int, level: int, neighbors: List[int]) -> None:
+        if level == 0:
+            self._layer0[row, :len(neighbors)] = neighbors
+            self._layer0[row, len(neighbors):] = -1
+            self._layer0_count[row] = len(neighbors)
+        else:
+            self._upper.setdefault(level, {})[row] = list(neighbors)
+
+    def _link(self, row: int, new: int, level: int) -> None:
+        limit = self.m0 if level == 0 else self.m
+        current = self._neighbors(row, level).tolist()
+        if len(current) < limit:
+            self._set_neighbors(row, level, current + [new])
+            return
+        cands = np.asarray(current + [new])
+        scores = self._matrix[cands] @ self._matrix[row]
+        self._set_neighbors(row, level, cands[np.argsort(-scores, kind="stable")[:limit]].tolist())
+
+    def _search_layer(self, q: np.ndarray, entry: List[int], ef: int, level: int) -> List[Tuple[float, int]]:
+        visited = set(entry)
+        entry_scores = (self._matrix[entry] @ q).tolist()
+        candidates = [(-s, r) for s, r in zip(entry_scores, entry)]
+        heapq.heapify(candidates)
+        results = [(s, r) for s, r in zip(entry_scores, entry)]
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+        while candidates:
+            neg, row = heapq.heappop(candidates)
+            if len(results) >= ef and -neg < results[0][0]:
+                break
+            nbrs = [n for n in self._neighbors(row, level).tolist() if n not in visited]
+            if not nbrs:
+                continue
+            visited.update(nbrs)
+            for n, s in zip(nbrs, (self._matrix[nbrs] @ q).tolist()):
+                if len(results) < ef or s > results[0][0]:
+                    heapq.heappush(candidates, (-s, n))
+                    heapq.heappush(results, (s, n))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+        return sorted(results, reverse=True)
+
+    def _insert(self, row: int) -> None:
+        q = self._matrix[row]
+        # A row already in the graph keeps its level and gets fresh out-edges at each
+        level = int(self._levels[row])
+        if level < 0:
+            level = int(-math.log(1.0 - self._rng.random()) * self._level_mult)
+            self._levels[row] = level
+        if self._entry < 0:
+            self._entry, self._max_level = row, level
+            return
+        entry = [self._entry]
+        for lc in range(self._max_level, level, -1):
+            entry = [self._search_layer(q, entry, 1, lc)[0][1]]
+        for lc in range(min(level, self._max_level), -1, -1):
+            found = self._search_layer(q, entry, self.ef_construction, lc)
+            neighbors = [r for _, r in found if r != row][:self.m]
+            self._set_neighbors(row, lc, neighbors)
+            for n in neighbors:
+                self._link(n, row, lc)
+            entry = [r for _, r in found]
+        if level > self._max_level:
+            self._entry, self._max_level = row, level
+
+    def _store_rows(self, rows: np.ndarray, vecs: np.ndarray) -> None:
+        self._grow_graph()
+        # New rows, and linked rows whose vector changes, need (re-)linking
+        linked = self._levels[rows] >= 0
+        changed = ~linked | np.any(self._matrix[rows] != vecs, axis=1)
+        self._relinked += int(np.count_nonzero(linked & changed))
+        super()._store_rows(rows, vecs)
+        self._unlinked.extend(self._ids[rows[changed]].tolist())
+
+    def upsert(self, ids: List[str], *args, **kwargs) -> None:
+        with self._lock:
+            super().upsert(ids, *args, **kwargs)
+            if self._touched is not None:
+                self._touched.update(ids)
+        self.link_pending()
+        if self._relinked >= self.compact_ratio * self._size:
+            self.compact()
+
+    def link_pending(self) -> None:
+        """Link stored rows into the graph, one row per lock hold."""
+        while True:
+            with self._lock:
+                if not self._unlinked:
+                    return
+                row = self._rows.get(self._unlinked.popleft())
+                if row is not None:
+                    self._insert(row)
+
+    def delete(self, ids: List[str]) -> int:
+        with self._lock:
+            return super().delete(ids)
+
+    def compact(self, wait: bool = False) -> None:
+        """
+        Start a background rebuild of the graph without tombstoned rows and with
+        fresh edges for re-linked ones, unless one is already running. wait=True
+        blocks until the new graph is live.
+        """
+        with self._lock:
+            if (self._tombstones or self._relinked) and (self._rebuilder is None or not self._rebuilder.is_alive()):
+                live = np.flatnonzero(self._alive[:self._size])
+                snapshot = (self._ids[live].tolist(), self._matrix[live],
+                            {field: codes[live] for field, codes in self._meta.items()})
+                self._touched = set()
+                self._rebuilder = threading.Thread(target=self._rebuild, args=snapshot, name="hnsw-rebuild", daemon=True)
+                self._rebuilder.start()
+            rebuilder = self._rebuilder
+        if wait and rebuilder is not None:
+            rebuilder.join()
+
+    def _rebuild(self, ids: List[str], vecs: np.ndarray, meta: Dict[str, np.ndarray]) -> None:
+        start = time.perf_counter()
+        graph = HNSWIndex(m=self.m, ef_construction=self.ef_construction, ef_search=self.ef_search,
+                          exact_filter_rows=self.exact_filter_rows, initial_capacity=max(1, len(ids)),
+                          compact_ratio=self.compact_ratio)
+        # Codes are append-only, so both graphs can share the metadata vocabularies
+        graph._vocab = self._vocab
+        try:
+            graph.upsert(ids, vecs)
+            for field, codes in meta.items():
+                graph._meta[field][:len(ids)] = codes
+        except BaseException:
+            with self._lock:
+                self._touched = None
+            raise
+        with self._lock:
+            touched, self._touched = self._touched, None
+            graph._tombstone([cid for cid in ids if cid not in self._rows])
+            replay = [cid for cid in touched if cid in self._rows]
+            if replay:
+                rows = np.asarray([self._rows[cid] for cid in replay])
+                graph.upsert(replay, self._matrix[rows])
+                new_rows = np.asarray([graph._rows[cid] for cid in replay])
+                for field, codes in self._meta.items():
+                    graph._meta[field][new_rows] = codes[rows]
+            for name in self._GRAPH_STATE:
+                setattr(self, name, getattr(graph, name))
+            # Every live row, replayed ones included, is linked in the new graph
+            self._unlinked.clear()
+            self._relinked = graph._relinked
+        logger.info(f"Rebuilt HNSW graph over {len(ids)} rows in {time.perf_counter() - start:.1f}s, replayed {len(replay)} writes")
+
+    def query(self, query_vec: np.ndarray, top_k: int, filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
+        with self._lock:
+            return self._query(query_vec, top_k, filters)
+
+    def _query(self, query_vec: np.ndarray, top_k: int, filters: Optional[Dict[str, Any]]) -> List[Tuple[str, float]]:
+        if top_k <= 0 or not self._rows or self._entry < 0:
+            return []
+        allowed = self.filter_rows(filters)
+        if allowed is not None and len(allowed) <= self.exact_filter_rows:
+            return super().query(query_vec, top_k, filters)
+        q = np.asarray(query_vec, dtype=np.float32).ravel()
+        q = q / (np.linalg.norm(q) + 1e-8)
+        entry = [self._entry]
+        for lc in range(self._max_level, 0, -1):
+            entry = [self._search_layer(q, entry, 1, lc)[0][1]]
+        ef = max(self.ef_search, top_k)
+        if allowed is not None:
+            # Widen the beam in proportion to how much of the graph the filter excludes
+            ef = min(self._size, int(ef * self._size / max(1, len(allowed))))
+            keep = np.zeros(self._size, dtype=bool)
+            keep[allowed] = True
+        else:
+            keep = self._alive
+        found = self._search_layer(q, entry, ef, 0)
+        hits = [(self._ids[r], s) for s, r in found if keep[r]][:top_k]
+        if allowed is not None and len(hits) < min(top_k, len(allowed)):
+            return super().query(query_vec, top_k, filters)
+        return hits
+
+class QuantizedVectorIndex(VectorIndex):
+    """
+    Flat index that stores compressed code rows (sq8 or pq) instead of float32.
+    Queries score every code with asymmetric distance computation, then rerank a
+    shortlist of rerank_factor * top_k hits against full-precision vectors
+    (chunk_id -> vector): from rerank_source in query, or awaited from
+    rerank_fetch in aquery so the lookup stays off the event loop. PQ needs
+    training data, so rows are kept in float32 until train_min_rows have arrived.
+    """
+    def __init__(self, codec: str = "sq8", pq_m: Optional[int] = None, train_min_rows: int = 10_000,
+                 train_sample_rows: int = 65_536, rerank_factor: int = 4,
+                 rerank_source: Optional[Callable[[List[str]], Dict[str, np.ndarray]]] = None,
+                 rerank_fetch: Optional[Callable[[List[str]], Awaitable[Dict[str, np.ndarray]]]] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.codec_name = codec
+        self.pq_m = pq_m
+        self.train_min_rows = train_min_rows
+        self.train_sample_rows = train_sample_rows
+        self.rerank_factor = rerank_factor
+        self.rerank_source = rerank_source
+        self.rerank_fetch = rerank_fetch
+        self.codec = None
+        self._codes: Optional[np.ndarray] = None
+
+    def memory_bytes(self) -> int:
+        codes = self._codes.nbytes if self._codes is not None else 0
+        return super().memory_bytes() + codes
+
+    def _ensure_codec(self) -> None:
+        if self.codec is None:
+            kwargs = {"m": self.pq_m} if self.codec_name == "pq" else {}
+            self.codec = get_codec(self.codec_name, self.dim, **kwargs)
+        if self._codes is not None or self._size == 0:
+            return
+        if not self.codec.trained:
+            if len(self._rows) < self.train_min_rows:
+                return
+            live = np.flatnonzero(self._alive[:self._size])
+            rng = np.random.default_rng(0)
+            sample = live if len(live) <= self.train_sample_rows else np.sort(rng.choice(live, self.train_sample_rows, replace=False))
+            self.codec.train(self._matrix[sample])
+            logger.info(f"Trained {self.codec_name} codec on {len(sample)} rows")
+        # Switch storage over to codes and release the float32 matrix
+        codes = np.zeros((self.capacity, self.codec.code_size), dtype=np.uint8)
+        codes[:self._size] = self.codec.encode(self._matrix[:self._size])
+        self._codes = codes
+        self._matrix = np.empty((0, self.dim), dtype=np.float32)
+
+    def _resize_storage(self, capacity: int) -> None:
+        if self._codes is None:
+            return super()._resize_storage(capacity)
+        codes = np.zeros((capacity, self.codec.code_size), dtype=np.uint8)
+        codes[:self._size] = self._codes[:self._size]
+        self._codes = codes
+
+    def _store_rows(self, rows: np.ndarray, vecs: np.ndarray) -> None:
+        if self._codes is None:
+            super()._store_rows(rows, vecs)
+            self._ensure_codec()
+        else:
+            self._codes[rows] = self.codec.encode(vecs)
+
+    def _move_rows(self, keep: np.ndarray) -> None:
+        if self._codes is None:
+            return super()._move_rows(keep)
+        self._codes[:len(keep)] = self._codes[keep]
+
+    def _scores(self, q: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        if self._codes is None:
+            return super()._scores(q, rows)
+        return self.codec.scores(q, self._codes[:self._size] if rows is None else self._codes[rows])
+
+    def query(self, query_vec: np.ndarray, top_k: int, filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
+        if self._codes is None or self.rerank_source is None:
+            return super().query(query_vec, top_k, filters)
+        shortlist = super().query(query_vec, top_k * self.rerank_factor, filters)
+        if not shortlist:
+            return []
+        return self._rerank(query_vec, top_k, shortlist, self.rerank_source([cid for cid, _ in shortlist]))
+
+    async def aquery(self, query_vec: np.ndarray, top_k: int, filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
+        if self._codes is None or self.rerank_fetch is None:
+            return self.query(query_vec, top_k, filters)
+        shortlist = super().query(query_vec, top_k * self.rerank_factor, filters)
+        if not shortlist:
+            return []
+        return self._rerank(query_vec, top_k, shortlist, await self.rerank_fetch([cid for cid, _ in shortlist]))
+
+    def query_batch(self, query_vecs: np.ndarray, top_k: int, filters: Optional[Dict[str, Any]] = None) -> List[List[Tuple[str, float]]]:
+        if self._codes is None:
+            return super().query_batch(query_vecs, top_k, filters)
+        return BaseVectorIndex.query_batch(self, query_vecs, top_k, filters)
+
+    async def aquery_batch(self, query_vecs: np.ndarray, top_k: int, filters: Optional[Dict[str, Any]] = None) -> List[List[Tuple[str, float]]]:
+        if self._codes is None:
+            return super().query_batch(query_vecs, top_k, filters)
+        # Each shortlist is reranked against vectors fetched off the loop
+        return [await self.aquery(q, top_k, filters) for q in query_vecs]
+
+    def _rerank(self, query_vec: np.ndarray, top_k: int, shortlist: List[Tuple[str, float]],
+                full: Dict[str, np.ndarray]) -> List[Tuple[str, float]]:
+        q = np.asarray(query_vec, dtype=np.float32).ravel()
+        q = q / (np.linalg.norm(q) + 1e-8)
+        exact_ids = [cid for cid, _ in shortlist if cid in full]
+        exact = {}
+        if exact_ids:
+            vecs = normalize_rows(np.stack([full[cid] for cid in exact_ids]).astype(np.float32))
+            exact = dict(zip(exact_ids, (vecs @ q).tolist()))
+        rescored = [(cid, exact.get(cid, score)) for cid, score in shortlist]
+        rescored.sort(key=lambda x: x[1], reverse=True)
+        return rescored[:top_k]
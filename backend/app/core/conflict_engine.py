@@ -0,0 +1,242 @@
+import re
+import sqlite3
+import zlib
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+import logging
+import numpy as np
+from .fts_query import STOPWORDS
+from .search_engine import CHUNK_PAGE_JOIN, CHUNK_TEXT, FILTER_COLUMNS
+from ..utils.patterns import CSI_SECTION_REGEX, MODAL_VERBS_REGEX, TOPIC_PATTERNS
+from ..utils.tags import filter_masks
+
+logger = logging.getLogger(__name__)
+
+# Conflict detection without comparing every pair of chunks. Sentences that
+# state a quantity (an LD amount, a bond percentage, a number of days) become
+# claims; claims are blocked by topic (TOPIC_PATTERNS, split further by what
+# the pattern captured, so bid and performance bonds never meet) or else by the
+# CSI section they belong to, and by unit. Only claims inside a block are
+# compared: their wording as hashed bag-of-words vectors, one matrix product
+# per block of rows, and a pair conflicts when it reads alike but states
+# different values.
+
+NUMBER_WORDS = {
+    "one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9, "ten": 10,
+    "eleven": 11, "twelve": 12, "fourteen": 14, "fifteen": 15, "twenty": 20, "thirty": 30, "forty-five": 45,
+    "sixty": 60, "ninety": 90, "hundred": 100,
+}
+_NUMBER = r"\b(?P<num>\d[\d,]*(?:\.\d+)?|" + "|".join(sorted(NUMBER_WORDS, key=len, reverse=True)) + r")\b"
+# "fourteen (14) calendar days" states one value twice; both spellings parse the same
+_SPELLED = r"\)?\s*(?:\(\d[\d,.]*\)\s*)?"
+
+QUANTITY_PATTERNS = {
+    "$": re.compile(r"\$\s?(?P<num>\d[\d,]*(?:\.\d+)?)"),
+    "%": re.compile(_NUMBER + _SPELLED + r"(?:%|percent\b)", re.IGNORECASE),
+    "days": re.compile(_NUMBER + _SPELLED + r"(?:calendar\s+|working\s+|business\s+|consecutive\s+)?days?\b", re.IGNORECASE),
+    "years": re.compile(_NUMBER + _SPELLED + r"years?\b", re.IGNORECASE),
+    "psi": re.compile(_NUMBER + r"\s?psi\b", re.IGNORECASE),
+}
+
+# A sentence ends at ". " / "; " or a line break; "$2,000.00" and "5.5%" do not end one
+SENTENCE_REGEX = re.compile(r"\S[^\n]*?(?:[.;](?=\s|$)|(?=\n)|$)")
+WORD_REGEX = re.compile(r"[a-z]{3,}")
+
+# Dimensions of the hashed bag-of-words vectors claims are compared with
+FEATURE_DIM = 1024
+# Claims scored per block of rows; the block's similarities are rows x claims floats
+BLOCK_ROWS = 512
+
+@dataclass
+class Claim:
+    """A sentence stating values of one unit, with every chunk it appears in."""
+    block: Tuple[str, str, str]  # (topic or "section", topic anchor or CSI number, unit)
+    values: FrozenSet[float]
+    sentence: str
+    modal: bool
+    occurrences: List[Tuple[Dict[str, Any], int]] = field(default_factory=list)  # (chunk row, char offset)
+
+def parse_number(text: str) -> float:
+    word = NUMBER_WORDS.get(text.lower())
+    return float(word) if word is not None else float(text.replace(",", ""))
+
+def sentence_quantities(sentence: str) -> Dict[str, FrozenSet[float]]:
+    """Values stated in a sentence, by unit."""
+    out: Dict[str, FrozenSet[float]] = {}
+    for unit, pattern in QUANTITY_PATTERNS.items():
+        values = frozenset(parse_number(m.group("num")) for m in pattern.finditer(sentence))
+        if values:
+            out[unit] = values
+    return out
+
+def csi_number(text: Optional[str]) -> Optional[str]:
+    m = CSI_SECTION_REGEX.search(text or "")
+    return f"{m.group(1)} {m.group(3)} {m.group(4)}" if m else None
+
+def claim_blocks(sentence: str, section: Optional[str], topic: Optional[str] = None) -> List[Tuple[str, str]]:
+    """
+    The (topic, anchor) blocks a sentence is compared in. A topic's anchor is
+    what its pattern captured ("bid" vs "performance" bond), or the topic itself.
+    Sentences outside every topic fall back to their CSI section, preferring a
+    section the sentence names ("Section 03 30 00: Revise to read ...") over
+    the chunk's header.
+    """
+    blocks = []
+    for name, pattern in TOPIC_PATTERNS.items():
+        if topic is not None and name != topic:
+            continue
+        m = pattern.search(sentence)
+        if m:
+            anchor = (m.group(1) if m.groups() and m.group(1) else name).lower()
+            blocks.append((name, re.sub(r"\W+", " ", anchor)))
+    if blocks or topic is not None:
+        return blocks
+    number = csi_number(sentence) or csi_number(section)
+    return [("section", number)] if number else []
+
+def extract_claims(rows: Iterable[Dict[str, Any]], topic: Optional[str] = None) -> List[Claim]:
+    """Claims from chunk rows (id, document_id, filename, page_number, section, text), one per distinct sentence."""
+    claims: Dict[Tuple[Tuple[str, str, str], FrozenSet[float], str], Claim] = {}
+    for row in rows:
+        text = row["text"] or ""
+        seen = set()
+        for m in SENTENCE_REGEX.finditer(text):
+            sentence = m.group(0)
+            if sentence in seen:
+                continue
+            seen.add(sentence)
+            quantities = sentence_quantities(sentence)
+            if not quantities:
+                continue
+            for block in claim_blocks(sentence, row["section"], topic):
+                for unit, values in quantities.items():
+                    key = ((*block, unit), values, sentence)
+                    claim = claims.get(key)
+                    if claim is None:
+                        claim = claims[key] = Claim((*block, unit), values, sentence, bool(MODAL_VERBS_REGEX.search(sentence)))
+                    # Citation offsets point at the first occurrence, as validate_citations expects
+                    claim.occurrences.append((row, text.find(sentence)))
+    return list(claims.values())
+
+def claim_features(sentences: List[str]) -> np.ndarray:
+    """Unit-normalized hashed bag-of-words vectors, numbers and stopwords left out."""
+    out = np.zeros((len(sentences), FEATURE_DIM), dtype=np.float32)
+    for i, sentence in enumerate(sentences):
+        for word in WORD_REGEX.findall(sentence.lower()):
+            if word not in STOPWORDS and word not in NUMBER_WORDS:
+                out[i, zlib.crc32(word.encode()) % FEATURE_DIM] = 1.0
+    norms = np.linalg.norm(out, axis=1, keepdims=True)
+    return out / np.maximum(norms, 1e-8)
+
+def format_values(unit: str, values: FrozenSet[float]) -> str:
+    def one(v: float) -> str:
+        n = f"{v:,.2f}".rstrip("0").rstrip(".") if v != int(v) else f"{int(v):,}"
+        return f"${n}" if unit == "$" else f"{n}%" if unit == "%" else f"{n} {unit}"
+    return " / ".join(one(v) for v in sorted(values))
+
+def citation(row: Dict[str, Any], offset: int, sentence: str) -> Dict[str, Any]:
+    return {
+        "chunk_id": row["id"],
+        "document_id": row["document_id"],
+        "filename": row["filename"],
+        "page_number": row["page_number"],
+        "section": row["section"],
+        "quote": sentence,
+        "char_start": offset,
+        "char_end": offset + len(sentence),
+    }
+
+def block_conflicts(claims: List[Claim], min_similarity: float, max_citations: int) -> List[Dict[str, Any]]:
+    """Findings for one block: claims that read alike but state different values, one finding per pair of value sets."""
+    value_sets = sorted({c.values for c in claims}, key=sorted)
+    if len(value_sets) < 2:
+        return []
+    # Value sets numbered in sorted order, so a pair is always (lower, higher)
+    numbers = {v: k for k, v in enumerate(value_sets)}
+    vids = np.array([numbers[c.values] for c in claims])
+    features = claim_features([c.sentence for c in claims])
+    lo_parts, hi_parts, sim_parts = [], [], []
+    for start in range(0, len(claims), BLOCK_ROWS):
+        sims = features[start:start + BLOCK_ROWS] @ features.T
+        rows = np.arange(start, start + len(sims))
+        hit = (sims >= min_similarity) & (vids[rows, None] < vids[None, :])
+        a, b = np.nonzero(hit)
+        lo_parts.append(rows[a])
+        hi_parts.append(b)
+        sim_parts.append(sims[a, b])
+    lo, hi, sim = np.concatenate(lo_parts), np.concatenate(hi_parts), np.concatenate(sim_parts)
+    unit = claims[0].block[2]
+    findings = []
+    pair = vids[lo] * len(value_sets) + vids[hi]
+    for key in np.unique(pair):
+        members = pair == key
+        left_values, right_values = value_sets[key // len(value_sets)], value_sets[key % len(value_sets)]
+        if left_values & right_values:
+            continue  # "5% or 10%" against "10%" is not a contradiction
+        best = np.argmax(np.where(members, sim, -1.0))
+        i, j = int(lo[best]), int(hi[best])
+        left, right = np.unique(lo[members]).tolist(), np.unique(hi[members]).tolist()
+        # The side stated more often is the claim, the other contradicts it
+        if sum(len(claims[k].occurrences) for k in right) > sum(len(claims[k].occurrences) for k in left):
+            left_values, right_values, i, j, left, right = right_values, left_values, j, i, right, left
+        # Requirement language on both sides makes the contradiction firmer
+        confidence = float(sim[best]) * (0.7 + 0.15 * claims[i].modal + 0.15 * claims[j].modal)
+        findings.append({
+            "claim": f"{format_values(unit, left_values)}: {claims[i].sentence}",
+            "contradicts": f"{format_values(unit, right_values)}: {claims[j].sentence}",
+            # The closest pair's own quotes come first
+            "citations_left": side_citations([claims[i]] + [claims[k] for k in left if k != i], max_citations),
+            "citations_right": side_citations([claims[j]] + [claims[k] for k in right if k != j], max_citations),
+            "confidence": round(confidence, 3),
+        })
+    return findings
+
+def side_citations(claims: List[Claim], limit: int) -> List[Dict[str, Any]]:
+    out, seen = [], set()
+    for claim in claims:
+        for row, offset in claim.occurrences:
+            if len(out) >= limit:
+                return out
+            if (row["id"], offset) not in seen:
+                seen.add((row["id"], offset))
+                out.append(citation(row, offset, claim.sentence))
+    return out
+
+def find_conflicts(claims: List[Claim], min_similarity: float = 0.6, max_citations: int = 10,
+                   max_findings: int = 200) -> List[Dict[str, Any]]:
+    blocks: Dict[Tuple[str, str, str], List[Claim]] = {}
+    for claim in claims:
+        blocks.setdefault(claim.block, []).append(claim)
+    findings: List[Dict[str, Any]] = []
+    for block in blocks.values():
+        findings.extend(block_conflicts(block, min_similarity, max_citations))
+    findings.sort(key=lambda f: f["confidence"], reverse=True)
+    return findings[:max_findings]
+
+def load_chunk_rows(conn: sqlite3.Connection, filters: Optional[Dict[str, Any]] = None) -> Iterable[Dict[str, Any]]:
+    """Chunk rows with their text, in document and page order, narrowed by the search filter keys."""
+    where, params = [], []
+    for key, column in FILTER_COLUMNS.items():
+        values = (filters or {}).get(key)
+        if values:
+            where.append(f"c.{column} IN ({','.join('?' * len(values))})")
+            params.extend(values)
+    for mask in filter_masks(filters).values():
+        where.append("c.tags & ? != 0")
+        params.append(mask)
+    sql = f"""
+    SELECT c.id, c.document_id, c.filename, c.page_number, c.section, {CHUNK_TEXT} AS text
+    FROM chunks c {CHUNK_PAGE_JOIN}
+    {"WHERE " + " AND ".join(where) if where else ""}
+    ORDER BY c.document_id, c.page_number, c.char_start
+    """
+    for row in conn.execute(sql, params):
+        yield dict(row)
+
+def detect_conflicts(conn: sqlite3.Connection, topic: Optional[str] = None, filters: Optional[Dict[str, Any]] = None,
+                     min_similarity: float = 0.6, max_citations: int = 10, max_findings: int = 200) -> List[Dict[str, Any]]:
+    """Run on a read-pool thread: one pass over the chunks in scope, then compare within blocks."""
+    claims = extract_claims(load_chunk_rows(conn, filters), topic)
+    findings = find_conflicts(claims, min_similarity, max_citations, max_findings)
+    logger.info(f"Conflict scan: {len(claims)} claims, {len(findings)} findings")
+    return findings
@@ -0,0 +1,67 @@
+import asyncio
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional, TypeVar
+import logging
+from ..config import settings, sqlite_conn, get_sqlite_conn
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Reads run on a pool of threads, each with its own read-only connection, so a
+# slow FTS query never blocks the event loop or other readers (WAL lets them run
+# alongside the writer). Every write goes through one thread that owns sqlite_conn,
+# so writes are serialized and never interleave their transactions.
+
+class ReadPool:
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=size, thread_name_prefix="sqlite-read") if size > 0 else None
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's read connection, opened on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = get_sqlite_conn(self.path)
+            conn.execute("PRAGMA query_only = ON;")
+        return conn
+
+    def _call(self, fn: Callable[..., T], args: tuple) -> T:
+        return fn(self.connection(), *args)
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run fn(conn, *args) on a pool thread; with size 0, inline on the caller's thread."""
+        if self._executor is None:
+            return self._call(fn, args)
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._call, fn, args)
+
+class Writer:
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-write")
+
+    def _call(self, fn: Callable[..., T], args: tuple) -> T:
+        try:
+            return fn(self.conn, *args)
+        except BaseException:
+            # Never leave a half-done transaction for the next write to commit
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            raise
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """Run fn(conn, *args) on the writer thread, after any writes already queued."""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, self._call, fn, args)
+
+read_pool = ReadPool(settings.SQLITE_PATH, settings.SQLITE_READ_WORKERS)
+writer = Writer(sqlite_conn)
+
+async def read(fn: Callable[..., T], *args: Any) -> T:
+    return await read_pool.run(fn, *args)
+
+async def write(fn: Callable[..., T], *args: Any) -> T:
+    return await writer.run(fn, *args)
@@ -0,0 +1,83 @@
+import time
+import sqlite3
+from typing import Dict, List, Optional
+import logging
+import numpy as np
+from ..config import settings, sqlite_conn
+
+logger = logging.getLogger(__name__)
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed embedding cache keyed by (model, sha256(text)).
+    Re-uploads and reprocessing of mostly identical spec books only pay for the
+    chunks whose text actually changed. With max_entries > 0 the least recently
+    used entries are evicted once the cache grows past it. Each call runs on the
+    connection it is given, or on the one the cache was built with.
+    """
+    def __init__(self, conn: sqlite3.Connection, max_entries: int = 0, lookup_batch: int = 500):
+        self.conn = conn
+        self.max_entries = max_entries
+        self.lookup_batch = lookup_batch
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def get_many(self, model: str, hashes: List[str], conn: Optional[sqlite3.Connection] = None) -> Dict[str, np.ndarray]:
+        conn = conn or self.conn
+        found: Dict[str, np.ndarray] = {}
+        unique = list(dict.fromkeys(hashes))
+        for i in range(0, len(unique), self.lookup_batch):
+            batch = unique[i:i + self.lookup_batch]
+            placeholders = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT text_hash, vector FROM embedding_cache WHERE model = ? AND text_hash IN ({placeholders})",
+                [model, *batch],
+            ).fetchall()
+            for r in rows:
+                found[r[0]] = np.frombuffer(r[1], dtype=np.float32)
+        self.hits += len(found)
+        self.misses += len(unique) - len(found)
+        if found and self.max_entries:
+            # Touch hits so LRU eviction keeps them
+            now = time.time_ns()
+            with conn:
+                conn.executemany(
+                    "UPDATE embedding_cache SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(now, model, h) for h in found],
+                )
+        return found
+
+    def put_many(self, model: str, hashes: List[str], vectors: np.ndarray, conn: Optional[sqlite3.Connection] = None) -> None:
+        if not hashes:
+            return
+        conn = conn or self.conn
+        vecs = np.ascontiguousarray(vectors, dtype=np.float32)
+        now = time.time_ns()
+        rows = [(model, h, vecs.shape[1], vecs[i].tobytes(), now) for i, h in enumerate(hashes)]
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (model, text_hash, dim, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+        if self.max_entries:
+            self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        # The last_used index is much smaller than the table, so this count stays cheap
+        count = conn.execute("SELECT COUNT(*) FROM embedding_cache INDEXED BY idx_embedding_cache_last_used").fetchone()[0]
+        excess = count - self.max_entries
+        if excess <= 0:
+            return
+        with conn:
+            cur = conn.execute(
+                "DELETE FROM embedding_cache WHERE (model, text_hash) IN "
+                "(SELECT model, text_hash FROM embedding_cache ORDER BY last_used LIMIT ?)",
+                (excess,),
+            )
+        self.evictions += cur.rowcount
+
+global_embedding_cache = EmbeddingCache(sqlite_conn, max_entries=settings.EMBEDDING_CACHE_MAX_ENTRIES)
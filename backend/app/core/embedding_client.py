@@ -0,0 +1,147 @@
+import asyncio
+import random
+import time
+import weakref
+from typing import Dict, List, Optional, Tuple
+import logging
+import numpy as np
+from ..config import settings
+from . import metrics
+from .text_chunker import approx_token_count
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """
+    Async token bucket refilled continuously at rate_per_minute. Used for both
+    request (RPM) and token (TPM) limits.
+    """
+    def __init__(self, rate_per_minute: float):
+        self.capacity = max(1.0, float(rate_per_minute))
+        self.fill_rate = self.capacity / 60.0
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        amount = min(float(amount), self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.fill_rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.fill_rate)
+
+def pack_batches(texts: List[str], max_tokens: int, max_inputs: int) -> List[List[int]]:
+    """
+    Group text indices into batches bounded by an approximate token budget and
+    an input count, preserving order.
+    """
+    batches: List[List[int]] = []
+    current: List[int] = []
+    used = 0
+    for i, t in enumerate(texts):
+        n = approx_token_count(t)
+        if current and (used + n > max_tokens or len(current) >= max_inputs):
+            batches.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += n
+    if current:
+        batches.append(current)
+    return batches
+
+class EmbeddingClient:
+    """
+    Shared embedding client: one pooled AsyncOpenAI connection, token-budget
+    batching, up to `concurrency` requests in flight, and RPM/TPM token buckets.
+    Rate-limit and transient errors are retried with backoff, honouring
+    Retry-After. Output rows keep the order of the input texts.
+    """
+    def __init__(self, api_key: str, base_url: Optional[str] = None, concurrency: int = 4, rpm: int = 300,
+                 tpm: int = 1_000_000, max_batch_tokens: int = 32_000, max_batch_inputs: int = 2048,
+                 max_retries: int = 6, timeout: float = 60.0):
+        import openai
+        self._openai = openai
+        self.client = openai.AsyncOpenAI(api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout)
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_inputs = max_batch_inputs
+        self.max_retries = max_retries
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._requests = TokenBucket(rpm)
+        self._tokens = TokenBucket(tpm)
+        self.calls = 0
+        self.retries = 0
+
+    def _retry_delay(self, attempt: int, exc: Exception) -> float:
+        response = getattr(exc, "response", None)
+        header = response.headers.get("retry-after") if response is not None else None
+        if header:
+            try:
+                return float(header)
+            except ValueError:
+                pass
+        return min(20.0, 0.5 * 2 ** attempt) * (0.5 + random.random())
+
+    async def _embed_batch(self, batch: List[str], model: str) -> np.ndarray:
+        tokens = sum(approx_token_count(t) for t in batch)
+        for attempt in range(self.max_retries + 1):
+            await self._requests.acquire(1)
+            await self._tokens.acquire(tokens)
+            try:
+                async with self._semaphore:
+                    self.calls += 1
+                    metrics.embedding_batch_size.observe(len(batch))
+                    resp = await self.client.embeddings.create(model=model, input=batch)
+                data = sorted(resp.data, key=lambda d: d.index)
+                metrics.embedding_calls.inc(outcome="ok")
+                metrics.embedding_texts.inc(len(batch))
+                return np.asarray([d.embedding for d in data], dtype=np.float32)
+            except (self._openai.RateLimitError, self._openai.APIConnectionError, self._openai.InternalServerError) as exc:
+                if attempt == self.max_retries:
+                    metrics.embedding_calls.inc(outcome="failed")
+                    raise
+                self.retries += 1
+                metrics.embedding_calls.inc(outcome="retried")
+                delay = self._retry_delay(attempt, exc)
+                logger.warning(f"Embedding batch of {len(batch)} failed ({type(exc).__name__}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+        raise RuntimeError("unreachable")
+
+    async def embed(self, texts: List[str], model: str) -> np.ndarray:
+        batches = pack_batches(texts, self.max_batch_tokens, self.max_batch_inputs)
+        results = await asyncio.gather(*(self._embed_batch([texts[i] for i in b], model) for b in batches))
+        out: Optional[np.ndarray] = None
+        for idx, vecs in zip(batches, results):
+            if out is None:
+                out = np.empty((len(texts), vecs.shape[1]), dtype=np.float32)
+            out[idx] = vecs
+        return out if out is not None else np.empty((0, 0), dtype=np.float32)
+
+# Per event loop (asyncio primitives are loop-bound), keyed by the loop itself so
+# a new loop never inherits a dead one's client. A client's locks refer back to
+# its loop, so entries for closed loops are dropped here rather than left to the
+# weak reference.
+_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, Optional[str]], EmbeddingClient]]" = weakref.WeakKeyDictionary()
+
+def get_embedding_client(api_key: str) -> EmbeddingClient:
+    """One shared client per key and event loop."""
+    for closed in [loop for loop in _clients if loop.is_closed()]:
+        del _clients[closed]
+    clients = _clients.setdefault(asyncio.get_running_loop(), {})
+    key = (api_key, settings.OPENAI_BASE_URL)
+    client = clients.get(key)
+    if client is None:
+        client = clients[key] = EmbeddingClient(
+            api_key,
+            base_url=settings.OPENAI_BASE_URL,
+            concurrency=settings.MAX_WORKERS,
+            rpm=settings.RATE_LIMIT_RPM,
+            tpm=settings.RATE_LIMIT_TPM,
+            max_batch_tokens=settings.EMBEDDING_BATCH_TOKENS,
+            max_batch_inputs=settings.EMBEDDING_BATCH_MAX_INPUTS,
+        )
+    return client
@@ -1,10 +1,19 @@
 import asyncio
+import functools
+import hashlib
 from typing import List, Dict, Any, Tuple, Optional
 import os
+import sqlite3
+import time
 import numpy as np
-from tenacity import retry, stop_after_attempt, wait_exponential_jitter
 import logging
-import json
+from ..config import settings
+from . import db
+from .quantization import BLOB_CODECS, get_codec
+from .embedding_cache import global_embedding_cache
+from .embedding_client import get_embedding_client
+from .result_cache import bump_corpus_version
+from ..utils.tags import filter_masks
 
 logger = logging.getLogger(__name__)
 
@@ -20,49 +29,465 @@ def _hash_to_vec(text: str, dim: int = 64) -> np.ndarray:
 async def embed_texts(texts: List[str], model: str, api_key: Optional[str]) -> np.ndarray:
     if not api_key:
         return np.stack([_hash_to_vec(t) for t in texts], axis=0)
-    # Real OpenAI embeddings
-    import openai
-    client = openai.OpenAI(api_key=api_key)
-
-    @retry(stop=stop_after_attempt(3), wait=wait_exponential_jitter(initial=0.5, max=5))
-    def _embed_sync(batch: List[str]) -> np.ndarray:
-        resp = client.embeddings.create(model=model, input=batch)
-        vecs = [np.array(d.embedding, dtype=np.float32) for d in resp.data]
-        return np.stack(vecs, axis=0)
-
-    # Batch with size ~256 tokens each, keep simple by 64 texts per batch
-    outputs: List[np.ndarray] = []
-    batch_size = 64
-    for i in range(0, len(texts), batch_size):
-        batch = texts[i:i + batch_size]
-        vecs = await asyncio.to_thread(_embed_sync, batch)
-        outputs.append(vecs)
-    return np.concatenate(outputs, axis=0)
+    # Real OpenAI embeddings through the shared, rate-limited client
+    return await get_embedding_client(api_key).embed(texts, model=model)
 
 def cosine_similarity(a: np.ndarray, b: np.ndarray) -> float:
     denom = (np.linalg.norm(a) * np.linalg.norm(b)) + 1e-8
     return float(np.dot(a, b) / denom)
 
-class VectorIndex:
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True) + 1e-8
+    return (vectors / norms).astype(np.float32, copy=False)
+
+# Search filter keys that vector indexes can push into the scan, and the
+# per-row metadata field each one matches against
+FILTER_FIELDS = {"doc_ids": "document", "sections": "section"}
+# Per-row chunk tag bits (utils.tags), matched by the topics/divisions filters
+TAGS_FIELD = "tags"
+
+class CodeBook:
+    """Interns metadata strings (document ids, sections) as compact int32 codes."""
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+
+    def encode(self, values: List[Optional[str]]) -> np.ndarray:
+        out = np.full(len(values), -1, dtype=np.int32)
+        for i, v in enumerate(values):
+            if v is not None:
+                out[i] = self.codes.setdefault(v, len(self.codes))
+        return out
+
+    def lookup(self, values: List[str]) -> np.ndarray:
+        return np.array([self.codes[v] for v in values if v in self.codes], dtype=np.int32)
+
+class BaseVectorIndex:
     """
-    In-memory vector index for local/dev/testing. Stores vectors by chunk_id.
+    Interface implemented by every vector index backend. Scores are cosine
+    similarities; query returns (chunk_id, score) pairs, best first. Rows carry
+    their document id, section and tag bits so search filters (see
+    FILTER_FIELDS and utils.tags) are applied inside the scan and a filtered
+    query still returns a full top_k.
     """
-    def __init__(self):
-        self.vectors: Dict[str, np.ndarray] = {}
+    dim: Optional[int] = None
+    # True when the backend keeps its own durable copy of the vectors
+    persistent = False
+    # True when upsert is slow but locked against queries, so ingest runs it on a thread
+    upsert_in_thread = False
+
+    def __len__(self) -> int:
+        raise NotImplementedError
+
+    def __contains__(self, chunk_id: str) -> bool:
+        raise NotImplementedError
+
+    def upsert(self, ids: List[str], vectors: np.ndarray, document_ids: Optional[List[Optional[str]]] = None,
+               sections: Optional[List[Optional[str]]] = None, tags: Optional[List[int]] = None) -> None:
+        raise NotImplementedError
+
+    def delete(self, ids: List[str]) -> int:
+        raise NotImplementedError
+
+    def query(self, query_vec: np.ndarray, top_k: int, filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
+        raise NotImplementedError
+
+    async def aquery(self, query_vec: np.ndarray, top_k: int, filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
+        """Query from the event loop; backends that need I/O to answer await it here."""
+        return self.query(query_vec, top_k, filters)
+
+    def query_batch(self, query_vecs: np.ndarray, top_k: int, filters: Optional[Dict[str, Any]] = None) -> List[List[Tuple[str, float]]]:
+        """One result list per row of query_vecs; exact backends score them all in one pass."""
+        return [self.query(q, top_k, filters) for q in query_vecs]
+
+    async def aquery_batch(self, query_vecs: np.ndarray, top_k: int, filters: Optional[Dict[str, Any]] = None) -> List[List[Tuple[str, float]]]:
+        return self.query_batch(query_vecs, top_k, filters)
+
+def merge_top_k(best_scores: np.ndarray, best_rows: np.ndarray, scores: np.ndarray, rows: np.ndarray,
+                top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Fold one scored block into a running per-query top k. scores is (block rows,
+    queries), rows the row number of each block row; best_scores and best_rows
+    are (queries, <= top_k) and start out with zero columns.
+    """
+    k = min(top_k, scores.shape[0])
+    if k < scores.shape[0]:
+        idx = np.argpartition(-scores, k - 1, axis=0)[:k]
+    else:
+        idx = np.broadcast_to(np.arange(scores.shape[0])[:, None], scores.shape)
+    all_scores = np.concatenate([best_scores, np.take_along_axis(scores, idx, axis=0).T], axis=1)
+    all_rows = np.concatenate([best_rows, rows[idx].T], axis=1)
+    if all_scores.shape[1] > top_k:
+        keep = np.argpartition(-all_scores, top_k - 1, axis=1)[:, :top_k]
+        all_scores = np.take_along_axis(all_scores, keep, axis=1)
+        all_rows = np.take_along_axis(all_rows, keep, axis=1)
+    return all_scores, all_rows
+
+def sorted_top_k(best_scores: np.ndarray, best_rows: np.ndarray) -> List[List[Tuple[int, float]]]:
+    """Per query, (row, score) pairs best first, without the -inf scores of dead rows."""
+    order = np.argsort(-best_scores, axis=1, kind="stable")
+    out = []
+    for scores, rows, idx in zip(best_scores, best_rows, order):
+        out.append([(int(rows[i]), float(scores[i])) for i in idx if np.isfinite(scores[i])])
+    return out
+
+class VectorIndex(BaseVectorIndex):
+    """
+    Exact (brute force) in-memory vector index, and the reference the
+    approximate backends are measured against.
+
+    Rows live in one preallocated float32 matrix of unit-normalized vectors with
+    a parallel id array, so a query is a single matrix-vector product followed by
+    an argpartition top-k; a batch of queries is one matrix-matrix product per
+    block of rows, with a running top-k per query. Capacity grows geometrically to amortize upserts and
+    deletes leave tombstones that are compacted once they pile up.
+    """
+    # Rows scored per block in query_batch: the block's scores are rows x queries floats
+    batch_block_rows = 16_384
+
+    def __init__(self, dim: Optional[int] = None, initial_capacity: int = 1024, compact_ratio: float = 0.25):
+        self.dim = dim
+        self.initial_capacity = max(1, initial_capacity)
+        self.compact_ratio = compact_ratio
+        self._matrix = np.empty((0, dim or 0), dtype=np.float32)
+        self._ids = np.empty(0, dtype=object)
+        self._alive = np.empty(0, dtype=bool)
+        self._rows: Dict[str, int] = {}
+        self._size = 0
+        self._tombstones = 0
+        self._vocab = {f: CodeBook() for f in FILTER_FIELDS.values()}
+        self._meta = {f: np.empty(0, dtype=np.int32) for f in FILTER_FIELDS.values()}
+        self._meta[TAGS_FIELD] = np.empty(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._rows
+
+    @property
+    def capacity(self) -> int:
+        return len(self._ids)
+
+    def memory_bytes(self) -> int:
+        meta = sum(a.nbytes for a in self._meta.values())
+        return self._matrix.nbytes + self._ids.nbytes + self._alive.nbytes + meta
 
-    def upsert(self, ids: List[str], vectors: np.ndarray) -> None:
-        for i, cid in enumerate(ids):
-            self.vectors[cid] = vectors[i]
+    def _reserve(self, needed: int) -> None:
+        if needed <= self.capacity:
+            return
+        capacity = max(needed, self.capacity * 2, self.initial_capacity)
+        self._resize_storage(capacity)
+        ids = np.empty(capacity, dtype=object)
+        ids[:self._size] = self._ids[:self._size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._ids, self._alive = ids, alive
+        for field, codes in self._meta.items():
+            # Unset rows: no vocabulary code, no tags
+            grown = np.full(capacity, 0 if field == TAGS_FIELD else -1, dtype=codes.dtype)
+            grown[:self._size] = codes[:self._size]
+            self._meta[field] = grown
 
-    def query(self, query_vec: np.ndarray, top_k: int) -> List[Tuple[str, float]]:
-        sims = [(cid, cosine_similarity(v, query_vec)) for cid, v in self.vectors.items()]
-        sims.sort(key=lambda x: x[1], reverse=True)
-        return sims[:top_k]
+    # Row storage primitives; subclasses that store vectors differently override these
+    def _resize_storage(self, capacity: int) -> None:
+        matrix = np.empty((capacity, self.dim), dtype=np.float32)
+        if self._size:
+            matrix[:self._size] = self._matrix[:self._size]
+        self._matrix = matrix
 
-global_vector_index = VectorIndex()
+    def _store_rows(self, rows: np.ndarray, vecs: np.ndarray) -> None:
+        self._matrix[rows] = vecs
 
-async def upsert_embeddings(chunks: List[Dict[str, Any]], model: str, api_key: Optional[str]) -> None:
-    texts = [c["text"] for c in chunks]
+    def _move_rows(self, keep: np.ndarray) -> None:
+        self._matrix[:len(keep)] = self._matrix[keep]
+
+    def _scores(self, q: np.ndarray, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        if rows is None:
+            return self._matrix[:self._size] @ q
+        return self._matrix[rows] @ q
+
+    def upsert(self, ids: List[str], vectors: np.ndarray, document_ids: Optional[List[Optional[str]]] = None,
+               sections: Optional[List[Optional[str]]] = None, tags: Optional[List[int]] = None) -> None:
+        if not ids:
+            return
+        vecs = normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1))
+        if self.dim is None:
+            self.dim = vecs.shape[1]
+        elif vecs.shape[1] != self.dim:
+            raise ValueError(f"Vector dim {vecs.shape[1]} does not match index dim {self.dim}")
+        # Last occurrence wins when an id repeats within the batch
+        latest = {cid: i for i, cid in enumerate(ids)}
+        update_rows, update_src, new_ids, new_src = [], [], [], []
+        for cid, i in latest.items():
+            row = self._rows.get(cid)
+            if row is None:
+                new_ids.append(cid)
+                new_src.append(i)
+            else:
+                update_rows.append(row)
+                update_src.append(i)
+        start = stop = self._size
+        if new_ids:
+            stop = start + len(new_ids)
+            self._reserve(stop)
+            self._ids[start:stop] = new_ids
+            self._alive[start:stop] = True
+            self._rows.update(zip(new_ids, range(start, stop)))
+            self._size = stop
+        rows = np.concatenate([np.asarray(update_rows, dtype=np.int64), np.arange(start, stop)])
+        src = update_src + new_src
+        for field, values in (("document", document_ids), ("section", sections)):
+            if values is not None:
+                self._meta[field][rows] = self._vocab[field].encode([values[i] for i in src])
+        if tags is not None:
+            self._meta[TAGS_FIELD][rows] = np.asarray([tags[i] or 0 for i in src], dtype=np.int64)
+        self._store_rows(rows, vecs[src])
+        self._rows_written(rows)
+
+    def _rows_written(self, rows: np.ndarray) -> None:
+        """Hook for subclasses that maintain structures over the matrix rows."""
+
+    def _rows_compacted(self, keep: np.ndarray) -> None:
+        """Hook called after compaction; row keep[i] now lives at row i."""
+
+    def _tombstone(self, ids: List[str]) -> int:
+        """Mark rows deleted without moving anything; returns how many existed."""
+        removed = 0
+        for cid in ids:
+            row = self._rows.pop(cid, None)
+            if row is not None:
+                self._alive[row] = False
+                removed += 1
+        self._tombstones += removed
+        return removed
+
+    def delete(self, ids: List[str]) -> int:
+        removed = self._tombstone(ids)
+        if self._tombstones and self._tombstones >= self.compact_ratio * self._size:
+            self.compact()
+        return removed
+
+    def compact(self) -> None:
+        """Drop tombstoned rows, keeping live rows in insertion order."""
+        if not self._tombstones:
+            return
+        keep = np.flatnonzero(self._alive[:self._size])
+        n = len(keep)
+        self._move_rows(keep)
+        for codes in self._meta.values():
+            codes[:n] = codes[keep]
+        self._ids[:n] = self._ids[keep]
+        self._ids[n:self._size] = None
+        self._alive[:n] = True
+        self._alive[n:self._size] = False
+        self._rows = {cid: i for i, cid in enumerate(self._ids[:n])}
+        self._size = n
+        self._tombstones = 0
+        self._rows_compacted(keep)
+
+    def filter_rows(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Live rows matching the filters, or None when nothing is filtered."""
+        mask = None
+        for key, field in FILTER_FIELDS.items():
+            values = (filters or {}).get(key)
+            if not values:
+                continue
+            m = np.isin(self._meta[field][:self._size], self._vocab[field].lookup(list(values)))
+            mask = m if mask is None else mask & m
+        for bits in filter_masks(filters).values():
+            m = (self._meta[TAGS_FIELD][:self._size] & bits) != 0
+            mask = m if mask is None else mask & m
+        if mask is None:
+            return None
+        return np.flatnonzero(mask & self._alive[:self._size])
+
+    def query(self, query_vec: np.ndarray, top_k: int, filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
+        if top_k <= 0 or not self._rows:
+            return []
+        q = np.asarray(query_vec, dtype=np.float32).ravel()
+        q = q / (np.linalg.norm(q) + 1e-8)
+        rows = self.filter_rows(filters)
+        if rows is not None:
+            # Only the matching rows are scored
+            return self._top_k(self._scores(q, rows), top_k, rows)
+        scores = self._scores(q)
+        if self._tombstones:
+            scores[~self._alive[:self._size]] = -np.inf
+        return self._top_k(scores, top_k)
+
+    def query_batch(self, query_vecs: np.ndarray, top_k: int, filters: Optional[Dict[str, Any]] = None) -> List[List[Tuple[str, float]]]:
+        queries = normalize_rows(np.asarray(query_vecs, dtype=np.float32).reshape(len(query_vecs), -1))
+        if top_k <= 0 or not self._rows:
+            return [[] for _ in queries]
+        rows = self.filter_rows(filters)
+        if rows is None:
+            rows = np.arange(self._size)
+            if self._tombstones:
+                rows = rows[self._alive[:self._size]]
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        for start in range(0, len(rows), self.batch_block_rows):
+            block = rows[start:start + self.batch_block_rows]
+            # A contiguous block is a view of the matrix, no gather needed
+            vecs = self._matrix[block[0]:block[-1] + 1] if block[-1] - block[0] + 1 == len(block) else self._matrix[block]
+            best_scores, best_rows = merge_top_k(best_scores, best_rows, vecs @ queries.T, block, top_k)
+        return [[(self._ids[row], score) for row, score in hits] for hits in sorted_top_k(best_scores, best_rows)]
+
+    def _top_k(self, scores: np.ndarray, top_k: int, rows: Optional[np.ndarray] = None) -> List[Tuple[str, float]]:
+        """Best top_k of scores; rows maps score positions to matrix rows when scoring a subset."""
+        k = min(top_k, len(scores))
+        if k <= 0:
+            return []
+        if k < len(scores):
+            idx = np.argpartition(-scores, k - 1)[:k]
+        else:
+            idx = np.arange(len(scores))
+        idx = idx[np.argsort(-scores[idx], kind="stable")]
+        ids = self._ids if rows is None else self._ids[rows]
+        return [(ids[i], float(scores[i])) for i in idx if np.isfinite(scores[i])]
+
+def create_vector_index(backend: Optional[str] = None) -> BaseVectorIndex:
+    backend = (backend or settings.VECTOR_BACKEND).lower()
+    if backend == "memory":
+        if settings.VECTOR_CODEC == "f32":
+            return VectorIndex()
+        from .ann_index import QuantizedVectorIndex
+        return QuantizedVectorIndex(
+            codec=settings.VECTOR_CODEC,
+            pq_m=settings.VECTOR_PQ_M or None,
+            rerank_factor=settings.VECTOR_RERANK_FACTOR,
+            rerank_fetch=lambda ids: db.read(fetch_vectors, ids),
+        )
+    if backend == "ivf":
+        from .ann_index import IVFFlatIndex
+        return IVFFlatIndex(nlist=settings.IVF_NLIST, nprobe=settings.IVF_NPROBE)
+    if backend == "hnsw":
+        from .ann_index import HNSWIndex
+        return HNSWIndex(m=settings.HNSW_M, ef_construction=settings.HNSW_EF_CONSTRUCTION, ef_search=settings.HNSW_EF_SEARCH)
+    if backend == "mmap":
+        from .vector_store import MmapVectorIndex
+        return MmapVectorIndex(
+            os.path.join(settings.STORAGE_PATH, "vectors"),
+            segment_rows=settings.VECTOR_SEGMENT_ROWS,
+            block_rows=settings.VECTOR_SCAN_BLOCK_ROWS,
+        )
+    raise ValueError(f"Unknown VECTOR_BACKEND: {backend}")
+
+global_vector_index = create_vector_index()
+
+def persist_vectors(conn: sqlite3.Connection, ids: List[str], vectors: np.ndarray, codec: str = "f32") -> None:
+    """
+    Bulk-write vectors to chunk_vectors in a single transaction, encoded with
+    the given blob codec.
+    """
+    if codec not in BLOB_CODECS:
+        raise ValueError(f"Codec {codec} cannot be persisted; use one of {BLOB_CODECS}")
+    vecs = np.ascontiguousarray(vectors, dtype=np.float32)
+    dim = vecs.shape[1]
+    codes = get_codec(codec, dim).encode(vecs)
+    rows = [(cid, dim, codec, codes[i].tobytes()) for i, cid in enumerate(ids)]
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO chunk_vectors (chunk_id, dim, codec, vector) VALUES (?, ?, ?, ?)", rows)
+
+def decode_vector_rows(rows: List[Any], dim: int) -> np.ndarray:
+    """
+    Decode (chunk_id, dim, codec, blob) rows of one dim into a float32 matrix.
+    Rows may mix codecs; each codec group is decoded with one buffer view.
+    """
+    out = np.empty((len(rows), dim), dtype=np.float32)
+    by_codec: Dict[str, List[int]] = {}
+    for i, r in enumerate(rows):
+        by_codec.setdefault(r[2], []).append(i)
+    for codec, idx in by_codec.items():
+        c = get_codec(codec, dim)
+        # One join of the blobs, then a zero-copy view over the buffer
+        codes = np.frombuffer(b"".join(rows[i][3] for i in idx), dtype=np.uint8).reshape(len(idx), c.code_size)
+        if len(idx) == len(rows):
+            return c.decode(codes)
+        out[idx] = c.decode(codes)
+    return out
+
+def load_vectors(conn: sqlite3.Connection, index: BaseVectorIndex, batch_size: int = 50_000) -> Dict[str, Any]:
+    """
+    Stream persisted vectors back into the index in large batches. Returns load stats.
+    """
+    start = time.perf_counter()
+    loaded = skipped = 0
+    cur = conn.execute(
+        "SELECT v.chunk_id, v.dim, v.codec, v.vector, c.document_id, c.section, c.tags "
+        "FROM chunk_vectors v LEFT JOIN chunks c ON c.id = v.chunk_id"
+    )
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            break
+        dim = index.dim or rows[0][1]
+        keep = [r for r in rows if r[1] == dim]
+        skipped += len(rows) - len(keep)
+        if not keep:
+            continue
+        index.upsert([r[0] for r in keep], decode_vector_rows(keep, dim),
+                     document_ids=[r[4] for r in keep], sections=[r[5] for r in keep], tags=[r[6] for r in keep])
+        loaded += len(keep)
+    elapsed = time.perf_counter() - start
+    if skipped:
+        logger.warning(f"Skipped {skipped} persisted vectors with mismatched dim")
+    logger.info(f"Loaded {loaded} vectors into index in {elapsed * 1000.0:.1f}ms")
+    return {"vectors": loaded, "skipped": skipped, "seconds": elapsed}
+
+def fetch_vectors(conn: sqlite3.Connection, ids: List[str]) -> Dict[str, np.ndarray]:
+    """Look up persisted vectors by chunk id, e.g. for reranking quantized hits."""
+    if not ids:
+        return {}
+    placeholders = ",".join("?" * len(ids))
+    rows = conn.execute(f"SELECT chunk_id, dim, codec, vector FROM chunk_vectors WHERE chunk_id IN ({placeholders})", list(ids)).fetchall()
+    out: Dict[str, np.ndarray] = {}
+    for dim in {r[1] for r in rows}:
+        group = [r for r in rows if r[1] == dim]
+        out.update(zip((r[0] for r in group), decode_vector_rows(group, dim)))
+    return out
+
+def text_sha256(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+async def upsert_embeddings(chunks: List[Dict[str, Any]], model: str, api_key: Optional[str], conn: Optional[sqlite3.Connection] = None, persist: bool = True) -> Dict[str, int]:
+    """
+    Embed chunks and upsert them into the vector index. Only texts missing from
+    the embedding cache are sent to the embedding API. Returns cache counters.
+    """
+    if not chunks:
+        return {"chunks": 0, "cache_hits": 0, "cache_misses": 0}
     ids = [c["id"] for c in chunks]
-    vecs = await embed_texts(texts, model=model, api_key=api_key)
-    global_vector_index.upsert(ids, vecs)
\ No newline at end of file
+    hashes = [c.get("text_hash") or text_sha256(c["text"]) for c in chunks]
+    # Offline vectors are keyed separately so they never stand in for real ones
+    cache_model = model if api_key else "offline"
+    cache = global_embedding_cache if settings.EMBEDDING_CACHE_ENABLED else None
+    if conn is None:
+        # Cache lookups touch last_used and everything here writes: go through the writer
+        run = db.write
+    else:
+        async def run(fn, *args):
+            return fn(conn, *args)
+    found = await run(lambda c: cache.get_many(cache_model, hashes, conn=c)) if cache else {}
+    missing: Dict[str, str] = {}
+    for c, h in zip(chunks, hashes):
+        if h not in found:
+            missing.setdefault(h, c["text"])
+    if missing:
+        new_vecs = await embed_texts(list(missing.values()), model=model, api_key=api_key)
+        if cache:
+            await run(lambda c: cache.put_many(cache_model, list(missing.keys()), new_vecs, conn=c))
+        found.update(zip(missing.keys(), new_vecs))
+    vecs = np.stack([found[h] for h in hashes]).astype(np.float32, copy=False)
+    upsert = functools.partial(global_vector_index.upsert, ids, vecs, document_ids=[c.get("document_id") for c in chunks],
+                               sections=[c.get("section") for c in chunks], tags=[c.get("tags") for c in chunks])
+    if global_vector_index.upsert_in_thread:
+        await asyncio.to_thread(upsert)
+    else:
+        upsert()
+    bump_corpus_version()
+    if persist:
+        await run(persist_vectors, ids, vecs, settings.VECTOR_PERSIST_CODEC)
+    stats = {"chunks": len(chunks), "cache_hits": len(set(hashes)) - len(missing), "cache_misses": len(missing)}
+    logger.info(f"Embedded {stats['chunks']} chunks ({stats['cache_hits']} cached, {stats['cache_misses']} sent to the API)")
+    return stats
@@ -0,0 +1,90 @@
+import re
+from typing import List, Optional
+
+# Compiles free text into an FTS5 MATCH expression. User input is never passed
+# to MATCH as-is: punctuation such as "$2,000", "03-30-00", colons or a stray
+# quote is either an FTS5 syntax error or turns into an implicit AND of every
+# word, which both misses paraphrased clauses and makes SQLite intersect the
+# doclists of common words. Instead every token is emitted as a quoted string
+# (so AND/OR/NOT/NEAR and column filters in the input are just words), ordinary
+# words are OR'd with stopwords dropped and bm25 ranks chunks matching more of
+# them first, and only phrases the user quoted are required.
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be been before being below between both but by
+can could did do does doing down during each either few for from further had has have having here how i if
+in into is it its itself just may me might more most my no nor not of off on once only or other our out over
+own same should so some such than that the their them then there these they this those through to too under
+until up upon us very was we were what when where which while who whom why will with within without would
+you your
+""".split())
+
+# Longer queries are truncated; each extra OR term is another doclist to merge
+MAX_TERMS = 32
+
+# CSI MasterFormat numbers: "03 30 00", "03-30-00", "033000", optionally "03 30 00.13".
+# Separators must be consistent so "2024 01 01" is not read as a section.
+_CSI = r"(?<!\d)(?P<csi>\d{2})(?P<sep>[ .-]?)(?P<csi2>\d{2})(?P=sep)(?P<csi3>\d{2})(?:\.(?P<csi4>\d{2,3}))?(?!\d)"
+_TOKEN_REGEX = re.compile(
+    r'"(?P<phrase>[^"]*)"'
+    + "|" + _CSI
+    + r"|(?P<number>\d[\d,.]*\d|\d)"
+    + r"|(?P<word>[^\W_]+(?:['’-][^\W_]+)*)(?P<prefix>\*)?"
+)
+_PART_REGEX = re.compile(r"[^\W_]+")
+
+def _quote(tokens: List[str], phrases: bool) -> str:
+    if len(tokens) == 1:
+        return f'"{tokens[0]}"'
+    if phrases:
+        return '"' + " ".join(tokens) + '"'
+    # Without positions (detail=column/none) a phrase degrades to all of its tokens
+    return "(" + " AND ".join(f'"{t}"' for t in tokens) + ")"
+
+def compile_match(text: str, phrases: bool = True) -> Optional[str]:
+    """
+    The FTS5 expression for a user query, or None when it has nothing searchable.
+    Quoted phrases are required; CSI section numbers, numbers (split the way the
+    tokenizer splits "$2,000" into 2 and 000) and words are alternatives that
+    rank the matches. phrases is False when the index has no positions (detail
+    other than full).
+    """
+    required: List[str] = []
+    optional: List[str] = []
+    stopped: List[str] = []
+    seen = set()
+
+    def add(target: List[str], expr: str) -> None:
+        if expr not in seen:
+            seen.add(expr)
+            target.append(expr)
+
+    for m in _TOKEN_REGEX.finditer(text.lower()):
+        if m.group("phrase") is not None:
+            tokens = _PART_REGEX.findall(m.group("phrase"))
+            if tokens:
+                add(required, _quote(tokens, phrases))
+        elif m.group("csi"):
+            spaced = [m.group("csi"), m.group("csi2"), m.group("csi3")] + ([m.group("csi4")] if m.group("csi4") else [])
+            # Books print both "03 30 00" (three tokens) and "033000" (one)
+            joined = "".join(spaced[:3])
+            add(optional, f'({_quote(spaced, phrases)} OR "{joined}")' if len(spaced) == 3 else _quote(spaced, phrases))
+        elif m.group("number"):
+            add(optional, _quote(_PART_REGEX.findall(m.group("number")), phrases))
+        else:
+            tokens = _PART_REGEX.findall(m.group("word"))
+            expr = _quote(tokens, phrases) + ("*" if m.group("prefix") and len(tokens) == 1 else "")
+            if len(tokens) == 1 and tokens[0] in STOPWORDS:
+                add(stopped, expr)
+            else:
+                add(optional, expr)
+    # A query made only of stopwords ("to be or not to be") still searches them
+    optional = (optional or stopped)[:MAX_TERMS]
+    if not required:
+        return " OR ".join(optional) or None
+    if not optional:
+        return " AND ".join(required)
+    # Optional terms only rank: bm25 scores every phrase in the expression, and
+    # OR-ing the required phrases back in keeps chunks that match none of them
+    anchor = required[0]
+    return " AND ".join(required) + " AND (" + " OR ".join(optional + [anchor]) + ")"
@@ -0,0 +1,199 @@
+import bisect
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# A small in-process metrics registry rendered in the Prometheus text exposition
+# format (version 0.0.4) at /metrics. Metrics are updated from the event loop
+# and from read-pool and extraction threads, so every update takes a lock.
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 2048)
+RATE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+Labels = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Labels:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}", *self.samples()]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, v in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+
+class Gauge(_Metric):
+    """A gauge set directly, or read from collect() at scrape time."""
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 collect: Optional[Callable[[], Optional[float]]] = None):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+        self.collect = collect
+
+    def set(self, value: float, **labels: str) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def value(self, **labels: str) -> Optional[float]:
+        return self._values.get(self._key(labels))
+
+    def samples(self) -> Iterable[str]:
+        if self.collect is not None:
+            try:
+                value = self.collect()
+            except Exception as exc:
+                # A failing collector must not take the whole scrape down
+                logger.warning(f"Metric {self.name} collection failed: {exc}")
+                value = None
+            if value is not None:
+                yield f"{self.name} {_format_value(value)}"
+            return
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, v in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram; bucket counts are stored per bucket and summed when rendered."""
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Labels, List[float]] = {}  # per-bucket counts, then +Inf, sum
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def count(self, **labels: str) -> int:
+        series = self._series.get(self._key(labels))
+        return int(sum(series[:-1])) if series else 0
+
+    def sum(self, **labels: str) -> float:
+        series = self._series.get(self._key(labels))
+        return series[-1] if series else 0.0
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for key, series in items:
+            cumulative = 0.0
+            for bound, n in zip((*self.buckets, float("inf")), series):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {_format_value(cumulative)}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(series[-1])}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {_format_value(cumulative)}"
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+http_request_seconds = registry.register(Histogram(
+    "specscope_http_request_duration_seconds", "HTTP request latency by route template and status.",
+    ("method", "route", "status")))
+stage_seconds = registry.register(Histogram(
+    "specscope_stage_duration_seconds", "Time spent in each request stage (fts, embed, vector_scan, hydrate, rank, ...).",
+    ("route", "stage")))
+embedding_calls = registry.register(Counter(
+    "specscope_embedding_api_calls_total", "Embedding API requests, by outcome (ok, retried, failed).", ("outcome",)))
+embedding_batch_size = registry.register(Histogram(
+    "specscope_embedding_batch_size", "Texts per embedding API request.", (), BATCH_BUCKETS))
+embedding_texts = registry.register(Counter(
+    "specscope_embedding_texts_total", "Texts sent to the embedding API.", ()))
+ingest_pages = registry.register(Counter(
+    "specscope_ingest_pages_total", "Pages extracted, chunked and written.", ()))
+ingest_chunks = registry.register(Counter(
+    "specscope_ingest_chunks_total", "Chunks written by ingest.", ()))
+ingest_pages_per_second = registry.register(Histogram(
+    "specscope_ingest_pages_per_second", "Per-document ingest throughput, pages over wall time.", (), RATE_BUCKETS))
+
+def register_vector_index_gauges(index_getter: Callable[[], object]) -> None:
+    """Size and memory of the live vector index, read at scrape time."""
+    def size() -> float:
+        return float(len(index_getter()))
+
+    def memory() -> Optional[float]:
+        fn = getattr(index_getter(), "memory_bytes", None)
+        return float(fn()) if fn is not None else None
+
+    registry.register(Gauge("specscope_vector_index_vectors", "Live vectors in the index.", collect=size))
+    registry.register(Gauge("specscope_vector_index_memory_bytes", "Memory held by the vector index.", collect=memory))
+
+def server_timing(timings: Dict[str, float], total_ms: Optional[float] = None) -> str:
+    """A Server-Timing header value from stage timings in milliseconds."""
+    parts = [f"{name};dur={ms:.1f}" for name, ms in timings.items()]
+    if total_ms is not None:
+        parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts)
@@ -1,8 +1,12 @@
 import asyncio
-from typing import List, Tuple, Dict, Any
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Deque, List, Tuple, Dict, Any, Optional
 from dataclasses import dataclass
 import fitz  # PyMuPDF
 import re
+from ..config import settings
 from ..utils.patterns import CSI_DIVISION_REGEX, ADDENDA_REGEX
 
 @dataclass
@@ -12,6 +16,7 @@ class ExtractedPage:
     width: float
     height: float
     blocks: List[Dict[str, Any]]
+    section: str = ""
 
 def _detect_section_header(text: str) -> str:
     # Simple heuristic: first matching division or section-like header within first 500 chars
@@ -26,36 +31,78 @@ def _detect_section_header(text: str) -> str:
             return ln
     return ""
 
-async def extract_pdf(filepath: str, max_pages: int | None = None) -> Tuple[List[ExtractedPage], List[str]]:
+def _extract_page(page: "fitz.Page") -> ExtractedPage:
+    # One parse per page: the plain text is the text blocks (type 0) joined in order,
+    # which is what get_text("text") would return
+    blocks = page.get_text("blocks")
+    text = "".join(b[4] for b in blocks if b[6] == 0)
+    return ExtractedPage(
+        page_number=page.number + 1,
+        text=text,
+        width=page.rect.width,
+        height=page.rect.height,
+        blocks=[{"bbox": b[:4], "text": b[4]} for b in blocks],
+        section=_detect_section_header(text),
+    )
+
+def _extract_range(filepath: str, start: int, stop: int) -> List[ExtractedPage]:
+    """Extract pages [start, stop). Runs in worker processes, each with its own document handle."""
+    doc = fitz.open(filepath)
+    try:
+        return [_extract_page(doc.load_page(i)) for i in range(start, stop)]
+    finally:
+        doc.close()
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        # spawn, not fork: the server process has live threads and sqlite handles
+        _pool = ProcessPoolExecutor(max_workers=settings.MAX_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+def shutdown_extract_pool() -> None:
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+def page_ranges(total: int, per_task: int) -> List[Tuple[int, int]]:
+    per_task = max(1, per_task)
+    return [(start, min(start + per_task, total)) for start in range(0, total, per_task)]
+
+async def extract_pdf(filepath: str, max_pages: int | None = None) -> AsyncIterator[ExtractedPage]:
     """
-    Extract text, dimensions, and blocks from a PDF. Returns (pages, sections_per_page)
+    Stream extracted pages (text, dimensions, blocks, section header) in page order.
+    Large documents are split into page ranges extracted across a process pool, with
+    at most two ranges per worker in flight so a slow consumer holds extraction back.
     """
-    pages: List[ExtractedPage] = []
-    sections: List[str] = []
+    def _count() -> int:
+        with fitz.open(filepath) as doc:
+            return len(doc)
 
-    def _extract_sync() -> Tuple[List[ExtractedPage], List[str]]:
-        doc = fitz.open(filepath)
+    total = await asyncio.to_thread(_count)
+    if max_pages:
+        total = min(total, max_pages)
+    ranges = page_ranges(total, settings.PDF_PAGES_PER_TASK)
+    if settings.MAX_WORKERS > 1 and total >= settings.PDF_PARALLEL_MIN_PAGES:
+        loop = asyncio.get_running_loop()
+        pool = _get_pool()
+        pending: Deque[asyncio.Future] = deque()
         try:
-            total = len(doc)
-            if max_pages:
-                total = min(total, max_pages)
-            for i in range(total):
-                page = doc.load_page(i)
-                text = page.get_text("text")
-                blocks = page.get_text("blocks")
-                width, height = page.rect.width, page.rect.height
-                pages.append(
-                    ExtractedPage(
-                        page_number=i + 1,
-                        text=text,
-                        width=width,
-                        height=height,
-                        blocks=[{"bbox": b[:4], "text": b[4]} for b in blocks],
-                    )
-                )
-                sections.append(_detect_section_header(text))
+            for start, stop in ranges:
+                pending.append(loop.run_in_executor(pool, _extract_range, filepath, start, stop))
+                if len(pending) >= settings.MAX_WORKERS * 2:
+                    for page in await pending.popleft():
+                        yield page
+            while pending:
+                for page in await pending.popleft():
+                    yield page
         finally:
-            doc.close()
-        return pages, sections
-
-    return await asyncio.to_thread(_extract_sync)
\ No newline at end of file
+            for fut in pending:
+                fut.cancel()
+    else:
+        for start, stop in ranges:
+            for page in await asyncio.to_thread(_extract_range, filepath, start, stop):
+                yield page
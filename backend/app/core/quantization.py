@@ -0,0 +1,150 @@
+from typing import Optional
+import numpy as np
+
+# Every codec turns float32 vectors into fixed-width uint8 code rows, so the same
+# bytes serve as in-memory index storage and as chunk_vectors blobs.
+
+class Float32Codec:
+    """Lossless reference codec: the raw float32 bytes."""
+    name = "f32"
+    trained = True
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.code_size = dim * 4
+
+    def train(self, data: np.ndarray) -> None:
+        return
+
+    def encode(self, vecs: np.ndarray) -> np.ndarray:
+        return np.ascontiguousarray(vecs, dtype=np.float32).view(np.uint8).reshape(len(vecs), self.code_size)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        return np.ascontiguousarray(codes).view(np.float32).reshape(len(codes), self.dim)
+
+    def scores(self, q: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        return self.decode(codes) @ q
+
+class ScalarQuantizer:
+    """
+    int8 scalar quantization with one float32 scale per vector: a 4-byte scale
+    header followed by dim int8 codes, roughly 4x smaller than float32.
+    """
+    name = "sq8"
+    trained = True
+
+    def __init__(self, dim: int, block_rows: int = 16_384):
+        self.dim = dim
+        self.code_size = 4 + dim
+        self.block_rows = block_rows
+
+    def train(self, data: np.ndarray) -> None:
+        return
+
+    def encode(self, vecs: np.ndarray) -> np.ndarray:
+        vecs = np.asarray(vecs, dtype=np.float32)
+        scale = np.abs(vecs).max(axis=1) / 127.0
+        scale[scale == 0] = 1.0
+        codes = np.empty((len(vecs), self.code_size), dtype=np.uint8)
+        codes[:, :4] = scale.astype(np.float32).reshape(-1, 1).view(np.uint8)
+        codes[:, 4:] = np.clip(np.rint(vecs / scale[:, None]), -127, 127).astype(np.int8).view(np.uint8)
+        return codes
+
+    def _split(self, codes: np.ndarray):
+        scale = np.ascontiguousarray(codes[:, :4]).view(np.float32).ravel()
+        return scale, codes[:, 4:].view(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        scale, ints = self._split(codes)
+        return ints.astype(np.float32) * scale[:, None]
+
+    def scores(self, q: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        scale, ints = self._split(codes)
+        out = np.empty(len(codes), dtype=np.float32)
+        # Blocked so the float32 upcast of the int8 codes stays small
+        for start in range(0, len(codes), self.block_rows):
+            stop = start + self.block_rows
+            out[start:stop] = ints[start:stop].astype(np.float32) @ q
+        return out * scale
+
+def _kmeans_l2(data: np.ndarray, k: int, iters: int, rng: np.random.Generator) -> np.ndarray:
+    centroids = data[rng.choice(len(data), size=k, replace=False)].copy()
+    for _ in range(iters):
+        dists = (data ** 2).sum(1)[:, None] - 2 * data @ centroids.T + (centroids ** 2).sum(1)[None, :]
+        assign = np.argmin(dists, axis=1)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, data)
+        nonempty = counts > 0
+        centroids[nonempty] = sums[nonempty] / counts[nonempty, None]
+    return centroids
+
+class ProductQuantizer:
+    """
+    Product quantization: the vector is split into m sub-vectors, each replaced by
+    the index of its nearest of 256 trained centroids, so a vector costs m bytes.
+    Scoring is asymmetric: the float query is compared against the centroids once
+    per subspace and the code rows are scored with table lookups.
+    """
+    name = "pq"
+    ksub = 256
+
+    def __init__(self, dim: int, m: Optional[int] = None, iters: int = 12, seed: int = 0, block_rows: int = 65_536):
+        m = m or max(1, dim // 8)
+        if dim % m:
+            raise ValueError(f"PQ subquantizers ({m}) must divide dim ({dim})")
+        self.dim = dim
+        self.m = m
+        self.dsub = dim // m
+        self.code_size = m
+        self.iters = iters
+        self.seed = seed
+        self.block_rows = block_rows
+        self.codebooks: Optional[np.ndarray] = None  # (m, ksub, dsub)
+
+    @property
+    def trained(self) -> bool:
+        return self.codebooks is not None
+
+    def train(self, data: np.ndarray) -> None:
+        data = np.asarray(data, dtype=np.float32)
+        rng = np.random.default_rng(self.seed)
+        k = min(self.ksub, len(data))
+        books = np.zeros((self.m, self.ksub, self.dsub), dtype=np.float32)
+        for j in range(self.m):
+            books[j, :k] = _kmeans_l2(data[:, j * self.dsub:(j + 1) * self.dsub], k, self.iters, rng)
+            # With fewer training rows than centroids, pad with duplicates that argmin never prefers
+            books[j, k:] = books[j, 0]
+        self.codebooks = books
+
+    def encode(self, vecs: np.ndarray) -> np.ndarray:
+        vecs = np.asarray(vecs, dtype=np.float32)
+        codes = np.empty((len(vecs), self.m), dtype=np.uint8)
+        for j in range(self.m):
+            sub = vecs[:, j * self.dsub:(j + 1) * self.dsub]
+            book = self.codebooks[j]
+            dists = -2 * sub @ book.T + (book ** 2).sum(1)[None, :]
+            codes[:, j] = np.argmin(dists, axis=1)
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        parts = [self.codebooks[j][codes[:, j]] for j in range(self.m)]
+        return np.concatenate(parts, axis=1)
+
+    def scores(self, q: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        table = np.einsum("jkd,jd->jk", self.codebooks, q.reshape(self.m, self.dsub)).astype(np.float32)
+        out = np.empty(len(codes), dtype=np.float32)
+        cols = np.arange(self.m)
+        for start in range(0, len(codes), self.block_rows):
+            stop = start + self.block_rows
+            out[start:stop] = table[cols, codes[start:stop]].sum(axis=1)
+        return out
+
+CODECS = {"f32": Float32Codec, "sq8": ScalarQuantizer, "pq": ProductQuantizer}
+# Codecs whose blobs decode without any trained state
+BLOB_CODECS = ("f32", "sq8")
+
+def get_codec(name: str, dim: int, **kwargs):
+    if name not in CODECS:
+        raise ValueError(f"Unknown vector codec: {name}")
+    return CODECS[name](dim, **kwargs)
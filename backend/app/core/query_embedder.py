@@ -0,0 +1,143 @@
+import asyncio
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+import logging
+import numpy as np
+from ..config import settings
+from . import embeddings
+
+logger = logging.getLogger(__name__)
+
+EmbedFn = Callable[[List[str], str, Optional[str]], Awaitable[np.ndarray]]
+
+class _PendingBatch:
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.futures: Dict[str, asyncio.Future] = {}
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+class QueryEmbedder:
+    """
+    Coalesces query embeddings across concurrent requests. Queries arriving
+    within window_ms of each other (or max_batch at a time) share one embedding
+    call and each waiter gets its own row back. Recent query vectors are kept
+    in an LRU cache, since users repeat the same questions.
+    """
+    def __init__(self, embed_fn: Optional[EmbedFn] = None, window_ms: float = 5.0, max_batch: int = 64, cache_size: int = 4096):
+        self.embed_fn = embed_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[Tuple[str, bool, str], np.ndarray]" = OrderedDict()
+        self._pending: Dict[Tuple[str, Optional[str]], _PendingBatch] = {}
+        # Strong references: the loop only keeps weak ones to running tasks
+        self._tasks: Set[asyncio.Task] = set()
+        self.hits = 0
+        self.misses = 0
+        self.calls = 0
+        self.batched = 0
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "embed_calls": self.calls,
+            "avg_batch": self.batched / self.calls if self.calls else 0.0,
+        }
+
+    async def embed(self, text: str, model: str, api_key: Optional[str]) -> np.ndarray:
+        cache_key = (model, bool(api_key), text)
+        vec = self._cache.get(cache_key)
+        if vec is not None:
+            self._cache.move_to_end(cache_key)
+            self.hits += 1
+            return vec
+        self.misses += 1
+        group = (model, api_key)
+        loop = asyncio.get_running_loop()
+        batch = self._pending.get(group)
+        if batch is not None and batch.loop is not loop:
+            # Left behind by an event loop that closed before its timer fired
+            batch = None
+        if batch is None:
+            batch = self._pending[group] = _PendingBatch(loop)
+            batch.timer = loop.call_later(self.window, self._flush, group)
+        fut = batch.futures.get(text)
+        if fut is None:
+            fut = batch.futures[text] = loop.create_future()
+        if len(batch.futures) >= self.max_batch:
+            self._flush(group)
+        return await asyncio.shield(fut)
+
+    async def embed_many(self, texts: List[str], model: str, api_key: Optional[str]) -> np.ndarray:
+        """
+        Embed a list of queries at once (batch search): cached ones are reused
+        and the rest share a single embedding call. Rows follow texts.
+        """
+        vecs: Dict[str, np.ndarray] = {}
+        for text in texts:
+            cache_key = (model, bool(api_key), text)
+            vec = self._cache.get(cache_key)
+            if vec is not None:
+                self._cache.move_to_end(cache_key)
+                self.hits += 1
+                vecs[text] = vec
+        missing = [t for t in dict.fromkeys(texts) if t not in vecs]
+        if missing:
+            self.misses += len(missing)
+            self.calls += 1
+            self.batched += len(missing)
+            embed_fn = self.embed_fn or embeddings.embed_texts
+            for text, vec in zip(missing, await embed_fn(missing, model=model, api_key=api_key)):
+                self._remember((model, bool(api_key), text), vec)
+                vecs[text] = vec
+        return np.stack([vecs[t] for t in texts]) if texts else np.empty((0, 0), dtype=np.float32)
+
+    def _flush(self, group: Tuple[str, Optional[str]]) -> None:
+        batch = self._pending.pop(group, None)
+        if batch is None:
+            return
+        if batch.timer:
+            batch.timer.cancel()
+        task = batch.loop.create_task(self._run(group, batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, group: Tuple[str, Optional[str]], batch: _PendingBatch) -> None:
+        model, api_key = group
+        texts = list(batch.futures)
+        self.calls += 1
+        self.batched += len(texts)
+        embed_fn = self.embed_fn or embeddings.embed_texts
+        try:
+            vecs = await embed_fn(texts, model=model, api_key=api_key)
+        except BaseException as exc:
+            for fut in batch.futures.values():
+                if not fut.done():
+                    if isinstance(exc, asyncio.CancelledError):
+                        fut.cancel()
+                    else:
+                        fut.set_exception(exc)
+            # Waiters already have ordinary errors; only cancellation propagates
+            if not isinstance(exc, Exception):
+                raise
+            return
+        for text, vec in zip(texts, vecs):
+            self._remember((model, bool(api_key), text), vec)
+            fut = batch.futures[text]
+            if not fut.done():
+                fut.set_result(vec)
+
+    def _remember(self, key: Tuple[str, bool, str], vec: np.ndarray) -> None:
+        if self.cache_size <= 0:
+            return
+        self._cache[key] = vec
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+global_query_embedder = QueryEmbedder(
+    window_ms=settings.QUERY_EMBED_WINDOW_MS,
+    max_batch=settings.QUERY_EMBED_MAX_BATCH,
+    cache_size=settings.QUERY_EMBED_CACHE_SIZE,
+)
@@ -0,0 +1,90 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Bumped whenever searchable content changes (chunks written or embedded,
+# documents removed). Cached results remember the version they were computed
+# at and are dropped once it moves on. The counter is per process, so the TTL
+# bounds how long another process's ingest can go unnoticed.
+_corpus_version = 0
+
+def corpus_version() -> int:
+    return _corpus_version
+
+def bump_corpus_version() -> int:
+    global _corpus_version
+    _corpus_version += 1
+    return _corpus_version
+
+CacheKey = Tuple[str, int, float, str]
+
+class SearchResultCache:
+    """
+    Bounded LRU of hybrid search results keyed by (normalized query, top_k,
+    alpha, filters), with a TTL. Entries computed against an older corpus
+    version count as misses and are evicted on lookup.
+    """
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 300.0):
+        self.max_entries = max_entries
+        self.ttl = ttl_seconds
+        self._entries: "OrderedDict[CacheKey, Tuple[int, float, List[Dict[str, Any]]]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "stale": self.stale,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "corpus_version": corpus_version(),
+        }
+
+    @staticmethod
+    def key(query: str, top_k: int, alpha: float, filters: Optional[Dict[str, Any]]) -> CacheKey:
+        normalized = " ".join(query.split()).casefold()
+        # Order-insensitive, and empty filter lists mean no filter
+        canonical = {k: sorted(map(str, v)) if isinstance(v, (list, tuple, set)) else v
+                     for k, v in (filters or {}).items() if v}
+        return normalized, top_k, round(float(alpha), 6), json.dumps(canonical, sort_keys=True, default=str)
+
+    def get(self, key: CacheKey) -> Optional[List[Dict[str, Any]]]:
+        if self.max_entries <= 0:
+            return None
+        entry = self._entries.get(key)
+        if entry is not None:
+            version, stored_at, results = entry
+            if version == corpus_version() and time.monotonic() - stored_at < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                # Callers may annotate results; don't let that leak into the cache
+                return [dict(r) for r in results]
+            del self._entries[key]
+            self.stale += 1
+        self.misses += 1
+        return None
+
+    def put(self, key: CacheKey, results: List[Dict[str, Any]], version: int) -> None:
+        """Store results computed while the corpus was at version."""
+        if self.max_entries <= 0 or version != corpus_version():
+            return
+        self._entries[key] = (version, time.monotonic(), [dict(r) for r in results])
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+global_result_cache = SearchResultCache(settings.SEARCH_CACHE_SIZE, settings.SEARCH_CACHE_TTL_SECONDS)
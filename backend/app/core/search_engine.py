@@ -1,27 +1,54 @@
 from __future__ import annotations
+import asyncio
+import re
 import sqlite3
-from typing import List, Dict, Any, Tuple, Optional
+import time
+from contextlib import contextmanager
+from typing import AsyncIterator, Iterator, List, Dict, Any, Tuple, Optional
 import logging
 import numpy as np
 from ..config import sqlite_conn, settings
-from .embeddings import embed_texts, global_vector_index
+from . import db
+from .embeddings import global_vector_index
+from .fts_query import compile_match
+from ..utils.timing import ensure_timings, format_timings, stage
+from .query_embedder import global_query_embedder
 from ..utils.patterns import MODAL_VERBS_REGEX
+from ..utils.tags import filter_masks
 
 logger = logging.getLogger(__name__)
 
-def init_indices(conn: sqlite3.Connection) -> None:
-    # Ensure triggers for FTS5 content synchronization
-    conn.executescript(
-        """
+CHUNKS_AI_TRIGGER = """
         CREATE TRIGGER IF NOT EXISTS chunks_ai AFTER INSERT ON chunks BEGIN
-            INSERT INTO chunks_fts(rowid, text) VALUES (new.rowid, new.text);
+            INSERT INTO chunks_fts(rowid, text) SELECT chunk_rowid, text FROM chunks_text WHERE chunk_rowid = new.rowid;
         END;
+"""
+
+def init_indices(conn: sqlite3.Connection) -> None:
+    # Ensure triggers for FTS5 content synchronization. chunks_fts indexes
+    # chunks_text, which slices chunk text out of its page, so removing an entry
+    # needs the page as it was when the chunk was indexed: a page's chunks are
+    # deleted before the page is, and before its content is rewritten (keeping
+    # any whose text is unchanged at the same offsets).
+    conn.executescript(
+        CHUNKS_AI_TRIGGER + """
         CREATE TRIGGER IF NOT EXISTS chunks_ad AFTER DELETE ON chunks BEGIN
-            INSERT INTO chunks_fts(chunks_fts, rowid, text) VALUES('delete', old.rowid, old.text);
+            INSERT INTO chunks_fts(chunks_fts, rowid, text)
+            SELECT 'delete', old.rowid, page_slice(p.content, p.codec, old.char_start, old.char_end)
+            FROM pages p WHERE p.document_id = old.document_id AND p.page_number = old.page_number;
+        END;
+        CREATE TRIGGER IF NOT EXISTS chunks_au AFTER UPDATE OF document_id, page_number, char_start, char_end ON chunks BEGIN
+            INSERT INTO chunks_fts(chunks_fts, rowid, text)
+            SELECT 'delete', old.rowid, page_slice(p.content, p.codec, old.char_start, old.char_end)
+            FROM pages p WHERE p.document_id = old.document_id AND p.page_number = old.page_number;
+            INSERT INTO chunks_fts(rowid, text) SELECT chunk_rowid, text FROM chunks_text WHERE chunk_rowid = new.rowid;
         END;
-        CREATE TRIGGER IF NOT EXISTS chunks_au AFTER UPDATE ON chunks BEGIN
-            INSERT INTO chunks_fts(chunks_fts, rowid, text) VALUES('delete', old.rowid, old.text);
-            INSERT INTO chunks_fts(rowid, text) VALUES (new.rowid, new.text);
+        CREATE TRIGGER IF NOT EXISTS pages_bd BEFORE DELETE ON pages BEGIN
+            DELETE FROM chunks WHERE document_id = old.document_id AND page_number = old.page_number;
+        END;
+        CREATE TRIGGER IF NOT EXISTS pages_bu BEFORE UPDATE OF content, codec ON pages BEGIN
+            DELETE FROM chunks WHERE document_id = old.document_id AND page_number = old.page_number
+                AND page_slice(old.content, old.codec, char_start, char_end) IS NOT page_slice(new.content, new.codec, char_start, char_end);
         END;
         """
     )
@@ -29,23 +56,122 @@ def init_indices(conn: sqlite3.Connection) -> None:
 
 init_indices(sqlite_conn)
 
-def bm25_keyword_search(query: str, top_k: int, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
-    q = query
-    sql = """
-    SELECT c.*, bm25(chunks_fts) as kw_score
-    FROM chunks_fts
-    JOIN chunks c ON c.rowid = chunks_fts.rowid
-    WHERE chunks_fts MATCH ?
+@contextmanager
+def deferred_fts(conn: sqlite3.Connection, rebuild: bool = False) -> Iterator[None]:
+    """
+    Insert chunks without the per-row FTS trigger, then index them in one
+    statement: the new rowids with INSERT ... SELECT, or the whole table with an
+    FTS 'rebuild' for very large loads. Runs inside the caller's transaction
+    (opened here if needed), so a rollback also restores the trigger.
+    """
+    if not conn.in_transaction:
+        conn.execute("BEGIN")
+    last_rowid = conn.execute("SELECT IFNULL(MAX(rowid), 0) FROM chunks").fetchone()[0]
+    conn.execute("DROP TRIGGER IF EXISTS chunks_ai")
+    yield
+    if rebuild:
+        conn.execute("INSERT INTO chunks_fts(chunks_fts) VALUES('rebuild')")
+    else:
+        conn.execute("INSERT INTO chunks_fts(rowid, text) SELECT chunk_rowid, text FROM chunks_text WHERE chunk_rowid > ?", (last_rowid,))
+    conn.execute(CHUNKS_AI_TRIGGER)
+
+def fts_merge_step(conn: sqlite3.Connection, pages: int, optimize: bool = False) -> bool:
+    """
+    One bounded FTS5 'merge' of about `pages` index pages; True if it did any
+    work. A negative page count lets segments of every level merge, so repeating
+    optimize steps until they stop working amounts to an incremental 'optimize'
+    that never holds the writer for long.
+    """
+    before = conn.total_changes
+    with conn:
+        conn.execute("INSERT INTO chunks_fts(chunks_fts, rank) VALUES('merge', ?)", (-pages if optimize else pages,))
+    return conn.total_changes - before >= 2
+
+class FtsMaintenance:
+    """
+    Merges FTS segments in the background once ingest goes quiet. Every deferred
+    batch write adds a segment (and deletes add tombstones), so after a bulk load
+    queries walk many small b-trees. Once no chunks have been written for
+    idle_seconds, merge steps run through the writer one at a time, interleaving
+    with other writes; after optimize_chunks chunks, the index is fully optimized.
+    """
+    def __init__(self, idle_seconds: float = 30.0, merge_pages: int = 256, optimize_chunks: int = 50000):
+        self.idle_seconds = idle_seconds
+        self.merge_pages = merge_pages
+        self.optimize_chunks = optimize_chunks
+        self.pending_chunks = 0
+        self._last_write = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def notify(self, chunks: int) -> None:
+        """Record chunks written or removed; called from the event loop."""
+        if chunks <= 0:
+            return
+        self.pending_chunks += chunks
+        self._last_write = time.monotonic()
+        loop = asyncio.get_running_loop()
+        # A task left behind by an event loop that has since closed never runs
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._task = loop.create_task(self._wait_and_run())
+
+    async def _wait_and_run(self) -> None:
+        while (remaining := self._last_write + self.idle_seconds - time.monotonic()) > 0:
+            await asyncio.sleep(remaining)
+        try:
+            await self.run()
+        except Exception:
+            logger.exception("FTS maintenance failed")
+
+    async def run(self) -> Dict[str, int]:
+        optimize = self.pending_chunks >= self.optimize_chunks
+        if optimize:
+            self.pending_chunks = 0
+        start = time.perf_counter()
+        steps = 0
+        while await db.write(fts_merge_step, self.merge_pages, optimize):
+            steps += 1
+        logger.info(f"FTS {'optimize' if optimize else 'merge'}: {steps} steps in {time.perf_counter() - start:.2f}s")
+        return {"steps": steps, "optimized": int(optimize)}
+
+    def cancel(self) -> None:
+        if self._task is not None and not self._task.get_loop().is_closed():
+            self._task.cancel()
+
+fts_maintenance = FtsMaintenance(settings.FTS_MAINTENANCE_IDLE_SECONDS, settings.FTS_MERGE_PAGES, settings.FTS_OPTIMIZE_CHUNKS)
+
+# A chunk row's text (chunks c joined to its page p); chunks store only offsets
+CHUNK_TEXT = "page_slice(p.content, p.codec, c.char_start, c.char_end)"
+CHUNK_PAGE_JOIN = "JOIN pages p ON p.document_id = c.document_id AND p.page_number = c.page_number"
+
+# chunks column matched by each search filter key
+FILTER_COLUMNS = {"doc_ids": "document_id", "sections": "section"}
+
+def bm25_keyword_search(query: str, top_k: int, filters: Optional[Dict[str, Any]] = None, conn: Optional[sqlite3.Connection] = None) -> List[Dict[str, Any]]:
+    match = compile_match(query, phrases=settings.FTS_DETAIL == "full")
+    if match is None:
+        return []
+    # Rank and limit on rowids alone, then read just the top_k chunk rows rather
+    # than sorting every match with its text attached
+    where = "chunks_fts MATCH ?"
+    params: List[Any] = [match]
+    # Same filter keys the vector scan applies (see FILTER_FIELDS and TAG_FILTERS)
+    for key, column in FILTER_COLUMNS.items():
+        values = (filters or {}).get(key)
+        if values:
+            where += f" AND rowid IN (SELECT rowid FROM chunks WHERE {column} IN ({','.join('?' * len(values))}))"
+            params.extend(values)
+    for mask in filter_masks(filters).values():
+        where += " AND rowid IN (SELECT rowid FROM chunks WHERE tags & ? != 0)"
+        params.append(mask)
+    sql = f"""
+    SELECT c.*, {CHUNK_TEXT} AS text, f.kw_score
+    FROM (SELECT rowid, bm25(chunks_fts) AS kw_score FROM chunks_fts WHERE {where} ORDER BY kw_score LIMIT ?) f
+    JOIN chunks c ON c.rowid = f.rowid
+    {CHUNK_PAGE_JOIN}
+    ORDER BY f.kw_score
     """
-    params = [q]
-    # Filters by document_id
-    if filters and filters.get("doc_ids"):
-        placeholders = ",".join("?" * len(filters["doc_ids"]))
-        sql += f" AND c.document_id IN ({placeholders})"
-        params.extend(filters["doc_ids"])
-    sql += " ORDER BY kw_score LIMIT ?"
     params.append(top_k)
-    cur = sqlite_conn.execute(sql, params)
+    cur = (conn or sqlite_conn).execute(sql, params)
     rows = cur.fetchall()
     results = []
     for r in rows:
@@ -58,15 +184,22 @@ def bm25_keyword_search(query: str, top_k: int, filters: Optional[Dict[str, Any]
             "text": r["text"],
             "char_start": r["char_start"],
             "char_end": r["char_end"],
+            "has_modal": r["has_modal"],
             "keyword_score": float(r["kw_score"]),
         })
     return results
 
 async def vector_search(query: str, top_k: int, filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
-    vec = (await embed_texts([query], model=settings.EMBEDDING_MODEL, api_key=settings.OPENAI_API_KEY))[0]
-    sims = global_vector_index.query(vec, top_k=top_k)
-    # Note: filters applied later in merge (we don't store doc ids in vector index)
-    return sims
+    # Coalesced with concurrent requests' queries and cached
+    with stage("embed"):
+        vec = await global_query_embedder.embed(query, model=settings.EMBEDDING_MODEL, api_key=settings.OPENAI_API_KEY)
+    # Filters are applied inside the index scan, so a filtered query still gets a full top_k
+    with stage("vector_scan"):
+        return await global_vector_index.aquery(vec, top_k=top_k, filters=filters)
+
+def fetch_chunks(conn: sqlite3.Connection, ids: List[str]) -> List[sqlite3.Row]:
+    placeholders = ",".join("?" * len(ids))
+    return conn.execute(f"SELECT c.*, {CHUNK_TEXT} AS text FROM chunks c {CHUNK_PAGE_JOIN} WHERE c.id IN ({placeholders})", ids).fetchall()
 
 def normalize_scores(values: List[float]) -> List[float]:
     if not values:
@@ -77,28 +210,92 @@ def normalize_scores(values: List[float]) -> List[float]:
     return [(v - lo) / (hi - lo) for v in values]
 
 async def hybrid_search(query: str, top_k: int, alpha: float, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    timings = ensure_timings()
+    vec_k = top_k * 2
+    kw_k = top_k * 2
+
+    async def keyword_branch() -> List[Dict[str, Any]]:
+        with stage("fts"):
+            return await db.read(lambda conn: bm25_keyword_search(query, kw_k, filters, conn))
+
+    async def vector_branch() -> Tuple[List[Tuple[str, float]], List[sqlite3.Row]]:
+        sims = await vector_search(query, vec_k, filters)
+        if not sims:
+            return sims, []
+        # Hydrate every vector hit in one round trip, still overlapping the FTS query
+        with stage("hydrate"):
+            return sims, await db.read(fetch_chunks, [cid for cid, _ in sims])
+
+    # The FTS query runs on a read-pool thread while the loop embeds and scans
+    kw_results, (vect_sims, vec_rows) = await asyncio.gather(keyword_branch(), vector_branch())
+    results = rank_results(query, top_k, alpha, kw_results, vect_sims, vec_rows)
+    logger.info(f"Search stages: {format_timings(timings)}")
+    return results
+
+async def hybrid_search_batch(queries: List[str], top_k: int, alpha: float,
+                              filters: Optional[Dict[str, Any]] = None) -> AsyncIterator[Tuple[int, List[Dict[str, Any]]]]:
+    """
+    hybrid_search for a list of queries, yielding (position, results) as each
+    query's FTS search finishes. All FTS queries are queued on the read pool up
+    front; meanwhile the queries are embedded in one call, scored against the
+    index together (one matrix-matrix product per block of rows) and every
+    vector hit is hydrated in one round trip.
+    """
+    timings = ensure_timings()
     vec_k = top_k * 2
     kw_k = top_k * 2
-    kw_results = bm25_keyword_search(query, kw_k, filters)
-    vect_sims = await vector_search(query, vec_k, filters)
-    # Build map for vector sims
-    vec_map = {cid: score for cid, score in vect_sims}
-    # Merge by chunk id
-    candidates: Dict[str, Dict[str, Any]] = {}
-    # Seed with keyword
-    for r in kw_results:
-        candidates[r["chunk_id"]] = {
-            **r,
-            "vector_score": vec_map.get(r["chunk_id"], 0.0)
-        }
-    # Add vector-only hits
-    if vec_map:
-        placeholders = ",".join("?" * len(vec_map))
-        cur = sqlite_conn.execute(f"SELECT * FROM chunks WHERE id IN ({placeholders})", list(vec_map.keys()))
-        for row in cur.fetchall():
+    # At most one FTS query per read thread in flight, so the hydrate read is
+    # not queued behind the whole batch
+    slots = asyncio.Semaphore(max(1, db.read_pool.size))
+
+    def keyword_search(conn: sqlite3.Connection, query: str) -> Tuple[List[Dict[str, Any]], float]:
+        start = time.perf_counter()
+        return bm25_keyword_search(query, kw_k, filters, conn), (time.perf_counter() - start) * 1000.0
+
+    async def keyword_branch(query: str) -> List[Dict[str, Any]]:
+        async with slots:
+            results, ms = await db.read(keyword_search, query)
+        # Summed over queries, so it can exceed the request's wall time
+        timings["fts"] = timings.get("fts", 0.0) + ms
+        return results
+
+    pending = {asyncio.ensure_future(keyword_branch(q)): i for i, q in enumerate(queries)}
+    try:
+        with stage("embed"):
+            vecs = await global_query_embedder.embed_many(queries, model=settings.EMBEDDING_MODEL, api_key=settings.OPENAI_API_KEY)
+        with stage("vector_scan"):
+            sims = await global_vector_index.aquery_batch(vecs, vec_k, filters)
+        ids = list(dict.fromkeys(cid for hits in sims for cid, _ in hits))
+        with stage("hydrate"):
+            rows = {r["id"]: r for r in (await db.read(fetch_chunks, ids) if ids else [])}
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                i = pending.pop(task)
+                vec_rows = [rows[cid] for cid, _ in sims[i] if cid in rows]
+                yield i, rank_results(queries[i], top_k, alpha, task.result(), sims[i], vec_rows)
+    finally:
+        # The caller stopped early or something failed: drop the queued FTS queries
+        for task in pending:
+            task.cancel()
+        logger.info(f"Batch search of {len(queries)} queries, stages: {format_timings(timings)}")
+
+def rank_results(query: str, top_k: int, alpha: float, kw_results: List[Dict[str, Any]],
+                 vect_sims: List[Tuple[str, float]], vec_rows: List[sqlite3.Row]) -> List[Dict[str, Any]]:
+    with stage("rank"):
+        # Build map for vector sims
+        vec_map = {cid: score for cid, score in vect_sims}
+        # Merge by chunk id
+        candidates: Dict[str, Dict[str, Any]] = {}
+        # Seed with keyword
+        for r in kw_results:
+            candidates[r["chunk_id"]] = {
+                **r,
+                "vector_score": vec_map.get(r["chunk_id"], 0.0)
+            }
+        # Add vector-only hits
+        for row in vec_rows:
             cid = row["id"]
-            if filters and filters.get("doc_ids") and row["document_id"] not in set(filters["doc_ids"]):
-                continue
             if cid not in candidates:
                 candidates[cid] = {
                     "chunk_id": row["id"],
@@ -109,61 +306,96 @@ async def hybrid_search(query: str, top_k: int, alpha: float, filters: Optional[
                     "text": row["text"],
                     "char_start": row["char_start"],
                     "char_end": row["char_end"],
+                    "has_modal": row["has_modal"],
                     "keyword_score": 0.0,
                     "vector_score": vec_map.get(cid, 0.0)
                 }
-    # Normalize
-    kw_norm = normalize_scores([c["keyword_score"] for c in candidates.values()])
-    vec_norm = normalize_scores([c["vector_score"] for c in candidates.values()])
-    for (c, k, v) in zip(candidates.values(), kw_norm, vec_norm):
-        c["keyword_norm"] = k
-        c["vector_norm"] = v
-        c["hybrid"] = alpha * v + (1 - alpha) * k
-    # Deterministic tie-breakers
-    items = list(candidates.values())
-    items.sort(key=lambda x: (x["hybrid"], x["keyword_norm"], -x["page_number"]), reverse=True)
-    # Build snippets and highlights
-    results = []
-    for it in items[:top_k]:
-        highlights = []
-        # basic keyword highlights: split query words >3 chars
-        for w in set([w for w in re_split_words(query) if len(w) > 3]):
-            if w.lower() in it["text"].lower():
-                highlights.append(w)
-        # Confidence mapping
-        conf = map_confidence(it["hybrid"], it["text"])
-        results.append({
-            "chunk_id": it["chunk_id"],
-            "document_id": it["document_id"],
-            "filename": it["filename"],
-            "page_number": it["page_number"],
-            "section": it["section"],
-            "snippet": build_snippet(it["text"], highlights),
-            "highlights": highlights,
-            "scores": {"vector": it["vector_norm"], "keyword": it["keyword_norm"], "hybrid": it["hybrid"]},
-            "confidence": conf
-        })
+        # Normalize
+        kw_norm = normalize_scores([c["keyword_score"] for c in candidates.values()])
+        vec_norm = normalize_scores([c["vector_score"] for c in candidates.values()])
+        for (c, k, v) in zip(candidates.values(), kw_norm, vec_norm):
+            c["keyword_norm"] = k
+            c["vector_norm"] = v
+            c["hybrid"] = alpha * v + (1 - alpha) * k
+        # Deterministic tie-breakers
+        items = list(candidates.values())
+        items.sort(key=lambda x: (x["hybrid"], x["keyword_norm"], -x["page_number"]), reverse=True)
+    with stage("snippet"):
+        # Build snippets and highlights: each result's text is lowercased once
+        terms = highlight_terms(query)
+        pattern = compile_highlighter(terms)
+        results = []
+        for it in items[:top_k]:
+            highlights, pos = find_highlights(it["text"], terms, pattern)
+            # Confidence mapping
+            conf = map_confidence(it["hybrid"], it["text"], it["has_modal"])
+            results.append({
+                "chunk_id": it["chunk_id"],
+                "document_id": it["document_id"],
+                "filename": it["filename"],
+                "page_number": it["page_number"],
+                "section": it["section"],
+                "snippet": build_snippet(it["text"], highlights, pos=pos),
+                "highlights": highlights,
+                "scores": {"vector": it["vector_norm"], "keyword": it["keyword_norm"], "hybrid": it["hybrid"]},
+                "confidence": conf
+            })
     return results
 
+WORD_REGEX = re.compile(r"[A-Za-z0-9_]+")
+
 def re_split_words(q: str) -> List[str]:
-    import re
-    return re.findall(r"[A-Za-z0-9_]+", q)
+    return WORD_REGEX.findall(q)
 
-def build_snippet(text: str, highlights: List[str], window: int = 200) -> str:
+def highlight_terms(query: str) -> Dict[str, str]:
+    """Query words worth highlighting (over 3 chars), lowercased -> first spelling used."""
+    terms: Dict[str, str] = {}
+    for w in re_split_words(query):
+        if len(w) > 3:
+            terms.setdefault(w.lower(), w)
+    return terms
+
+def compile_highlighter(terms: Dict[str, str]) -> Optional[re.Pattern]:
+    """One alternation over the lowercased terms, longest first so overlaps resolve to the longer word."""
+    if not terms:
+        return None
+    return re.compile("|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True)))
+
+def find_highlights(text: str, terms: Dict[str, str], pattern: Optional[re.Pattern]) -> Tuple[List[str], int]:
+    """
+    Terms that occur in text (as substrings, like before) in query order, and the
+    offset of the earliest one (-1 if none). The text is lowercased once; the
+    membership tests and the alternation search then run in C, which beats a
+    case-insensitive finditer that visits every match in Python.
+    """
+    if pattern is None:
+        return [], -1
+    low = text.lower()
+    highlights = [w for t, w in terms.items() if t in low]
     if not highlights:
+        return [], -1
+    return highlights, pattern.search(low).start()
+
+def build_snippet(text: str, highlights: List[str], window: int = 200, pos: Optional[int] = None) -> str:
+    """Window of text around pos, or around the first highlight found when pos isn't given."""
+    if pos is None and highlights:
+        t_low = text.lower()
+        for h in highlights:
+            idx = t_low.find(h.lower())
+            if idx != -1:
+                pos = idx
+                break
+    if pos is None or pos < 0:
         return text[:window].strip()
-    # pick first highlight
-    t_low = text.lower()
-    for h in highlights:
-        idx = t_low.find(h.lower())
-        if idx != -1:
-            start = max(0, idx - window // 2)
-            end = min(len(text), idx + window // 2)
-            return text[start:end].strip()
-    return text[:window].strip()
-
-def map_confidence(hybrid: float, text: str) -> float:
+    start = max(0, pos - window // 2)
+    end = min(len(text), pos + window // 2)
+    return text[start:end].strip()
+
+def map_confidence(hybrid: float, text: str, has_modal: Optional[bool] = None) -> float:
     base = hybrid
-    if MODAL_VERBS_REGEX.search(text):
+    # has_modal is precomputed at ingest; only rows from before it existed fall back to the regex
+    if has_modal is None:
+        has_modal = bool(MODAL_VERBS_REGEX.search(text))
+    if has_modal:
         base = min(1.0, base + 0.15)
-    return max(0.0, min(1.0, base))
\ No newline at end of file
+    return max(0.0, min(1.0, base))
@@ -1,6 +1,8 @@
 from typing import List, Dict, Any, Tuple
 from hashlib import sha256
 from dataclasses import dataclass
+from ..utils.patterns import MODAL_VERBS_REGEX
+from ..utils.tags import chunk_tags
 
 @dataclass
 class ChunkSpec:
@@ -21,10 +23,12 @@ def deterministic_chunks(text: str, target_tokens: int = 300, overlap_tokens: in
     n = len(text)
     while start < n:
         end = min(n, start + target_chars)
-        # Try to end at nearest newline before end, but not before start
-        newline_pos = text.rfind("\n", start, end)
-        if newline_pos > start + 50:
-            end = newline_pos
+        # Try to end at nearest newline before end, but not before start; the last
+        # window runs to the end of the text, otherwise it never terminates early
+        if end < n:
+            newline_pos = text.rfind("\n", start, end)
+            if newline_pos > start + 50:
+                end = newline_pos
         chunks.append(ChunkSpec(start=start, end=end))
         if end >= n:
             break
@@ -36,7 +40,8 @@ def chunk_page(document_id: str, filename: str, page_number: int, section: str,
     result = []
     for spec in specs:
         span = text[spec.start:spec.end]
-        h = sha256(f"{document_id}:{page_number}:{spec.start}:{spec.end}:{sha256(span.encode()).hexdigest()}".encode()).hexdigest()
+        text_hash = sha256(span.encode()).hexdigest()
+        h = sha256(f"{document_id}:{page_number}:{spec.start}:{spec.end}:{text_hash}".encode()).hexdigest()
         result.append({
             "id": h,
             "document_id": document_id,
@@ -46,6 +51,11 @@ def chunk_page(document_id: str, filename: str, page_number: int, section: str,
             "text": span,
             "char_start": spec.start,
             "char_end": spec.end,
-            "hash": h
+            "hash": h,
+            "text_hash": text_hash,
+            # Feeds result confidence; computed once here rather than per query
+            "has_modal": bool(MODAL_VERBS_REGEX.search(span)),
+            # Topic and division bits for the topics/divisions search filters
+            "tags": chunk_tags(span, section),
         })
     return result
\ No newline at end of file
@@ -0,0 +1,291 @@
+import bisect
+import json
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import logging
+import numpy as np
+from .embeddings import BaseVectorIndex, CodeBook, FILTER_FIELDS, TAGS_FIELD, merge_top_k, normalize_rows, sorted_top_k
+from ..utils.tags import filter_masks
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - non-POSIX
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class _Segment:
+    number: int
+    ids: List[str] = field(default_factory=list)
+    alive: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=bool))
+    meta: Dict[str, np.ndarray] = field(default_factory=lambda: {**{f: np.zeros(0, dtype=np.int32) for f in FILTER_FIELDS.values()},
+                                                                 TAGS_FIELD: np.zeros(0, dtype=np.int64)})
+    ids_offset: int = 0
+    vectors: Optional[np.memmap] = None
+
+    @property
+    def rows(self) -> int:
+        return len(self.ids)
+
+def _sidecar_field(value: Optional[str]) -> str:
+    return "" if value is None else value.replace("\t", " ").replace("\n", " ")
+
+class MmapVectorIndex(BaseVectorIndex):
+    """
+    On-disk vector index for corpora larger than RAM.
+
+    Vectors are unit-normalized and appended to raw float32 segment files
+    (seg-NNNNN.f32) with a sidecar (seg-NNNNN.ids) holding one
+    "chunk_id<TAB>document_id<TAB>section<TAB>tags" line per row (sidecars
+    written before tags have three fields and read as untagged). Segments are
+    opened read-only with np.memmap, so every worker process maps the same pages
+    from the OS page cache instead of holding its own copy. Re-upserting an id
+    appends a new row that supersedes the old one; deletes append row positions
+    to tombstones.log. Files are only ever appended to, and each process picks
+    up writes from other processes on its next call.
+    """
+    persistent = True
+
+    def __init__(self, path: str, segment_rows: int = 262_144, block_rows: int = 65_536):
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.segment_rows = segment_rows
+        self.block_rows = block_rows
+        self.dim: Optional[int] = None
+        self._segments: List[_Segment] = []
+        self._rows: Dict[str, Tuple[int, int]] = {}
+        self._vocab = {f: CodeBook() for f in FILTER_FIELDS.values()}
+        self._tombstones_offset = 0
+        self._lock = threading.RLock()
+        self._refresh()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._rows)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return chunk_id in self._rows
+
+    def _segment_path(self, number: int, suffix: str) -> Path:
+        return self.path / f"seg-{number:05d}.{suffix}"
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        with self._lock, open(self.path / ".lock", "a") as fh:
+            if fcntl:
+                fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def _mark_dead(self, seg: int, row: int) -> None:
+        segment = self._segments[seg]
+        segment.alive[row] = False
+        cid = segment.ids[row]
+        if self._rows.get(cid) == (seg, row):
+            del self._rows[cid]
+
+    def _refresh(self) -> None:
+        """Pick up rows and tombstones appended since the last refresh."""
+        if self.dim is None:
+            meta = self.path / "index.json"
+            if not meta.exists():
+                return
+            self.dim = int(json.loads(meta.read_text())["dim"])
+        row_bytes = self.dim * 4
+        number = len(self._segments) - 1 if self._segments else 0
+        while self._segment_path(number, "f32").exists():
+            if number >= len(self._segments):
+                self._segments.append(_Segment(number))
+            self._refresh_segment(self._segments[number], row_bytes)
+            number += 1
+        tomb_path = self.path / "tombstones.log"
+        if tomb_path.exists() and tomb_path.stat().st_size > self._tombstones_offset:
+            with open(tomb_path, "rb") as fh:
+                fh.seek(self._tombstones_offset)
+                data = fh.read()
+            complete = data[:data.rfind(b"\n") + 1]
+            self._tombstones_offset += len(complete)
+            for line in complete.decode().splitlines():
+                seg, row = line.split()
+                self._mark_dead(int(seg), int(row))
+
+    def _refresh_segment(self, segment: _Segment, row_bytes: int) -> None:
+        ids_path = self._segment_path(segment.number, "ids")
+        if not ids_path.exists() or ids_path.stat().st_size <= segment.ids_offset:
+            return
+        with open(ids_path, "rb") as fh:
+            fh.seek(segment.ids_offset)
+            data = fh.read()
+        # The id line is written after its vector, so a complete line marks a committed row
+        complete = data[:data.rfind(b"\n") + 1]
+        lines = complete.decode().splitlines()
+        vec_rows = self._segment_path(segment.number, "f32").stat().st_size // row_bytes
+        lines = lines[:max(0, vec_rows - segment.rows)]
+        if not lines:
+            return
+        segment.ids_offset += len(complete)
+        fields = [(line.split("\t") + ["", "", ""])[:4] for line in lines]
+        new_ids = [f[0] for f in fields]
+        start = segment.rows
+        segment.ids.extend(new_ids)
+        segment.alive = np.concatenate([segment.alive, np.ones(len(new_ids), dtype=bool)])
+        for col, name in ((1, "document"), (2, "section")):
+            codes = self._vocab[name].encode([f[col] or None for f in fields])
+            segment.meta[name] = np.concatenate([segment.meta[name], codes])
+        tags = np.array([int(f[3] or 0) for f in fields], dtype=np.int64)
+        segment.meta[TAGS_FIELD] = np.concatenate([segment.meta[TAGS_FIELD], tags])
+        for row, cid in enumerate(new_ids, start=start):
+            prev = self._rows.get(cid)
+            if prev is not None:
+                self._segments[prev[0]].alive[prev[1]] = False
+            self._rows[cid] = (segment.number, row)
+        segment.vectors = np.memmap(self._segment_path(segment.number, "f32"), dtype=np.float32, mode="r", shape=(segment.rows, self.dim))
+
+    def upsert(self, ids: List[str], vectors: np.ndarray, document_ids: Optional[List[Optional[str]]] = None,
+               sections: Optional[List[Optional[str]]] = None, tags: Optional[List[int]] = None) -> None:
+        if not ids:
+            return
+        vecs = normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(len(ids), -1))
+        latest = {cid: i for i, cid in enumerate(ids)}
+        src = list(latest.values())
+        lines = [
+            f"{ids[i]}\t{_sidecar_field(document_ids[i] if document_ids else None)}\t{_sidecar_field(sections[i] if sections else None)}"
+            f"\t{(tags[i] or 0) if tags else 0}\n"
+            for i in src
+        ]
+        vecs = vecs[src]
+        with self._file_lock():
+            self._refresh()
+            if self.dim is None:
+                self.dim = vecs.shape[1]
+                (self.path / "index.json").write_text(json.dumps({"dim": self.dim}))
+            elif vecs.shape[1] != self.dim:
+                raise ValueError(f"Vector dim {vecs.shape[1]} does not match index dim {self.dim}")
+            pos = 0
+            while pos < len(lines):
+                number = self._segments[-1].number if self._segments else 0
+                rows = self._segments[-1].rows if self._segments else 0
+                ids_offset = self._segments[-1].ids_offset if self._segments else 0
+                if rows >= self.segment_rows:
+                    number, rows, ids_offset = number + 1, 0, 0
+                take = min(len(lines) - pos, self.segment_rows - rows)
+                # A writer that died mid-append can leave vector bytes (or half an id
+                # line) past the last committed row; cut them off first so the new
+                # vectors line up with their id lines
+                with open(self._segment_path(number, "f32"), "ab") as fh:
+                    if fh.tell() != rows * self.dim * 4:
+                        fh.truncate(rows * self.dim * 4)
+                    fh.write(vecs[pos:pos + take].tobytes())
+                with open(self._segment_path(number, "ids"), "ab") as fh:
+                    if fh.tell() != ids_offset:
+                        fh.truncate(ids_offset)
+                    fh.write("".join(lines[pos:pos + take]).encode())
+                pos += take
+                self._refresh()
+
+    def delete(self, ids: List[str]) -> int:
+        with self._file_lock():
+            self._refresh()
+            positions = [self._rows[cid] for cid in ids if cid in self._rows]
+            if positions:
+                with open(self.path / "tombstones.log", "a") as fh:
+                    fh.write("".join(f"{seg} {row}\n" for seg, row in positions))
+                self._refresh()
+            return len(positions)
+
+    def _segment_rows(self, segment: _Segment, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """Live rows of a segment matching the filters, or None when nothing is filtered."""
+        mask = None
+        for key, name in FILTER_FIELDS.items():
+            values = (filters or {}).get(key)
+            if not values:
+                continue
+            wanted = self._vocab[name].lookup([_sidecar_field(v) for v in values])
+            m = np.isin(segment.meta[name], wanted)
+            mask = m if mask is None else mask & m
+        for bits in filter_masks(filters).values():
+            m = (segment.meta[TAGS_FIELD] & bits) != 0
+            mask = m if mask is None else mask & m
+        if mask is None:
+            return None
+        return np.flatnonzero(mask & segment.alive)
+
+    def query(self, query_vec: np.ndarray, top_k: int, filters: Optional[Dict[str, Any]] = None) -> List[Tuple[str, float]]:
+        with self._lock:
+            self._refresh()
+            if top_k <= 0 or not self._rows:
+                return []
+            q = np.asarray(query_vec, dtype=np.float32).ravel()
+            q = q / (np.linalg.norm(q) + 1e-8)
+            cand_ids: List[str] = []
+            cand_scores: List[np.ndarray] = []
+            for segment in self._segments:
+                allowed = self._segment_rows(segment, filters)
+                if allowed is not None:
+                    # Gather only the matching rows, a block at a time
+                    for start in range(0, len(allowed), self.block_rows):
+                        rows = allowed[start:start + self.block_rows]
+                        scores = np.asarray(segment.vectors[rows] @ q)
+                        k = min(top_k, len(scores))
+                        idx = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+                        cand_ids.extend(segment.ids[rows[i]] for i in idx)
+                        cand_scores.append(scores[idx])
+                    continue
+                for start in range(0, segment.rows, self.block_rows):
+                    stop = min(segment.rows, start + self.block_rows)
+                    scores = np.asarray(segment.vectors[start:stop] @ q)
+                    scores[~segment.alive[start:stop]] = -np.inf
+                    k = min(top_k, len(scores))
+                    idx = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+                    idx = idx[np.isfinite(scores[idx])]
+                    cand_ids.extend(segment.ids[start + i] for i in idx)
+                    cand_scores.append(scores[idx])
+            if not cand_ids:
+                return []
+            scores = np.concatenate(cand_scores)
+            order = np.argsort(-scores, kind="stable")[:top_k]
+            return [(cand_ids[i], float(scores[i])) for i in order]
+
+    def query_batch(self, query_vecs: np.ndarray, top_k: int, filters: Optional[Dict[str, Any]] = None) -> List[List[Tuple[str, float]]]:
+        queries = normalize_rows(np.asarray(query_vecs, dtype=np.float32).reshape(len(query_vecs), -1))
+        with self._lock:
+            self._refresh()
+            if top_k <= 0 or not self._rows:
+                return [[] for _ in queries]
+            # Rows are numbered across segments (segment start + row) while merging
+            best_scores = np.empty((len(queries), 0), dtype=np.float32)
+            best_rows = np.empty((len(queries), 0), dtype=np.int64)
+            starts = []
+            base = 0
+            for segment in self._segments:
+                starts.append(base)
+                allowed = self._segment_rows(segment, filters)
+                if allowed is None:
+                    allowed = np.flatnonzero(segment.alive)
+                for start in range(0, len(allowed), self.block_rows):
+                    rows = allowed[start:start + self.block_rows]
+                    if rows[-1] - rows[0] + 1 == len(rows):
+                        vecs = segment.vectors[rows[0]:rows[-1] + 1]
+                    else:
+                        vecs = segment.vectors[rows]
+                    scores = np.asarray(vecs @ queries.T)
+                    best_scores, best_rows = merge_top_k(best_scores, best_rows, scores, base + rows, top_k)
+                base += segment.rows
+            out = []
+            for hits in sorted_top_k(best_scores, best_rows):
+                located = []
+                for row, score in hits:
+                    seg = bisect.bisect_right(starts, row) - 1
+                    located.append((self._segments[seg].ids[row - starts[seg]], score))
+                out.append(located)
+            return out
@@ -1,8 +1,16 @@
 from fastapi import FastAPI, Request
+from fastapi.responses import Response
 from fastapi.middleware.cors import CORSMiddleware
+import asyncio
 import time
 import logging
 from .config import settings
+from .core import db, metrics
+from .core.embeddings import global_vector_index, load_vectors
+from .core.pdf_processor import shutdown_extract_pool
+from .core.search_engine import fts_maintenance
+from .services import job_service
+from .utils.timing import start_timings
 from .api.routes import upload, search, export
 
 logger = logging.getLogger(__name__)
@@ -19,15 +27,47 @@ app.add_middleware(
 
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    start = time.time()
+    start = time.perf_counter()
+    # Started here so the stages the handler records (see utils.timing) land in this dict
+    timings = start_timings()
     response = await call_next(request)
-    duration = (time.time() - start) * 1000.0
+    duration = (time.perf_counter() - start) * 1000.0
+    # Label by route template, not raw path, to keep series bounded
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    metrics.http_request_seconds.observe(duration / 1000.0, method=request.method, route=route, status=str(response.status_code))
+    for name, ms in timings.items():
+        metrics.stage_seconds.observe(ms / 1000.0, route=route, stage=name)
+    response.headers["Server-Timing"] = metrics.server_timing(timings, duration)
     logger.info(f"{request.method} {request.url.path} {response.status_code} {duration:.1f}ms")
     return response
 
+@app.on_event("startup")
+async def warm_vector_index():
+    # Reload persisted embeddings so vector search works right after a restart;
+    # on-disk backends are already warm
+    if not getattr(global_vector_index, "persistent", False):
+        app.state.vector_warmup = await db.read(load_vectors, global_vector_index)
+
+@app.on_event("startup")
+async def start_ingest_workers():
+    await job_service.start_workers()
+
+@app.on_event("shutdown")
+async def stop_workers():
+    await job_service.stop_workers()
+    fts_maintenance.cancel()
+    shutdown_extract_pool()
+
 @app.get("/healthz")
 async def healthz():
-    return {"ok": True}
+    warmup = getattr(app.state, "vector_warmup", None) or {}
+    return {"ok": True, "vectors": len(global_vector_index), "warmup_seconds": warmup.get("seconds")}
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    return Response(metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+metrics.register_vector_index_gauges(lambda: global_vector_index)
 
 app.include_router(upload.router)
 app.include_router(search.router)
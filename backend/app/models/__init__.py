@@ -1,6 +1,7 @@
 from .document import Document, DocumentIn, Page, Chunk
 from .query import (
     SearchQuery,
+    BatchSearchQuery,
     SearchResult,
     QARequest,
     QAResponse,
@@ -5,7 +5,13 @@ class SearchQuery(BaseModel):
     query: str
     top_k: int = 10
     alpha: float = 0.5
-    filters: Optional[Dict[str, Any]] = None  # {doc_ids: [], divisions: []}
+    filters: Optional[Dict[str, Any]] = None  # {doc_ids: [], sections: [], topics: [], divisions: []}
+
+class BatchSearchQuery(BaseModel):
+    queries: List[str]
+    top_k: int = 10
+    alpha: float = 0.5
+    filters: Optional[Dict[str, Any]] = None  # applied to every query
 
 class SearchResult(BaseModel):
     chunk_id: str
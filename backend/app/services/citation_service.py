@@ -1,14 +1,17 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import sqlite3
 from ..config import sqlite_conn
+from ..core.search_engine import CHUNK_PAGE_JOIN, CHUNK_TEXT
 from ..models.query import Citation
 
-def validate_citations(citations: List[Citation]) -> bool:
+def validate_citations(citations: List[Citation], conn: Optional[sqlite3.Connection] = None) -> bool:
     """
     Ensure each quote is an exact substring of its chunk and char ranges align.
     """
+    conn = conn or sqlite_conn
     for c in citations:
-        row = sqlite_conn.execute("SELECT text, char_start, char_end FROM chunks WHERE id = ?", (c.chunk_id,)).fetchone()
+        row = conn.execute(f"SELECT {CHUNK_TEXT} AS text, c.char_start, c.char_end FROM chunks c {CHUNK_PAGE_JOIN} WHERE c.id = ?",
+                           (c.chunk_id,)).fetchone()
         if not row:
             return False
         full_text = row["text"]
@@ -0,0 +1,21 @@
+from typing import List
+import logging
+from ..config import settings
+from ..core import db
+from ..core.conflict_engine import detect_conflicts
+from ..models.query import ConflictFinding, ConflictRequest
+from ..utils.timing import stage
+
+logger = logging.getLogger(__name__)
+
+async def find_conflicts(req: ConflictRequest) -> List[ConflictFinding]:
+    # "all" scans every document; "filtered" narrows by doc_filter (search filter keys)
+    filters = dict(req.doc_filter or {}) if req.scope == "filtered" else {}
+    if req.topic:
+        # Only chunks tagged with the topic can hold its claims: skip the rest in SQL
+        filters["topics"] = [req.topic]
+    # One pass over the chunks on a read-pool thread; citations come from the same rows
+    with stage("conflicts"):
+        findings = await db.read(detect_conflicts, req.topic, filters, settings.CONFLICT_MIN_SIMILARITY,
+                                 settings.CONFLICT_MAX_CITATIONS, settings.CONFLICT_MAX_FINDINGS)
+    return [ConflictFinding(**f) for f in findings]
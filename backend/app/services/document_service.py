@@ -1,15 +1,22 @@
+import asyncio
 import hashlib
 import os
+import time
 import uuid
+from contextlib import nullcontext
 from datetime import datetime
-from typing import List, Dict, Any, Tuple
+from typing import Awaitable, Callable, List, Dict, Any, Optional, Set, Tuple
 import sqlite3
 import logging
 from pathlib import Path
 from ..config import settings, sqlite_conn
-from ..core.pdf_processor import extract_pdf
+from ..core import db, metrics
+from ..core.pdf_processor import ExtractedPage, extract_pdf
+from ..core.search_engine import deferred_fts, fts_maintenance
 from ..core.text_chunker import chunk_page
-from ..core.embeddings import upsert_embeddings
+from ..core.embeddings import upsert_embeddings, global_vector_index
+from ..core.result_cache import bump_corpus_version
+from ..utils.page_text import compress_text, decompress_text, resolve_codec
 
 logger = logging.getLogger(__name__)
 
@@ -20,46 +27,215 @@ def file_sha256(path: str) -> str:
             h.update(chunk)
     return h.hexdigest()
 
-async def process_pdf(filepath: str, filename: str) -> Dict[str, Any]:
+Progress = Callable[[str, Dict[str, int]], Awaitable[None]]
+
+def claim_document(conn: sqlite3.Connection, doc_id: str, filename: str, fhash: str) -> Optional[Dict[str, Any]]:
     """
-    Process a PDF: dedupe, extract pages, chunk, embed, and index.
+    Insert the document row unless a document with this file hash exists, in
+    which case that row is returned. Runs on the writer, so it is atomic.
     """
-    # Dedupe by file hash
-    fhash = file_sha256(filepath)
-    cur = sqlite_conn.execute("SELECT id, pages_count FROM documents WHERE file_hash = ?", (fhash,))
-    row = cur.fetchone()
+    row = conn.execute("SELECT id, pages_count FROM documents WHERE file_hash = ?", (fhash,)).fetchone()
     if row:
-        logger.info("Duplicate file detected, skipping processing")
-        return {"id": row["id"], "filename": filename, "pages_count": row["pages_count"], "uploaded_at": datetime.utcnow().isoformat()}
+        return dict(row)
+    # pages_count is filled in once extraction finishes
+    with conn:
+        conn.execute(
+            "INSERT INTO documents (id, filename, file_hash, pages_count, uploaded_at) VALUES (?, ?, ?, ?, ?)",
+            (doc_id, filename, fhash, 0, datetime.utcnow().isoformat()),
+        )
+    return None
+
+def remove_document(conn: sqlite3.Connection, doc_id: str) -> List[str]:
+    """Delete a document; pages, chunks and stored vectors cascade. Returns its chunk ids."""
+    with conn:
+        ids = [r[0] for r in conn.execute("SELECT id FROM chunks WHERE document_id = ?", (doc_id,))]
+        conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+    return ids
+
+def chunk_ids_for(conn: sqlite3.Connection, doc_id: str) -> List[str]:
+    return [r[0] for r in conn.execute("SELECT id FROM chunks WHERE document_id = ?", (doc_id,))]
+
+def finish_replace(conn: sqlite3.Connection, doc_id: str, filename: str, fhash: str, pages_count: int, stale: List[str]) -> None:
+    """Drop chunks and trailing pages the new revision no longer has, and point the document at it."""
+    with conn:
+        # FTS entries and stored vectors follow through the delete trigger and
+        # cascade; chunks of rewritten pages are already gone (see pages_bu)
+        conn.executemany("DELETE FROM chunks WHERE id = ?", [(cid,) for cid in stale])
+        conn.execute("DELETE FROM pages WHERE document_id = ? AND page_number > ?", (doc_id, pages_count))
+        conn.execute(
+            "UPDATE documents SET filename = ?, file_hash = ?, pages_count = ?, uploaded_at = ? WHERE id = ?",
+            (filename, fhash, pages_count, datetime.utcnow().isoformat(), doc_id),
+        )
 
+def set_pages_count(conn: sqlite3.Connection, doc_id: str, pages_count: int) -> None:
+    with conn:
+        conn.execute("UPDATE documents SET pages_count = ? WHERE id = ?", (pages_count, doc_id))
+
+async def process_pdf(filepath: str, filename: str, progress: Optional[Progress] = None, replace: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Process a PDF: dedupe, extract pages, chunk, embed, and index. progress, if
+    given, is awaited with (document_id, counts) as pages are written and embedded.
+    With replace, the PDF is a new revision of that document id (see replace_document).
+    """
+    # Dedupe by file hash
+    fhash = await asyncio.to_thread(file_sha256, filepath)
+    if replace:
+        return await replace_document(replace, filepath, filename, fhash, progress)
     doc_id = str(uuid.uuid4())
-    # Extract pages
-    pages, sections = await extract_pdf(filepath, max_pages=settings.MAX_PAGES_PER_UPLOAD)
-    pages_count = len(pages)
-    # Insert document
-    sqlite_conn.execute(
-        "INSERT INTO documents (id, filename, file_hash, pages_count, uploaded_at) VALUES (?, ?, ?, ?, ?)",
-        (doc_id, filename, fhash, pages_count, datetime.utcnow().isoformat()),
-    )
-    sqlite_conn.commit()
-    # Insert pages and chunks
-    all_chunks: List[Dict[str, Any]] = []
-    for p, section in zip(pages, sections):
-        sqlite_conn.execute(
-            "INSERT INTO pages (document_id, page_number, text, width, height) VALUES (?, ?, ?, ?, ?)",
-            (doc_id, p.page_number, p.text, p.width, p.height)
+    existing = await db.write(claim_document, doc_id, filename, fhash)
+    if existing:
+        logger.info("Duplicate file detected, skipping processing")
+        return {"id": existing["id"], "filename": filename, "pages_count": existing["pages_count"],
+                "uploaded_at": datetime.utcnow().isoformat(), "duplicate": True}
+
+    try:
+        counts = await ingest_pages(doc_id, filename, filepath, progress)
+    except BaseException:
+        # Drop the partial document
+        global_vector_index.delete(await db.write(remove_document, doc_id))
+        bump_corpus_version()
+        raise
+    await db.write(set_pages_count, doc_id, counts["pages"])
+    return {"id": doc_id, "filename": filename, "pages_count": counts["pages"], "uploaded_at": datetime.utcnow().isoformat(),
+            "duplicate": False}
+
+async def replace_document(doc_id: str, filepath: str, filename: str, fhash: str, progress: Optional[Progress] = None) -> Dict[str, Any]:
+    """
+    Update a document in place from a new revision of its PDF. Chunk ids hash the
+    document id, position and text, so unchanged chunks keep their id: only new
+    chunks are written and embedded (their vectors usually come from the
+    embedding cache), and only chunks missing from the revision are deleted from
+    SQLite, FTS and the vector index. A rewritten page drops its changed chunks
+    as it is written, so a failure leaves each page consistent with its chunks
+    (new revision up to where it stopped, old after), and rerunning the replace
+    picks up where it stopped.
+    """
+    doc = await db.read(get_document, doc_id)
+    same = await db.read(lambda conn: conn.execute("SELECT id, pages_count FROM documents WHERE file_hash = ?", (fhash,)).fetchone())
+    if same:
+        logger.info("Replacement is identical to an existing document, skipping processing")
+        return {"id": same["id"], "filename": filename, "pages_count": same["pages_count"],
+                "uploaded_at": datetime.utcnow().isoformat(), "duplicate": True}
+    stale = set(await db.read(chunk_ids_for, doc_id))
+    before = len(stale)
+    counts = await ingest_pages(doc_id, filename, filepath, progress, existing=stale)
+    await db.write(finish_replace, doc_id, filename, fhash, counts["pages"], list(stale))
+    global_vector_index.delete(list(stale))
+    bump_corpus_version()
+    fts_maintenance.notify(len(stale))
+    logger.info(f"Replaced {doc['filename']} with {filename}: {counts['chunks']} chunks added, "
+                f"{before - len(stale)} kept, {len(stale)} removed")
+    return {"id": doc_id, "filename": filename, "pages_count": counts["pages"], "uploaded_at": datetime.utcnow().isoformat(),
+            "duplicate": False, "chunks_added": counts["chunks"], "chunks_kept": before - len(stale), "chunks_removed": len(stale)}
+
+async def delete_document(doc_id: str) -> Dict[str, Any]:
+    """Delete a document with its pages, chunks, FTS entries and vectors."""
+    await db.read(get_document, doc_id)
+    chunk_ids = await db.write(remove_document, doc_id)
+    global_vector_index.delete(chunk_ids)
+    bump_corpus_version()
+    fts_maintenance.notify(len(chunk_ids))
+    return {"id": doc_id, "chunks_removed": len(chunk_ids)}
+
+async def ingest_pages(doc_id: str, filename: str, filepath: str, progress: Optional[Progress] = None,
+                       existing: Optional[Set[str]] = None) -> Dict[str, int]:
+    """
+    Extract, chunk/write and embed as overlapping stages joined by bounded queues, so
+    only a window of pages and chunk batches is in memory and embedding starts with
+    the first batch rather than after the last page. existing holds chunk ids the
+    document already has: those chunks are skipped and removed from the set, which
+    is left holding the ones the PDF no longer produces.
+    """
+    page_q: asyncio.Queue = asyncio.Queue(maxsize=settings.INGEST_QUEUE_PAGES)
+    batch_q: asyncio.Queue = asyncio.Queue(maxsize=settings.INGEST_QUEUE_BATCHES)
+    counts = {"pages": 0, "chunks": 0, "vectors": 0}
+    started = time.perf_counter()
+
+    async def report() -> None:
+        if progress:
+            await progress(doc_id, counts)
+
+    async def extract_stage() -> None:
+        async for page in extract_pdf(filepath, max_pages=settings.MAX_PAGES_PER_UPLOAD):
+            await page_q.put(page)
+        await page_q.put(None)
+
+    async def index_stage() -> None:
+        pages: List[ExtractedPage] = []
+        batch: List[Dict[str, Any]] = []
+
+        async def flush() -> None:
+            await db.write(write_batch, doc_id, pages, batch)
+            bump_corpus_version()
+            counts["pages"] += len(pages)
+            counts["chunks"] += len(batch)
+            metrics.ingest_pages.inc(len(pages))
+            metrics.ingest_chunks.inc(len(batch))
+            await report()
+            if batch:
+                await batch_q.put(list(batch))
+            pages.clear()
+            batch.clear()
+
+        while (p := await page_q.get()) is not None:
+            pages.append(p)
+            chunks = chunk_page(doc_id, filename, p.page_number, p.section, p.text)
+            if existing:
+                fresh = [c for c in chunks if c["id"] not in existing]
+                existing.difference_update(c["id"] for c in chunks)
+                chunks = fresh
+            batch.extend(chunks)
+            # Also bound by pages, so runs of blank or image-only pages still get
+            # written and reported instead of piling up without chunks
+            if len(batch) >= settings.INGEST_EMBED_BATCH_CHUNKS or len(pages) >= settings.INGEST_QUEUE_PAGES:
+                await flush()
+        await flush()
+        await batch_q.put(None)
+
+    async def embed_stage() -> None:
+        while (batch := await batch_q.get()) is not None:
+            res = await upsert_embeddings(batch, model=settings.EMBEDDING_MODEL, api_key=settings.OPENAI_API_KEY)
+            counts["vectors"] += res["chunks"]
+            await report()
+
+    await report()
+    tasks = [asyncio.create_task(stage()) for stage in (extract_stage, index_stage, embed_stage)]
+    try:
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+    elapsed = time.perf_counter() - started
+    if counts["pages"] and elapsed > 0:
+        metrics.ingest_pages_per_second.observe(counts["pages"] / elapsed)
+    # Merge the FTS segments this load added once ingest goes quiet
+    fts_maintenance.notify(counts["chunks"])
+    return counts
+
+def write_batch(conn: sqlite3.Connection, doc_id: str, pages: List[ExtractedPage], chunks: List[Dict[str, Any]], defer_fts: bool = True) -> None:
+    """
+    Write a batch of pages and their chunks in one transaction with executemany.
+    With defer_fts the FTS index is filled once for the batch instead of by the
+    per-row trigger.
+    """
+    created_at = datetime.utcnow().isoformat()
+    codec = resolve_codec(settings.PAGE_CODEC)
+    with conn:
+        # An upsert, not INSERT OR REPLACE: rewriting a page fires pages_bu, which
+        # drops the chunks whose text changed while the old page is still there
+        conn.executemany(
+            """INSERT INTO pages (document_id, page_number, content, codec, width, height) VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT (document_id, page_number) DO UPDATE SET
+            content = excluded.content, codec = excluded.codec, width = excluded.width, height = excluded.height""",
+            [(doc_id, p.page_number, compress_text(p.text, codec), codec, p.width, p.height) for p in pages],
         )
-        chs = chunk_page(doc_id, filename, p.page_number, section, p.text)
-        for c in chs:
-            sqlite_conn.execute(
-                "INSERT INTO chunks (id, document_id, filename, page_number, section, text, char_start, char_end, hash, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-                (c["id"], c["document_id"], c["filename"], c["page_number"], c["section"], c["text"], c["char_start"], c["char_end"], c["hash"], datetime.utcnow().isoformat())
+        with deferred_fts(conn) if defer_fts else nullcontext():
+            conn.executemany(
+                "INSERT INTO chunks (id, document_id, filename, page_number, section, char_start, char_end, hash, created_at, has_modal, tags) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(c["id"], c["document_id"], c["filename"], c["page_number"], c["section"], c["char_start"], c["char_end"], c["hash"], created_at, int(c["has_modal"]), c["tags"]) for c in chunks],
             )
-        all_chunks.extend(chs)
-    sqlite_conn.commit()
-    # Embed and upsert to vector index
-    await upsert_embeddings(all_chunks, model=settings.EMBEDDING_MODEL, api_key=settings.OPENAI_API_KEY)
-    return {"id": doc_id, "filename": filename, "pages_count": pages_count, "uploaded_at": datetime.utcnow().isoformat()}
 
 def store_upload(temp_path: str, original_filename: str) -> str:
     """
@@ -75,13 +251,20 @@ def store_upload(temp_path: str, original_filename: str) -> str:
     os.replace(temp_path, dest_path)
     return str(dest_path)
 
-def list_documents() -> List[Dict[str, Any]]:
-    cur = sqlite_conn.execute("SELECT * FROM documents ORDER BY uploaded_at DESC")
+def list_documents(conn: Optional[sqlite3.Connection] = None) -> List[Dict[str, Any]]:
+    cur = (conn or sqlite_conn).execute("SELECT * FROM documents ORDER BY uploaded_at DESC")
     return [dict(row) for row in cur.fetchall()]
 
-def get_page_text(document_id: str, page_number: int) -> Dict[str, Any]:
-    cur = sqlite_conn.execute("SELECT * FROM pages WHERE document_id = ? AND page_number = ?", (document_id, page_number))
+def get_document(conn: sqlite3.Connection, doc_id: str) -> Dict[str, Any]:
+    row = conn.execute("SELECT * FROM documents WHERE id = ?", (doc_id,)).fetchone()
+    if not row:
+        raise FileNotFoundError("Document not found")
+    return dict(row)
+
+def get_page_text(document_id: str, page_number: int, conn: Optional[sqlite3.Connection] = None) -> Dict[str, Any]:
+    cur = (conn or sqlite_conn).execute("SELECT * FROM pages WHERE document_id = ? AND page_number = ?", (document_id, page_number))
     row = cur.fetchone()
     if not row:
         raise FileNotFoundError("Page not found")
-    return dict(row)
\ No newline at end of file
+    return {"document_id": row["document_id"], "page_number": row["page_number"], "text": decompress_text(row["content"], row["codec"]),
+            "width": row["width"], "height": row["height"]}
\ No newline at end of file
@@ -0,0 +1,203 @@
+import asyncio
+import os
+import socket
+import sqlite3
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+from ..config import settings
+from ..core import db
+from ..core.embeddings import global_vector_index
+from ..core.result_cache import bump_corpus_version
+from .document_service import process_pdf, remove_document
+
+logger = logging.getLogger(__name__)
+
+# Ingest jobs live in the ingest_jobs table so queued uploads survive a restart;
+# a pool of asyncio workers claims them oldest first. Several processes may share
+# the table: a claim is one atomic UPDATE, each process stamps the jobs it owns
+# with a heartbeat, and only jobs whose heartbeat has gone stale are requeued.
+
+# Identifies this process's claims in ingest_jobs.owner
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_workers: List[asyncio.Task] = []
+_wakeup: Optional[asyncio.Event] = None
+
+def _now() -> str:
+    return datetime.utcnow().isoformat()
+
+def _insert_job(conn: sqlite3.Connection, job_id: str, path: str, filename: str, replace: Optional[str] = None) -> None:
+    now = _now()
+    with conn:
+        conn.execute(
+            "INSERT INTO ingest_jobs (id, filename, path, status, replace_document_id, created_at, updated_at) VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+            (job_id, filename, path, replace, now, now),
+        )
+
+def _get_job(conn: sqlite3.Connection, job_id: str) -> Dict[str, Any]:
+    row = conn.execute("SELECT * FROM ingest_jobs WHERE id = ?", (job_id,)).fetchone()
+    if not row:
+        raise FileNotFoundError("Job not found")
+    job = dict(row)
+    for internal in ("path", "owner", "heartbeat_at"):
+        job.pop(internal, None)
+    return job
+
+def _update(conn: sqlite3.Connection, job_id: str, fields: Dict[str, Any], owner: Optional[str] = None) -> None:
+    """Update a job; with owner, only while that process still holds the claim."""
+    fields = {**fields, "updated_at": _now()}
+    cols = ", ".join(f"{k} = ?" for k in fields)
+    sql = f"UPDATE ingest_jobs SET {cols} WHERE id = ?"
+    params = [*fields.values(), job_id]
+    if owner is not None:
+        sql += " AND owner = ?"
+        params.append(owner)
+    with conn:
+        conn.execute(sql, params)
+
+def _claim(conn: sqlite3.Connection, owner: str) -> Optional[Dict[str, Any]]:
+    # One statement under a write lock: another process can't claim the same row
+    # between the SELECT and the UPDATE
+    now = _now()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "UPDATE ingest_jobs SET status = 'running', owner = ?, heartbeat_at = ?, updated_at = ? "
+            "WHERE id = (SELECT id FROM ingest_jobs WHERE status = 'queued' ORDER BY created_at LIMIT 1) "
+            "AND status = 'queued' RETURNING *",
+            (owner, now, now),
+        ).fetchone()
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return dict(row) if row else None
+
+def _heartbeat(conn: sqlite3.Connection, owner: str) -> None:
+    with conn:
+        conn.execute("UPDATE ingest_jobs SET heartbeat_at = ? WHERE owner = ? AND status = 'running'", (_now(), owner))
+
+def _release(conn: sqlite3.Connection, owner: str) -> None:
+    # Clearing the heartbeat marks the jobs stale at once, for any process to recover
+    with conn:
+        conn.execute("UPDATE ingest_jobs SET heartbeat_at = NULL WHERE owner = ? AND status = 'running'", (owner,))
+
+def _recover(conn: sqlite3.Connection, owner: str, stale_seconds: float) -> Tuple[int, List[str]]:
+    """
+    Requeue jobs whose owner stopped heartbeating, dropping the partial document
+    each had started. Jobs are first marked 'recovering' under this owner, so
+    concurrent recoveries don't both take them and a claim can't pick one up
+    before its document is gone.
+    """
+    now = datetime.utcnow()
+    stale_before = (now - timedelta(seconds=stale_seconds)).isoformat()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute(
+            "UPDATE ingest_jobs SET status = 'recovering', owner = ?, heartbeat_at = ?, updated_at = ? "
+            "WHERE status IN ('running', 'recovering') AND (heartbeat_at IS NULL OR heartbeat_at < ?) "
+            "RETURNING id, document_id, replace_document_id",
+            (owner, now.isoformat(), now.isoformat(), stale_before),
+        ).fetchall()
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    chunk_ids: List[str] = []
+    for row in rows:
+        # A replace works on an existing document; rerunning it resumes the diff
+        if row["document_id"] and not row["replace_document_id"]:
+            chunk_ids.extend(remove_document(conn, row["document_id"]))
+        _update(conn, row["id"], {"status": "queued", "owner": None, "heartbeat_at": None, "document_id": None,
+                                  "pages_extracted": 0, "chunks_indexed": 0, "vectors_embedded": 0}, owner=owner)
+    if rows:
+        logger.info(f"Requeued {len(rows)} ingest jobs with a stale heartbeat")
+    return len(rows), chunk_ids
+
+async def create_job(path: str, filename: str, replace: Optional[str] = None) -> Dict[str, Any]:
+    """Queue a stored upload; with replace, as a new revision of that document."""
+    job_id = str(uuid.uuid4())
+    await db.write(_insert_job, job_id, path, filename, replace)
+    if _wakeup is not None:
+        _wakeup.set()
+    return await get_job(job_id)
+
+async def get_job(job_id: str) -> Dict[str, Any]:
+    return await db.read(_get_job, job_id)
+
+async def recover_interrupted_jobs() -> int:
+    """
+    Requeue jobs left running by a crashed or stopped process, dropping the
+    partial document they had started so the rerun isn't taken for a duplicate.
+    Returns how many jobs were requeued.
+    """
+    requeued, chunk_ids = await db.write(_recover, WORKER_ID, settings.INGEST_STALE_SECONDS)
+    global_vector_index.delete(chunk_ids)
+    if requeued:
+        bump_corpus_version()
+    return requeued
+
+async def run_job(job: Dict[str, Any]) -> None:
+    job_id = job["id"]
+
+    async def progress(doc_id: str, counts: Dict[str, int]) -> None:
+        await db.write(_update, job_id, {"document_id": doc_id, "pages_extracted": counts["pages"],
+                                         "chunks_indexed": counts["chunks"], "vectors_embedded": counts["vectors"]}, WORKER_ID)
+
+    try:
+        res = await process_pdf(job["path"], job["filename"], progress=progress, replace=job.get("replace_document_id"))
+    except asyncio.CancelledError:
+        raise
+    except Exception as exc:
+        logger.exception(f"Ingest job {job_id} failed")
+        await db.write(_update, job_id, {"status": "failed", "error": str(exc) or type(exc).__name__}, WORKER_ID)
+        return
+    if res.get("duplicate"):
+        # The existing document keeps its own copy; this upload is redundant
+        await asyncio.to_thread(_discard_file, job["path"])
+    await db.write(_update, job_id, {"status": "done", "document_id": res["id"], "pages_extracted": res["pages_count"]}, WORKER_ID)
+
+def _discard_file(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+async def _worker() -> None:
+    while True:
+        # Clear before claiming: a job queued while the claim is in flight sets it again
+        _wakeup.clear()
+        job = await db.write(_claim, WORKER_ID)
+        if job is None:
+            await _wakeup.wait()
+            continue
+        await run_job(job)
+
+async def _keepalive() -> None:
+    # Keep this process's claims fresh, and pick up jobs a dead sibling left behind
+    while True:
+        await asyncio.sleep(settings.INGEST_HEARTBEAT_SECONDS)
+        await db.write(_heartbeat, WORKER_ID)
+        if await recover_interrupted_jobs() and _wakeup is not None:
+            _wakeup.set()
+
+async def start_workers(n: Optional[int] = None) -> None:
+    global _wakeup
+    if _workers:
+        return
+    _wakeup = asyncio.Event()
+    await recover_interrupted_jobs()
+    _workers.append(asyncio.create_task(_keepalive()))
+    _workers.extend(asyncio.create_task(_worker()) for _ in range(n or settings.INGEST_WORKERS))
+
+async def stop_workers() -> None:
+    global _wakeup
+    for t in _workers:
+        t.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    if _workers:
+        await db.write(_release, WORKER_ID)
+    _workers.clear()
+    _wakeup = None
@@ -1,11 +1,38 @@
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional, Tuple
 import logging
-from ..core.search_engine import hybrid_search
+from ..core.search_engine import hybrid_search, hybrid_search_batch
+from ..core.result_cache import SearchResultCache, corpus_version, global_result_cache
 
 logger = logging.getLogger(__name__)
 
 async def search(query: str, top_k: int = 10, alpha: float = 0.5, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
-    return await hybrid_search(query, top_k, alpha, filters)
+    key = SearchResultCache.key(query, top_k, alpha, filters)
+    cached = global_result_cache.get(key)
+    if cached is not None:
+        return cached
+    # Taken before searching: an ingest that lands mid-search makes the result stale
+    version = corpus_version()
+    results = await hybrid_search(query, top_k, alpha, filters)
+    global_result_cache.put(key, results, version)
+    return results
+
+async def search_batch(queries: List[str], top_k: int = 10, alpha: float = 0.5,
+                       filters: Optional[Dict[str, Any]] = None) -> AsyncIterator[Tuple[int, List[Dict[str, Any]]]]:
+    """(position, results) per query: cached queries first, the rest as they finish."""
+    keys = [SearchResultCache.key(q, top_k, alpha, filters) for q in queries]
+    todo: List[int] = []
+    for i, key in enumerate(keys):
+        cached = global_result_cache.get(key)
+        if cached is not None:
+            yield i, cached
+        else:
+            todo.append(i)
+    if not todo:
+        return
+    version = corpus_version()
+    async for j, results in hybrid_search_batch([queries[i] for i in todo], top_k, alpha, filters):
+        global_result_cache.put(keys[todo[j]], results, version)
+        yield todo[j], results
 
 def build_highlights(text: str, terms: List[str]) -> List[str]:
     t = text.lower()
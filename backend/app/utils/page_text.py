@@ -0,0 +1,60 @@
+import zlib
+from typing import Optional, Tuple
+
+# Page text is stored compressed in pages.content, tagged with its codec, and
+# chunk text is sliced out of it by (char_start, char_end) instead of being
+# stored a second time. zstd is used when the zstandard package is installed;
+# zlib is always available. Rows written with one codec stay readable after the
+# setting changes.
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 6
+
+def resolve_codec(preferred: str) -> str:
+    """The codec new pages are written with: auto picks zstd when installed."""
+    if preferred == "auto":
+        return "zstd" if zstandard is not None else "zlib"
+    if preferred == "zstd" and zstandard is None:
+        raise RuntimeError("PAGE_CODEC=zstd needs the zstandard package")
+    if preferred not in ("zstd", "zlib", "none"):
+        raise ValueError(f"Unknown page codec {preferred!r}")
+    return preferred
+
+def compress_text(text: str, codec: str) -> bytes:
+    data = text.encode("utf-8")
+    if codec == "zlib":
+        return zlib.compress(data, ZLIB_LEVEL)
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    return data
+
+def decompress_text(content: bytes, codec: str) -> str:
+    if codec == "zlib":
+        data = zlib.decompress(content)
+    elif codec == "zstd":
+        data = zstandard.ZstdDecompressor().decompress(content)
+    else:
+        data = content
+    return data.decode("utf-8")
+
+# Chunks of a page are read together (hydration, FTS indexing), so the last
+# decompressed page is kept. One tuple, swapped atomically, so threads sharing
+# it never see a page paired with another page's text.
+_last_page: Optional[Tuple[bytes, str, str]] = None
+
+def page_slice(content: Optional[bytes], codec: str, start: int, end: int) -> Optional[str]:
+    """A chunk's text: characters [start, end) of the page. Registered as an SQLite function."""
+    global _last_page
+    if content is None:
+        return None
+    cached = _last_page
+    if cached is not None and cached[1] == codec and cached[0] == content:
+        text = cached[2]
+    else:
+        text = decompress_text(content, codec)
+        _last_page = (content, codec, text)
+    return text[start:end]
@@ -10,4 +10,13 @@ TOPIC_PATTERNS = {
     "liquidated_damages": re.compile(r"\bliquidated\s+damages\b|\bLD\b", re.IGNORECASE),
     "submittals": re.compile(r"\bsubmittal[s]?\b", re.IGNORECASE),
     "alternates": re.compile(r"\balternate[s]?\b", re.IGNORECASE),
-}
\ No newline at end of file
+    "retainage": re.compile(r"\bretainage\b", re.IGNORECASE),
+    "warranties": re.compile(r"\bwarrant(?:y|ies)\b", re.IGNORECASE),
+}
+
+# "DIVISION 03" headers; CSI_DIVISION_REGEX above only recognizes Division 01
+DIVISION_REGEX = re.compile(r"\bDIVISION\s+(\d{1,2})\b", re.IGNORECASE)
+
+# A CSI MasterFormat section number such as "03 30 00", "03-30-00" or "033000"
+# in a header or a sentence; separators must match, so dates are not sections
+CSI_SECTION_REGEX = re.compile(r"\b(\d{2})([ -]?)(\d{2})\2(\d{2})\b")
\ No newline at end of file
@@ -0,0 +1,60 @@
+import re
+from typing import Any, Dict, Optional
+from .patterns import CSI_SECTION_REGEX, DIVISION_REGEX, TOPIC_PATTERNS
+
+# Topic and CSI division tags, computed once per chunk at ingest and packed into
+# one integer: chunks.tags (indexed) and the vector index metadata. Bit i is the
+# i-th topic of TOPIC_PATTERNS (new topics are appended, so stored masks keep
+# their meaning) and bit DIVISION_BIT + n is division n. The "topics" and
+# "divisions" search filters become a bitwise AND instead of a regex scan.
+
+TOPIC_BITS = {name: 1 << i for i, name in enumerate(TOPIC_PATTERNS)}
+DIVISION_BIT = 12
+MAX_DIVISION = 49  # MasterFormat divisions run 00-49; bit 61 is the highest used
+assert len(TOPIC_BITS) <= DIVISION_BIT
+
+# Search filter keys matched against the tags
+TAG_FILTERS = ("topics", "divisions")
+
+def division_bit(division: int) -> int:
+    return 1 << (DIVISION_BIT + division) if 0 <= division <= MAX_DIVISION else 0
+
+def chunk_tags(text: Optional[str], section: Optional[str]) -> int:
+    """Topics the chunk's text mentions, plus the division of the section it belongs to."""
+    tags = 0
+    for name, pattern in TOPIC_PATTERNS.items():
+        if pattern.search(text or ""):
+            tags |= TOPIC_BITS[name]
+    # The section header decides the division; numbers a clause merely refers to don't
+    header = section or ""
+    for m in CSI_SECTION_REGEX.finditer(header):
+        tags |= division_bit(int(m.group(1)))
+    for m in DIVISION_REGEX.finditer(header):
+        tags |= division_bit(int(m.group(1)))
+    return tags
+
+def parse_division(value: Any) -> Optional[int]:
+    """A filter value such as 3, "03", "Division 03" or "03 30 00" as a division number."""
+    m = re.search(r"\d{1,2}", str(value))
+    return int(m.group(0)) if m else None
+
+def filter_masks(filters: Optional[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    The tag mask for each of TAG_FILTERS present in filters. A row matches a key
+    when it has any of the key's tags (tags & mask != 0); unknown topics and
+    divisions add no bits, so a filter naming only those matches nothing.
+    """
+    masks: Dict[str, int] = {}
+    topics = (filters or {}).get("topics")
+    if topics:
+        masks["topics"] = 0
+        for topic in topics:
+            masks["topics"] |= TOPIC_BITS.get(topic, 0)
+    divisions = (filters or {}).get("divisions")
+    if divisions:
+        masks["divisions"] = 0
+        for value in divisions:
+            division = parse_division(value)
+            if division is not None:
+                masks["divisions"] |= division_bit(division)
+    return masks
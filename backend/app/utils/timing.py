@@ -0,0 +1,34 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+# Per-request stage timings in milliseconds. The dict lives in a context variable,
+# so tasks spawned with asyncio.gather inside a request record into the same one.
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("stage_timings", default=None)
+
+def start_timings() -> Dict[str, float]:
+    timings: Dict[str, float] = {}
+    _timings.set(timings)
+    return timings
+
+def ensure_timings() -> Dict[str, float]:
+    """The current request's timings, started here if nothing upstream did."""
+    timings = _timings.get()
+    return timings if timings is not None else start_timings()
+
+def current_timings() -> Dict[str, float]:
+    return _timings.get() or {}
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + (time.perf_counter() - start) * 1000.0
+
+def format_timings(timings: Dict[str, float]) -> str:
+    return " ".join(f"{k}={v:.1f}ms" for k, v in timings.items())
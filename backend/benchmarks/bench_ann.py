@@ -0,0 +1,93 @@
+"""
+Recall@k and latency of the approximate vector indexes against brute force.
+
+    python -m backend.benchmarks.bench_ann --rows 200000 --dim 256 --nprobe 4 8 16 32
+
+Vectors are drawn around random cluster centres so the data has the kind of
+structure real embeddings have; uniform noise makes every ANN index look bad.
+For ~10M chunks a common starting point is nlist ~ 4*sqrt(N) (about 12k) and
+then raising nprobe until recall@10 is acceptable.
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+import numpy as np
+from ..app.core.embeddings import VectorIndex
+from ..app.core.ann_index import IVFFlatIndex, HNSWIndex
+
+def clustered_vectors(rows: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size=rows)
+    return centres[labels] + 0.6 * rng.normal(size=(rows, dim)).astype(np.float32)
+
+def measure(index, queries: np.ndarray, truth: List[List[str]], k: int) -> Dict[str, Any]:
+    latencies, recalls = [], []
+    for q, expected in zip(queries, truth):
+        start = time.perf_counter()
+        got = index.query(q, top_k=k)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        recalls.append(len({cid for cid, _ in got} & set(expected)) / k)
+    return {
+        "recall_at_k": float(np.mean(recalls)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+    }
+
+def build(index, ids: List[str], vecs: np.ndarray, batch: int = 50_000) -> float:
+    start = time.perf_counter()
+    for i in range(0, len(ids), batch):
+        index.upsert(ids[i:i + batch], vecs[i:i + batch])
+    return time.perf_counter() - start
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=0, help="default 4*sqrt(rows)")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--hnsw-rows", type=int, default=10_000, help="HNSW builds in Python; 0 skips it")
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 32, 64, 128])
+    args = parser.parse_args()
+
+    vecs = clustered_vectors(args.rows, args.dim, clusters=max(8, args.rows // 500))
+    ids = [f"c{i}" for i in range(args.rows)]
+    rng = np.random.default_rng(1)
+    queries = vecs[rng.choice(args.rows, size=args.queries, replace=False)] + 0.3 * rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    report: Dict[str, Any] = {"rows": args.rows, "dim": args.dim, "k": args.k, "runs": []}
+
+    flat = VectorIndex()
+    build_s = build(flat, ids, vecs)
+    truth = [[cid for cid, _ in flat.query(q, args.k)] for q in queries]
+    report["runs"].append({"index": "flat", "build_s": build_s, **measure(flat, queries, truth, args.k)})
+
+    nlist = args.nlist or int(4 * np.sqrt(args.rows))
+    ivf = IVFFlatIndex(nlist=nlist, auto_train=False)
+    build_s = build(ivf, ids, vecs)
+    start = time.perf_counter()
+    ivf.train()
+    train_s = time.perf_counter() - start
+    for nprobe in args.nprobe:
+        ivf.nprobe = nprobe
+        report["runs"].append({"index": "ivf", "nlist": nlist, "nprobe": nprobe, "build_s": build_s, "train_s": train_s,
+                               **measure(ivf, queries, truth, args.k)})
+
+    if args.hnsw_rows:
+        n = min(args.hnsw_rows, args.rows)
+        sub = VectorIndex()
+        sub.upsert(ids[:n], vecs[:n])
+        sub_truth = [[cid for cid, _ in sub.query(q, args.k)] for q in queries]
+        hnsw = HNSWIndex()
+        build_s = build(hnsw, ids[:n], vecs[:n])
+        for ef in args.ef_search:
+            hnsw.ef_search = ef
+            report["runs"].append({"index": "hnsw", "rows": n, "ef_search": ef, "build_s": build_s,
+                                   **measure(hnsw, queries, sub_truth, args.k)})
+
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
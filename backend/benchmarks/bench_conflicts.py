@@ -0,0 +1,82 @@
+"""
+Conflict detection time by project size.
+
+    python -m backend.benchmarks.bench_conflicts --pages 1000 5000
+
+Each size is a throwaway database holding a spec book in the style of specgen
+(requirement clauses whose amounts, percentages and days vary from page to
+page) plus addendum pages that revise them, written with write_batch. The
+whole project is then scanned the way POST /conflicts does it; loading the
+chunk text, extracting claims and comparing them within blocks are timed
+separately.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+from typing import Any, Dict
+from ..app.config import get_sqlite_conn, init_sqlite_schema
+from ..app.core.conflict_engine import extract_claims, find_conflicts, load_chunk_rows
+from ..app.core.pdf_processor import ExtractedPage
+from ..app.core.search_engine import init_indices
+from ..app.core.text_chunker import chunk_page
+from ..app.services.document_service import write_batch
+from .bench_search import spec_pages
+from .specgen import _addendum_lines
+
+def build(path: str, pages: int, addenda: int) -> int:
+    conn = get_sqlite_conn(path)
+    init_sqlite_schema(conn)
+    init_indices(conn)
+    rng = random.Random(1)
+    addendum_pages = [ExtractedPage(page_number=a, text="\n".join(_addendum_lines(rng, a)), width=612.0, height=792.0,
+                                    blocks=[], section="ADDENDUM") for a in range(1, addenda + 1)]
+    chunks = 0
+    for doc_id, doc_pages in (("spec", list(spec_pages(pages))), ("addenda", addendum_pages)):
+        with conn:
+            conn.execute("INSERT INTO documents (id, filename, file_hash, pages_count, uploaded_at) VALUES (?, ?, ?, ?, '')",
+                         (doc_id, f"{doc_id}.pdf", doc_id, len(doc_pages)))
+        for start in range(0, len(doc_pages), 1000):
+            batch = doc_pages[start:start + 1000]
+            rows = [c for p in batch for c in chunk_page(doc_id, f"{doc_id}.pdf", p.page_number, p.section, p.text)]
+            write_batch(conn, doc_id, batch, rows)
+            chunks += len(rows)
+    conn.close()
+    return chunks
+
+def run_size(pages: int, addenda: int, tmp: str) -> Dict[str, Any]:
+    path = os.path.join(tmp, f"conflicts-{pages}.db")
+    chunks = build(path, pages, addenda)
+    conn = get_sqlite_conn(path)
+    t0 = time.perf_counter()
+    rows = list(load_chunk_rows(conn))
+    t1 = time.perf_counter()
+    claims = extract_claims(rows)
+    t2 = time.perf_counter()
+    findings = find_conflicts(claims)
+    t3 = time.perf_counter()
+    conn.close()
+    return {
+        "pages": pages + addenda,
+        "chunks": chunks,
+        "claims": len(claims),
+        "findings": len(findings),
+        "load_s": round(t1 - t0, 2),
+        "extract_s": round(t2 - t1, 2),
+        "compare_s": round(t3 - t2, 2),
+        "total_s": round(t3 - t0, 2),
+    }
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--addenda", type=int, default=5)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = [run_size(n, args.addenda, tmp) for n in args.pages]
+    print(json.dumps({"addenda": args.addenda, "runs": runs}, indent=2))
+
+if __name__ == "__main__":
+    main()
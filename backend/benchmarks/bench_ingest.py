@@ -0,0 +1,61 @@
+"""
+End-to-end ingest throughput and peak RSS by document size.
+
+    python -m backend.benchmarks.bench_ingest --pages 250 1000 2000
+
+Each size is ingested in a fresh interpreter against a throwaway database with
+offline (hash) embeddings, so peak RSS is per run. The vector index itself grows
+with the corpus; index_mb is reported so the pipeline's own footprint can be
+read as peak_rss_mb - index_mb.
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict
+from .specgen import generate_spec_pdf
+
+def child(pdf: str) -> Dict[str, Any]:
+    from ..app.config import sqlite_conn
+    from ..app.core.embeddings import global_vector_index
+    from ..app.services.document_service import process_pdf
+    start = time.perf_counter()
+    res = asyncio.run(process_pdf(pdf, os.path.basename(pdf)))
+    seconds = time.perf_counter() - start
+    chunks = sqlite_conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+    return {
+        "pages": res["pages_count"],
+        "chunks": chunks,
+        "seconds": round(seconds, 2),
+        "pages_per_s": round(res["pages_count"] / seconds, 1),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "index_mb": round(global_vector_index.memory_bytes() / 2 ** 20, 1),
+    }
+
+def run_size(pages: int, tmp: str) -> Dict[str, Any]:
+    pdf = os.path.join(tmp, f"manual-{pages}.pdf")
+    generate_spec_pdf(pdf, pages)
+    env = dict(os.environ, OPENAI_API_KEY="", SQLITE_PATH=os.path.join(tmp, f"db-{pages}", "specscope.db"),
+               STORAGE_PATH=os.path.join(tmp, f"db-{pages}", "storage"), LOG_LEVEL="WARNING")
+    out = subprocess.run([sys.executable, "-m", "backend.benchmarks.bench_ingest", "--child", pdf],
+                         env=env, check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[250, 1000, 2000])
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(child(args.child)))
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        print(json.dumps({"runs": [run_size(n, tmp) for n in args.pages]}, indent=2))
+
+if __name__ == "__main__":
+    main()
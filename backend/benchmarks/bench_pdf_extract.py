@@ -0,0 +1,53 @@
+"""
+PDF extraction throughput: the process pool against a single in-thread pass.
+
+    python -m backend.benchmarks.bench_pdf_extract --pages 2000 --workers 1 4 8
+
+Generates a synthetic CSI project manual (see specgen) unless --pdf is given.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict
+from ..app.config import settings
+from ..app.core import pdf_processor
+from .specgen import generate_spec_pdf
+
+async def timed_extract(path: str, workers: int) -> Dict[str, Any]:
+    settings.MAX_WORKERS = workers
+    pdf_processor.shutdown_extract_pool()
+    if workers > 1:
+        # Pay worker spawn up front; a server keeps the pool warm
+        await asyncio.get_running_loop().run_in_executor(pdf_processor._get_pool(), pdf_processor._extract_range, path, 0, 1)
+    start = time.perf_counter()
+    pages = 0
+    async for _ in pdf_processor.extract_pdf(path):
+        pages += 1
+    seconds = time.perf_counter() - start
+    return {"workers": workers, "pages": pages, "seconds": round(seconds, 2), "pages_per_s": round(pages / seconds, 1)}
+
+async def run(args: argparse.Namespace, path: str) -> Dict[str, Any]:
+    settings.PDF_PARALLEL_MIN_PAGES = 2
+    report: Dict[str, Any] = {"pdf": path, "cpus": os.cpu_count(), "runs": []}
+    for workers in args.workers:
+        report["runs"].append(await timed_extract(path, workers))
+    pdf_processor.shutdown_extract_pool()
+    return report
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pdf")
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4])
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.pdf or os.path.join(tmp, "manual.pdf")
+        if not args.pdf:
+            generate_spec_pdf(path, args.pages)
+        print(json.dumps(asyncio.run(run(args, path)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+Memory footprint and recall@k of quantized vector storage against float32.
+
+    python -m backend.benchmarks.bench_quantization --rows 100000 --dim 768
+
+Each codec is measured with plain asymmetric scoring and with a shortlist
+reranked against the full-precision vectors.
+"""
+import argparse
+import json
+import time
+from typing import Any, Dict, List
+import numpy as np
+from ..app.core.embeddings import VectorIndex
+from ..app.core.ann_index import QuantizedVectorIndex
+from .bench_ann import clustered_vectors, measure, build
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--pq-m", type=int, nargs="+", default=[0], help="PQ subquantizers; 0 means dim // 8")
+    parser.add_argument("--rerank-factor", type=int, default=4)
+    args = parser.parse_args()
+
+    vecs = clustered_vectors(args.rows, args.dim, clusters=max(8, args.rows // 500))
+    ids = [f"c{i}" for i in range(args.rows)]
+    rng = np.random.default_rng(1)
+    queries = vecs[rng.choice(args.rows, size=args.queries, replace=False)] + 0.3 * rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+    full = dict(zip(ids, vecs))
+    source = lambda hit_ids: {c: full[c] for c in hit_ids}
+
+    flat = VectorIndex()
+    build_s = build(flat, ids, vecs)
+    truth = [[cid for cid, _ in flat.query(q, args.k)] for q in queries]
+    base_bytes = flat.memory_bytes()
+    report: Dict[str, Any] = {"rows": args.rows, "dim": args.dim, "k": args.k, "runs": [
+        {"codec": "f32", "vector_bytes": flat._matrix[:args.rows].nbytes, "build_s": build_s, **measure(flat, queries, truth, args.k)}
+    ]}
+    configs: List[Dict[str, Any]] = [{"codec": "sq8"}] + [{"codec": "pq", "pq_m": m or None} for m in args.pq_m]
+    for cfg in configs:
+        for rerank in (False, True):
+            index = QuantizedVectorIndex(train_min_rows=min(args.rows, 20_000), rerank_factor=args.rerank_factor,
+                                         rerank_source=source if rerank else None, **cfg)
+            build_s = build(index, ids, vecs)
+            code_bytes = index._codes[:args.rows].nbytes
+            report["runs"].append({
+                **cfg, "rerank": rerank, "vector_bytes": code_bytes,
+                "compression": round(flat._matrix[:args.rows].nbytes / code_bytes, 1),
+                "build_s": build_s, **measure(index, queries, truth, args.k),
+            })
+    print(json.dumps(report, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Query embedding latency and throughput with and without the coalescer.
+
+    python -m backend.benchmarks.bench_query_embed --requests 400 --concurrency 64 --latency 0.05
+
+Drives concurrent single-query embeddings against the local fake OpenAI server,
+once calling embed_texts per query and once through QueryEmbedder, and reports
+p50/p99 latency, throughput and the number of upstream requests.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+import numpy as np
+from ..app.config import settings
+from ..app.core import embedding_client
+from ..app.core.embeddings import embed_texts
+from ..app.core.query_embedder import QueryEmbedder
+from .fake_openai import FakeEmbeddingServer
+
+async def drive(embed: Callable[[str], Awaitable[Any]], queries: List[str], concurrency: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(q: str) -> None:
+        async with sem:
+            start = time.perf_counter()
+            await embed(q)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(q) for q in queries))
+    elapsed = time.perf_counter() - start
+    ms = np.asarray(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "qps": round(len(queries) / elapsed, 1),
+    }
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    rng = np.random.default_rng(0)
+    # A slice of repeated questions, as real traffic has
+    pool = [f"What does section {i:02d} 00 00 require for submittals?" for i in range(args.requests)]
+    queries = [pool[i] for i in rng.integers(0, int(args.requests * (1 - args.repeat)) or 1, size=args.requests)]
+    report: Dict[str, Any] = {"requests": args.requests, "concurrency": args.concurrency, "latency_s": args.latency}
+    model, key = settings.EMBEDDING_MODEL, "bench-key"
+
+    with FakeEmbeddingServer(latency=args.latency) as server:
+        settings.OPENAI_BASE_URL = server.base_url
+        embedding_client._clients.clear()
+        direct = lambda q: embed_texts([q], model=model, api_key=key)
+        report["direct"] = {**await drive(direct, queries, args.concurrency), "upstream_requests": server.requests}
+
+        before = server.requests
+        embedder = QueryEmbedder(window_ms=args.window_ms, max_batch=args.max_batch, cache_size=4096)
+        coalesced = lambda q: embedder.embed(q, model=model, api_key=key)
+        report["coalesced"] = {**await drive(coalesced, queries, args.concurrency),
+                               "upstream_requests": server.requests - before, **embedder.stats()}
+    return report
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake upstream latency per request, seconds")
+    parser.add_argument("--window-ms", type=float, default=settings.QUERY_EMBED_WINDOW_MS)
+    parser.add_argument("--max-batch", type=int, default=settings.QUERY_EMBED_MAX_BATCH)
+    parser.add_argument("--repeat", type=float, default=0.2, help="Fraction of the query pool that is never used, so queries repeat")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Keyword-search throughput and event-loop lag by concurrency, with SQLite reads
+inline on the event loop against reads offloaded to the read pool.
+
+    python -m backend.benchmarks.bench_read_concurrency --pages 20000 --concurrency 1 4 16
+
+Seeds a throwaway database with synthetic spec pages, then runs FTS queries at
+each concurrency level. loop_lag_ms is how late a 1ms timer fires while the
+load runs: the stall every other request on the server would see.
+"""
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List
+import numpy as np
+
+TERMS = ["liquidated damages", "shop drawings", "warranty", "retainage", "compressive strength",
+         "substitutions", "testing agency", "submittals", "temporary facilities", "inspections"]
+
+async def loop_lag(stop: asyncio.Event, lags: List[float]) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(0.001)
+        lags.append(time.perf_counter() - start - 0.001)
+
+async def run_level(db, search, concurrency: int, queries: int) -> Dict[str, Any]:
+    latencies: List[float] = []
+    lags: List[float] = []
+    stop = asyncio.Event()
+    probe = asyncio.create_task(loop_lag(stop, lags))
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with sem:
+            start = time.perf_counter()
+            await db.read(lambda conn: search(TERMS[i % len(TERMS)], 20, None, conn))
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(queries)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    await probe
+    lat = np.asarray(latencies) * 1000
+    lag = np.asarray(lags or [0.0]) * 1000
+    return {
+        "concurrency": concurrency,
+        "qps": round(queries / elapsed, 1),
+        "p50_ms": round(float(np.percentile(lat, 50)), 2),
+        "p99_ms": round(float(np.percentile(lat, 99)), 2),
+        "loop_lag_p99_ms": round(float(np.percentile(lag, 99)), 2),
+        "loop_lag_max_ms": round(float(lag.max()), 2),
+    }
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    from ..app.config import settings, sqlite_conn
+    from ..app.core import db
+    from ..app.core.search_engine import bm25_keyword_search
+    from ..app.services.document_service import write_batch
+    from ..app.core.text_chunker import chunk_page
+    from .bench_sqlite_ingest import synthetic_pages
+
+    sqlite_conn.execute("INSERT INTO documents (id, filename, file_hash, pages_count, uploaded_at) VALUES ('doc', 'bench.pdf', 'h', 0, '')")
+    sqlite_conn.commit()
+    pages = synthetic_pages(args.pages)
+    for i in range(0, len(pages), 500):
+        batch = pages[i:i + 500]
+        write_batch(sqlite_conn, "doc", batch, [c for p in batch for c in chunk_page("doc", "bench.pdf", p.page_number, "", p.text)])
+
+    report: Dict[str, Any] = {"pages": args.pages, "cpus": os.cpu_count(), "modes": {}}
+    for name, workers in (("inline", 0), ("read_pool", args.workers)):
+        db.read_pool = db.ReadPool(settings.SQLITE_PATH, workers)
+        report["modes"][name] = [await run_level(db, bm25_keyword_search, c, args.queries) for c in args.concurrency]
+    return report
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=20_000)
+    parser.add_argument("--queries", type=int, default=400)
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as tmp:
+        # Point the app at a throwaway database before its modules are imported
+        os.environ["SQLITE_PATH"] = os.path.join(tmp, "specscope.db")
+        os.environ["STORAGE_PATH"] = os.path.join(tmp, "storage")
+        os.environ["LOG_LEVEL"] = "WARNING"
+        print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
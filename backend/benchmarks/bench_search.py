@@ -0,0 +1,203 @@
+"""
+hybrid_search latency (p50/p99) by corpus size.
+
+    python -m backend.benchmarks.bench_search --chunks 10000 100000 1000000
+
+Each size is built in a fresh interpreter against a throwaway database: spec
+pages in the style of specgen are chunked and written with write_batch (FTS
+included) and their offline hash vectors (the embedding used when no API key
+is set) are loaded straight into the vector index, then the FTS index is
+optimized. A checklist of standard bid-review queries, and one of questions
+typed with punctuation, are then run sequentially, and per-query latency and
+the per-stage timings hybrid_search records are summarized. Finally a
+150-query checklist is run once through hybrid_search_batch (what POST
+/search/batch does) and once as sequential hybrid_search calls.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Iterator, List
+import numpy as np
+from .specgen import SECTIONS, _paragraphs
+
+QUERIES = [
+    "liquidated damages per calendar day",
+    "shop drawings submittal review",
+    "manufacturer warranty years materials workmanship",
+    "retainage withheld from progress payment",
+    "concrete compressive strength",
+    "substitutions after notice to proceed",
+    "testing agency inspections",
+    "temporary facilities and controls",
+    "certificates of compliance product data",
+    "repair damaged work at no cost to the owner",
+]
+
+# Questions as users type them: punctuation, money, section numbers, quotes
+QUESTIONS = [
+    "What are the liquidated damages per day?",
+    "Are LDs $2,000 or $2,500/day?",
+    "Section 01 33 00: submittal procedures?",
+    "Is 03-30-00 cast-in-place concrete f'c 4,000 psi?",
+    '"shop drawings" review period',
+    "Who's responsible for the builder's risk insurance?",
+    "retainage (5%) - when is it released?",
+    "Can the contractor propose substitutions after NTP?",
+]
+
+PAGES_PER_DOCUMENT = 2000
+
+def spec_pages(count: int, seed: int = 0) -> Iterator[Any]:
+    from ..app.core.pdf_processor import ExtractedPage
+    rng = random.Random(seed)
+    for i in range(count):
+        number, title = SECTIONS[(i // 40) % len(SECTIONS)]
+        body = "\n".join(_paragraphs(rng, rng.randint(6, 10)))
+        yield ExtractedPage(page_number=i % PAGES_PER_DOCUMENT + 1, text=f"SECTION {number} - {title}\n{body}\n",
+                            width=612.0, height=792.0, blocks=[], section=number)
+
+def build_corpus(target_chunks: int, batch_pages: int = 1000) -> Dict[str, Any]:
+    from ..app.config import sqlite_conn
+    from ..app.core.embeddings import _hash_to_vec, global_vector_index
+    from ..app.core.text_chunker import chunk_page
+    from ..app.services.document_service import write_batch
+    start = time.perf_counter()
+    total = 0
+    pages: List[Any] = []
+    chunks: List[Dict[str, Any]] = []
+    doc_id = None
+
+    def flush() -> None:
+        write_batch(sqlite_conn, doc_id, pages, chunks)
+        vecs = np.stack([_hash_to_vec(c["text"]) for c in chunks])
+        global_vector_index.upsert([c["id"] for c in chunks], vecs, document_ids=[doc_id] * len(chunks),
+                                   sections=[c["section"] for c in chunks], tags=[c["tags"] for c in chunks])
+        pages.clear()
+        chunks.clear()
+
+    for n, page in enumerate(spec_pages(sys.maxsize)):
+        if total >= target_chunks:
+            break
+        if n % PAGES_PER_DOCUMENT == 0:
+            if pages:
+                flush()
+            doc_id = f"doc{n // PAGES_PER_DOCUMENT}"
+            with sqlite_conn:
+                sqlite_conn.execute("INSERT INTO documents (id, filename, file_hash, pages_count, uploaded_at) VALUES (?, ?, ?, ?, '')",
+                                    (doc_id, f"{doc_id}.pdf", doc_id, PAGES_PER_DOCUMENT))
+        new = chunk_page(doc_id, f"{doc_id}.pdf", page.page_number, page.section, page.text)[:target_chunks - total]
+        pages.append(page)
+        chunks.extend(new)
+        total += len(new)
+        if len(pages) >= batch_pages:
+            flush()
+    if pages:
+        flush()
+    return {"chunks": total, "build_s": round(time.perf_counter() - start, 1)}
+
+def percentile(values: List[float], q: float) -> float:
+    return round(float(np.percentile(values, q)), 2) if values else 0.0
+
+async def run_queries(checklist: List[str], queries: int, top_k: int, alpha: float) -> Dict[str, Any]:
+    from ..app.core.search_engine import hybrid_search
+    from ..app.utils.timing import start_timings
+    # Warm the query embedder, page cache and read pool threads
+    for q in checklist:
+        await hybrid_search(q, top_k, alpha)
+    latencies: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    for i in range(queries):
+        timings = start_timings()
+        t0 = time.perf_counter()
+        await hybrid_search(checklist[i % len(checklist)], top_k, alpha)
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+        for name, ms in timings.items():
+            stages.setdefault(name, []).append(ms)
+    return {
+        "queries": queries,
+        "p50_ms": percentile(latencies, 50),
+        "p90_ms": percentile(latencies, 90),
+        "p99_ms": percentile(latencies, 99),
+        "mean_ms": round(float(np.mean(latencies)), 2),
+        "stages_p50_ms": {k: percentile(v, 50) for k, v in stages.items()},
+        "stages_p99_ms": {k: percentile(v, 99) for k, v in stages.items()},
+    }
+
+async def run_batch(size: int, top_k: int, alpha: float) -> Dict[str, Any]:
+    from ..app.core.search_engine import hybrid_search, hybrid_search_batch
+    from ..app.utils.timing import start_timings
+    # Distinct queries, so every one is embedded and scanned
+    checklist = [f"{q} {title.lower()}" for _, title in SECTIONS for q in QUERIES + QUESTIONS][:size]
+    timings = start_timings()
+    t0 = time.perf_counter()
+    first_ms = None
+    async for _ in hybrid_search_batch(checklist, top_k, alpha):
+        if first_ms is None:
+            first_ms = (time.perf_counter() - t0) * 1000.0
+    batch_s = time.perf_counter() - t0
+    stages = {k: round(v, 1) for k, v in timings.items()}
+    t0 = time.perf_counter()
+    for q in checklist:
+        await hybrid_search(q, top_k, alpha)
+    return {
+        "queries": len(checklist),
+        "sequential_s": round(time.perf_counter() - t0, 2),
+        "batch_s": round(batch_s, 2),
+        "first_result_ms": round(first_ms or 0.0, 1),
+        "stages_ms": stages,
+    }
+
+async def measure(queries: int, top_k: int, alpha: float) -> Dict[str, Any]:
+    from ..app.core.search_engine import FtsMaintenance
+    # What the app does once ingest goes quiet
+    start = time.perf_counter()
+    await FtsMaintenance(optimize_chunks=0).run()
+    report: Dict[str, Any] = {"fts_optimize_s": round(time.perf_counter() - start, 1)}
+    report.update(await run_queries(QUERIES, queries, top_k, alpha))
+    report["questions"] = await run_queries(QUESTIONS, queries, top_k, alpha)
+    report["batch"] = await run_batch(150, top_k, alpha)
+    return report
+
+def child(chunks: int, queries: int, top_k: int, alpha: float) -> Dict[str, Any]:
+    from ..app.config import settings, sqlite_conn
+    from ..app.core.embeddings import global_vector_index
+    report = build_corpus(chunks)
+    report.update(asyncio.run(measure(queries, top_k, alpha)))
+    report["db_mb"] = round(os.path.getsize(settings.SQLITE_PATH) / 2 ** 20, 1)
+    report["fts_mb"] = round(sqlite_conn.execute("SELECT SUM(LENGTH(block)) FROM chunks_fts_data").fetchone()[0] / 2 ** 20, 1)
+    report["index_mb"] = round(global_vector_index.memory_bytes() / 2 ** 20, 1)
+    report["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    return report
+
+def run_size(chunks: int, args: argparse.Namespace, tmp: str) -> Dict[str, Any]:
+    env = dict(os.environ, OPENAI_API_KEY="", SQLITE_PATH=os.path.join(tmp, f"db-{chunks}", "specscope.db"),
+               STORAGE_PATH=os.path.join(tmp, f"db-{chunks}", "storage"), LOG_LEVEL="WARNING")
+    cmd = [sys.executable, "-m", "backend.benchmarks.bench_search", "--child", str(chunks), "--queries", str(args.queries),
+           "--top-k", str(args.top_k), "--alpha", str(args.alpha)]
+    out = subprocess.run(cmd, env=env, check=True, capture_output=True, text=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--alpha", type=float, default=0.5)
+    parser.add_argument("--child", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(child(args.child, args.queries, args.top_k, args.alpha)))
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = [run_size(n, args, tmp) for n in args.chunks]
+    print(json.dumps({"top_k": args.top_k, "alpha": args.alpha, "runs": runs}, indent=2))
+
+if __name__ == "__main__":
+    main()
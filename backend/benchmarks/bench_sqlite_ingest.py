@@ -0,0 +1,104 @@
+"""
+SQLite ingest throughput (rows/s) for the page and chunk writes.
+
+    python -m backend.benchmarks.bench_sqlite_ingest --pages 5000
+
+Modes, each against a fresh database:
+  row        per-row execute, utcnow per row, per-row FTS trigger, default
+             journal (the old process_pdf path)
+  many       executemany per batch in one transaction, WAL + synchronous=NORMAL
+  deferred   as many, with the batch's FTS rows inserted in one statement
+  rebuild    trigger dropped for the whole load, then one FTS 'rebuild'
+"""
+import argparse
+import json
+import os
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+from ..app.config import get_sqlite_conn, init_sqlite_schema, register_functions, settings
+from ..app.core.pdf_processor import ExtractedPage
+from ..app.core.search_engine import deferred_fts, init_indices
+from ..app.core.text_chunker import chunk_page
+from ..app.services.document_service import write_batch
+from ..app.utils.page_text import compress_text, resolve_codec
+from .specgen import CLAUSES
+
+def synthetic_pages(n: int) -> List[ExtractedPage]:
+    pages = []
+    for i in range(n):
+        body = "\n".join(CLAUSES[(i + j) % len(CLAUSES)].format(n=i % 30, amt=1000 + i, pct=5, psi=4000) for j in range(24))
+        pages.append(ExtractedPage(page_number=i + 1, text=f"SECTION 01 {i % 99:02d} 00 - GENERAL\n{body}\n", width=612.0, height=792.0, blocks=[]))
+    return pages
+
+def open_db(path: str, tuned: bool) -> sqlite3.Connection:
+    if tuned:
+        conn = get_sqlite_conn(path)
+    else:
+        conn = sqlite3.connect(path)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON;")
+        register_functions(conn)
+    init_sqlite_schema(conn)
+    init_indices(conn)
+    conn.execute("INSERT INTO documents (id, filename, file_hash, pages_count, uploaded_at) VALUES ('doc', 'bench.pdf', 'h', 0, '')")
+    conn.commit()
+    return conn
+
+def load_rows(conn: sqlite3.Connection, pages: List[ExtractedPage], chunks: List[List[Dict[str, Any]]]) -> None:
+    codec = resolve_codec(settings.PAGE_CODEC)
+    for p, chs in zip(pages, chunks):
+        conn.execute("INSERT INTO pages (document_id, page_number, content, codec, width, height) VALUES (?, ?, ?, ?, ?, ?)",
+                     ("doc", p.page_number, compress_text(p.text, codec), codec, p.width, p.height))
+        for c in chs:
+            conn.execute(
+                "INSERT INTO chunks (id, document_id, filename, page_number, section, char_start, char_end, hash, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (c["id"], c["document_id"], c["filename"], c["page_number"], c["section"], c["char_start"], c["char_end"], c["hash"], datetime.utcnow().isoformat()))
+    conn.commit()
+
+def batches(pages: List[ExtractedPage], chunks: List[List[Dict[str, Any]]], size: int):
+    bp, bc = [], []
+    for p, chs in zip(pages, chunks):
+        bp.append(p)
+        bc.extend(chs)
+        if len(bc) >= size:
+            yield bp, bc
+            bp, bc = [], []
+    if bp:
+        yield bp, bc
+
+def run_mode(mode: str, pages: List[ExtractedPage], chunks: List[List[Dict[str, Any]]], batch: int, tmp: str) -> Dict[str, Any]:
+    conn = open_db(os.path.join(tmp, f"{mode}.db"), tuned=mode != "row")
+    rows = len(pages) + sum(len(c) for c in chunks)
+    start = time.perf_counter()
+    if mode == "row":
+        load_rows(conn, pages, chunks)
+    elif mode == "rebuild":
+        with conn:
+            with deferred_fts(conn, rebuild=True):
+                for bp, bc in batches(pages, chunks, batch):
+                    write_batch(conn, "doc", bp, bc, defer_fts=False)
+    else:
+        for bp, bc in batches(pages, chunks, batch):
+            write_batch(conn, "doc", bp, bc, defer_fts=mode == "deferred")
+    seconds = time.perf_counter() - start
+    hits = conn.execute("SELECT COUNT(*) FROM chunks_fts WHERE chunks_fts MATCH 'liquidated'").fetchone()[0]
+    conn.close()
+    return {"mode": mode, "rows": rows, "seconds": round(seconds, 2), "rows_per_s": round(rows / seconds), "fts_hits": hits}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=5000)
+    parser.add_argument("--batch", type=int, default=256, help="Chunks per transaction")
+    parser.add_argument("--modes", nargs="+", default=["row", "many", "deferred", "rebuild"])
+    args = parser.parse_args()
+    pages = synthetic_pages(args.pages)
+    chunks = [chunk_page("doc", "bench.pdf", p.page_number, "", p.text) for p in pages]
+    with tempfile.TemporaryDirectory() as tmp:
+        runs = [run_mode(m, pages, chunks, args.batch, tmp) for m in args.modes]
+    print(json.dumps({"pages": args.pages, "batch": args.batch, "runs": runs}, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Run the extraction, ingest, search and conflict detection benchmarks and write one JSON report.
+
+    python -m backend.benchmarks.bench_suite --out runs/$(git rev-parse --short HEAD).json
+    python -m backend.benchmarks.bench_suite --compare runs/before.json runs/after.json
+
+Each benchmark runs in its own interpreter against throwaway databases; the
+report records the commit and machine so runs can be lined up. --compare
+prints the relative change of every numeric field two reports share.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, Iterator, List, Tuple
+
+def run_benchmark(module: str, args: List[str], tmp: str) -> Dict[str, Any]:
+    env = dict(os.environ, OPENAI_API_KEY="", LOG_LEVEL="WARNING",
+               SQLITE_PATH=os.path.join(tmp, module, "specscope.db"), STORAGE_PATH=os.path.join(tmp, module, "storage"))
+    out = subprocess.run([sys.executable, "-m", f"backend.benchmarks.{module}", *args],
+                         env=env, check=True, capture_output=True, text=True).stdout
+    # Reports are printed indented after any single-line log records
+    lines = out.splitlines()
+    start = max(i for i, line in enumerate(lines) if line == "{")
+    return json.loads("\n".join(lines[start:]))
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def numeric_leaves(value: Any, path: str = "") -> Iterator[Tuple[str, float]]:
+    if isinstance(value, dict):
+        for k, v in value.items():
+            yield from numeric_leaves(v, f"{path}.{k}" if path else k)
+    elif isinstance(value, list):
+        for i, v in enumerate(value):
+            yield from numeric_leaves(v, f"{path}[{i}]")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield path, float(value)
+
+def compare(base_path: str, new_path: str) -> None:
+    with open(base_path) as fh:
+        base = dict(numeric_leaves(json.load(fh)["results"]))
+    with open(new_path) as fh:
+        new = dict(numeric_leaves(json.load(fh)["results"]))
+    for key in sorted(base.keys() & new.keys()):
+        before, after = base[key], new[key]
+        change = f"{(after - before) / before * 100.0:+.1f}%" if before else "n/a"
+        print(f"{key:60s} {before:>12g} {after:>12g} {change:>9s}")
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--extract-pages", type=int, default=2000)
+    parser.add_argument("--ingest-pages", type=int, nargs="+", default=[250, 1000])
+    parser.add_argument("--search-chunks", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--conflict-pages", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--out", help="write the report here as well as to stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("BASE", "NEW"))
+    args = parser.parse_args()
+    if args.compare:
+        compare(*args.compare)
+        return
+    started = time.time()
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {
+            "extract": run_benchmark("bench_pdf_extract", ["--pages", str(args.extract_pages)], tmp),
+            "ingest": run_benchmark("bench_ingest", ["--pages", *map(str, args.ingest_pages)], tmp),
+            "search": run_benchmark("bench_search", ["--chunks", *map(str, args.search_chunks), "--queries", str(args.queries)], tmp),
+            "conflicts": run_benchmark("bench_conflicts", ["--pages", *map(str, args.conflict_pages)], tmp),
+        }
+    report = {
+        "revision": git_revision(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(started)),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "results": results,
+    }
+    text = json.dumps(report, indent=2)
+    if args.out:
+        os.makedirs(os.path.dirname(args.out) or ".", exist_ok=True)
+        with open(args.out, "w") as fh:
+            fh.write(text + "\n")
+    print(text)
+
+if __name__ == "__main__":
+    main()
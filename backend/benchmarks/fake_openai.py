@@ -0,0 +1,100 @@
+"""
+Local stand-in for the OpenAI embeddings endpoint, for tests and benchmarks.
+
+Serves POST {base_url}/embeddings with deterministic hash vectors, optional
+fake latency, and a 429 on every Nth request. It records the request count and
+the peak number of requests in flight, so callers can check concurrency limits.
+
+    with FakeEmbeddingServer(latency=0.05, fail_every=5) as server:
+        settings.OPENAI_BASE_URL = server.base_url
+"""
+import base64
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+import numpy as np
+from ..app.core.embeddings import _hash_to_vec
+
+class FakeEmbeddingServer:
+    def __init__(self, latency: float = 0.0, fail_every: int = 0, dim: int = 64, retry_after: float = 0.01):
+        self.latency = latency
+        self.fail_every = fail_every
+        self.dim = dim
+        self.retry_after = retry_after
+        self.requests = 0
+        self.rate_limited = 0
+        self.inputs: List[int] = []
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self) -> "FakeEmbeddingServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args) -> None:
+                return
+
+            def _send(self, status: int, body: dict, headers: dict = None) -> None:
+                payload = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                with fake._lock:
+                    fake.requests += 1
+                    n = fake.requests
+                    fake.in_flight += 1
+                    fake.peak_in_flight = max(fake.peak_in_flight, fake.in_flight)
+                try:
+                    if fake.latency:
+                        time.sleep(fake.latency)
+                    if fake.fail_every and n % fake.fail_every == 0:
+                        with fake._lock:
+                            fake.rate_limited += 1
+                        self._send(429, {"error": {"message": "Rate limit reached", "type": "requests"}},
+                                   {"retry-after": str(fake.retry_after)})
+                        return
+                    texts = body["input"] if isinstance(body["input"], list) else [body["input"]]
+                    with fake._lock:
+                        fake.inputs.append(len(texts))
+                    data = []
+                    for i, t in enumerate(texts):
+                        vec = _hash_to_vec(t, fake.dim)
+                        if body.get("encoding_format") == "base64":
+                            emb = base64.b64encode(vec.astype(np.float32).tobytes()).decode()
+                        else:
+                            emb = vec.tolist()
+                        data.append({"object": "embedding", "index": i, "embedding": emb})
+                    tokens = sum(len(t) // 4 for t in texts)
+                    self._send(200, {"object": "list", "data": data, "model": body.get("model"),
+                                     "usage": {"prompt_tokens": tokens, "total_tokens": tokens}})
+                finally:
+                    with fake._lock:
+                        fake.in_flight -= 1
+
+        return Handler
@@ -0,0 +1,93 @@
+"""
+Synthetic CSI-format project manual generator for benchmarks.
+
+    python -m backend.benchmarks.specgen /tmp/manual.pdf --pages 2000
+
+Pages carry SECTION headers, PART/article numbering and requirement language
+(shall/must, submittals, warranties, liquidated damages), so extraction,
+chunking and search see text shaped like a real spec book. --addenda appends
+addendum pages that revise earlier clauses with different amounts, the kind
+of contradiction conflict detection has to find.
+"""
+import argparse
+import random
+from typing import List
+import fitz  # PyMuPDF
+
+SECTIONS = [
+    ("01 10 00", "SUMMARY"), ("01 33 00", "SUBMITTAL PROCEDURES"), ("01 78 36", "WARRANTIES"),
+    ("03 30 00", "CAST-IN-PLACE CONCRETE"), ("04 20 00", "UNIT MASONRY"), ("05 12 00", "STRUCTURAL STEEL FRAMING"),
+    ("07 21 00", "THERMAL INSULATION"), ("07 92 00", "JOINT SEALANTS"), ("08 71 00", "DOOR HARDWARE"),
+    ("09 29 00", "GYPSUM BOARD"), ("09 91 23", "INTERIOR PAINTING"), ("22 11 16", "DOMESTIC WATER PIPING"),
+    ("23 05 93", "TESTING, ADJUSTING, AND BALANCING FOR HVAC"), ("26 05 19", "LOW-VOLTAGE ELECTRICAL POWER CONDUCTORS"),
+    ("31 23 33", "TRENCHING AND BACKFILLING"), ("32 12 16", "ASPHALT PAVING"),
+]
+
+CLAUSES = [
+    "The Contractor shall submit shop drawings for review {n} days prior to fabrication.",
+    "Liquidated damages of ${amt} per calendar day shall be assessed for each day of delay beyond Substantial Completion.",
+    "Provide a manufacturer's warranty of {n} years covering materials and workmanship.",
+    "All work must comply with the referenced standards and the requirements of the authority having jurisdiction.",
+    "Submit product data, samples, and certificates of compliance for each product specified.",
+    "Retainage of {pct} percent will be withheld from each progress payment until final acceptance.",
+    "The Contractor shall coordinate inspections with the Owner's testing agency at least {n} hours in advance.",
+    "Concrete shall achieve a minimum 28-day compressive strength of {psi} psi.",
+    "Field quality control testing must be performed by an independent agency acceptable to the Architect.",
+    "Protect installed work from damage until Substantial Completion; repair or replace damaged work at no cost to the Owner.",
+    "Substitutions will not be considered unless submitted within {n} days after the Notice to Proceed.",
+    "Maintain temporary facilities and controls in accordance with Section 01 50 00.",
+]
+
+def _paragraphs(rng: random.Random, count: int) -> List[str]:
+    out = []
+    for i in range(count):
+        clause = rng.choice(CLAUSES).format(n=rng.choice([7, 10, 14, 21, 30, 48]), amt=rng.choice([500, 1000, 2000, 2500]),
+                                            pct=rng.choice([5, 10]), psi=rng.choice([3000, 4000, 5000]))
+        out.append(f"{chr(ord('A') + i)}. {clause}")
+    return out
+
+ADDENDUM_ITEMS = [
+    "Section 01 10 00: Revise to read: Liquidated damages of ${amt} per calendar day shall be assessed for each day of delay.",
+    "Section 01 29 00: Revise to read: Retainage of {pct} percent will be withheld from each progress payment.",
+    "Section 01 78 36: Revise to read: Provide a manufacturer's warranty of {n} years covering materials and workmanship.",
+    "Section 03 30 00: Revise to read: Concrete shall achieve a minimum 28-day compressive strength of {psi} psi.",
+    "Section 00 43 13: Revise to read: A bid bond of {pct} percent of the bid amount shall accompany each bid.",
+]
+
+def _addendum_lines(rng: random.Random, number: int) -> List[str]:
+    lines = [f"ADDENDUM NO. {number}", "", "This Addendum forms part of the Contract Documents and modifies them as follows.", ""]
+    for i in range(rng.randint(3, 5)):
+        item = rng.choice(ADDENDUM_ITEMS).format(n=rng.choice([1, 2, 5]), amt=rng.choice([750, 1500, 3000]),
+                                                 pct=rng.choice([2, 5, 10]), psi=rng.choice([3500, 4500]))
+        lines.append(f"{number}.{i + 1} {item}")
+    return lines
+
+def generate_spec_pdf(path: str, pages: int, seed: int = 0, addenda: int = 0) -> None:
+    rng = random.Random(seed)
+    doc = fitz.open()
+    pages_per_section = max(1, pages // len(SECTIONS))
+    for i in range(pages):
+        number, title = SECTIONS[(i // pages_per_section) % len(SECTIONS)]
+        part = ["PART 1 - GENERAL", "PART 2 - PRODUCTS", "PART 3 - EXECUTION"][i % 3]
+        page = doc.new_page()
+        lines = [f"SECTION {number} - {title}", "", part, f"1.{i % 9 + 1} REQUIREMENTS", ""]
+        lines += _paragraphs(rng, rng.randint(6, 10))
+        page.insert_textbox(fitz.Rect(54, 54, page.rect.width - 54, page.rect.height - 72), "\n".join(lines), fontsize=9)
+        page.insert_text((page.rect.width / 2 - 20, page.rect.height - 36), f"{number} - {i % pages_per_section + 1}", fontsize=8)
+    for a in range(1, addenda + 1):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(54, 54, page.rect.width - 54, page.rect.height - 72), "\n".join(_addendum_lines(rng, a)), fontsize=9)
+    doc.save(path)
+    doc.close()
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path")
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--addenda", type=int, default=0)
+    args = parser.parse_args()
+    generate_spec_pdf(args.path, args.pages, args.seed, args.addenda)
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,14 @@
 import os
+import shutil
+import tempfile
 import pytest
+
+# Settings are read when the app is imported: give every session its own
+# database and storage, so fixed chunk ids never collide with an earlier run
+DATA_DIR = tempfile.mkdtemp(prefix="specscope-tests-")
+os.environ["SQLITE_PATH"] = os.path.join(DATA_DIR, "specscope.db")
+os.environ["STORAGE_PATH"] = os.path.join(DATA_DIR, "storage")
+
 from fastapi.testclient import TestClient
 from backend.app.main import app
 
@@ -8,6 +17,25 @@ def client():
     return TestClient(app)
 
 @pytest.fixture(scope="session", autouse=True)
-def ensure_data_dirs():
-    os.makedirs("data", exist_ok=True)
-    os.makedirs("data/storage", exist_ok=True)
+def data_dir():
+    yield DATA_DIR
+    shutil.rmtree(DATA_DIR, ignore_errors=True)
+
+@pytest.fixture
+def seed_chunks():
+    """Write a document whose chunks each span one page: rows of (chunk_id, page_number, section, text)."""
+    from backend.app.config import sqlite_conn
+    from backend.app.core.pdf_processor import ExtractedPage
+    from backend.app.services.document_service import write_batch
+    from backend.app.utils.tags import chunk_tags
+
+    def seed(doc_id, filename, rows, conn=sqlite_conn):
+        conn.execute("INSERT OR IGNORE INTO documents (id, filename, file_hash, pages_count, uploaded_at) VALUES (?, ?, ?, ?, ?)",
+                     (doc_id, filename, f"hash-{doc_id}", len(rows), "2024-01-01T00:00:00Z"))
+        pages = [ExtractedPage(page_number=page, text=text, width=612.0, height=792.0, blocks=[]) for _, page, _, text in rows]
+        chunks = [{"id": cid, "document_id": doc_id, "filename": filename, "page_number": page, "section": section,
+                   "char_start": 0, "char_end": len(text), "hash": f"h-{cid}", "has_modal": False,
+                   "tags": chunk_tags(text, section)} for cid, page, section, text in rows]
+        write_batch(conn, doc_id, pages, chunks)
+
+    return seed
@@ -0,0 +1,91 @@
+import threading
+import time
+import numpy as np
+from backend.app.core.embeddings import VectorIndex
+from backend.app.core.ann_index import IVFFlatIndex, HNSWIndex
+
+def _recall(index, exact, queries, k=10):
+    hits = 0
+    for q in queries:
+        expected = {cid for cid, _ in exact.query(q, k)}
+        hits += len(expected & {cid for cid, _ in index.query(q, k)})
+    return hits / (k * len(queries))
+
+def _corpus(rows, dim=32, seed=3):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(40, dim))
+    vecs = (centres[rng.integers(0, 40, rows)] + 0.5 * rng.normal(size=(rows, dim))).astype(np.float32)
+    return [f"c{i}" for i in range(rows)], vecs, vecs[rng.choice(rows, 30)] + 0.1
+
+def test_ivf_recall_and_deletes():
+    ids, vecs, queries = _corpus(4000)
+    exact = VectorIndex()
+    exact.upsert(ids, vecs)
+    ivf = IVFFlatIndex(nlist=32, nprobe=8)
+    ivf.upsert(ids, vecs)
+    # Training runs in the background; queries are exact until it lands
+    assert _recall(ivf, exact, queries) >= 0.9
+    assert ivf.wait_for_training(timeout=60)
+    assert _recall(ivf, exact, queries) >= 0.9
+    # Rows deleted after training never come back, including across compaction
+    gone = ids[:1500]
+    ivf.delete(gone)
+    exact.delete(gone)
+    assert not set(gone) & {cid for q in queries for cid, _ in ivf.query(q, 10)}
+    assert _recall(ivf, exact, queries) >= 0.9
+
+def test_hnsw_recall():
+    ids, vecs, queries = _corpus(1500)
+    exact = VectorIndex()
+    exact.upsert(ids, vecs)
+    hnsw = HNSWIndex(m=8, ef_construction=64, ef_search=64)
+    hnsw.upsert(ids, vecs)
+    assert _recall(hnsw, exact, queries) >= 0.9
+
+def test_hnsw_delete_rebuilds_in_background():
+    ids, vecs, queries = _corpus(1200)
+    hnsw = HNSWIndex(m=8, ef_construction=64, ef_search=64)
+    hnsw.upsert(ids, vecs, document_ids=["d1"] * len(ids))
+    gone = ids[:700]
+    hnsw.delete(gone)
+    # Written while the rebuild may still be running; must survive the swap
+    hnsw.upsert(["late"], vecs[:1], document_ids=["d2"])
+    hnsw.compact(wait=True)
+    assert hnsw._tombstones == 0 and len(hnsw) == len(ids) - len(gone) + 1
+    assert not set(gone) & {cid for q in queries for cid, _ in hnsw.query(q, 10)}
+    assert hnsw.query(vecs[0], 1, filters={"doc_ids": ["d2"]})[0][0] == "late"
+    exact = VectorIndex()
+    exact.upsert(ids[700:], vecs[700:])
+    exact.upsert(["late"], vecs[:1])
+    assert _recall(hnsw, exact, queries) >= 0.9
+
+def test_hnsw_relinks_changed_rows_and_lets_queries_in():
+    ids, vecs, queries = _corpus(1500)
+    hnsw = HNSWIndex(m=8, ef_construction=64, ef_search=64)
+    hnsw.upsert(ids, vecs)
+    rng = np.random.default_rng(9)
+    moved = (vecs[rng.permutation(len(ids))] + 0.1 * rng.normal(size=vecs.shape)).astype(np.float32)
+    exact = VectorIndex()
+    exact.upsert(ids, vecs)
+    # A tenth of the rows move elsewhere: re-linking them is enough
+    hnsw.upsert(ids[:150], moved[:150])
+    exact.upsert(ids[:150], moved[:150])
+    assert hnsw._rebuilder is None
+    assert _recall(hnsw, exact, moved[:150:5]) >= 0.9
+    # Once most rows have moved, the stale edges into them are rebuilt away
+    hnsw.upsert(ids, moved)
+    exact.upsert(ids, moved)
+    hnsw.compact(wait=True)
+    fresh = HNSWIndex(m=8, ef_construction=64, ef_search=64)
+    fresh.upsert(ids, moved)
+    assert hnsw._relinked == 0 and _recall(hnsw, exact, moved[::50]) >= _recall(fresh, exact, moved[::50]) - 0.05
+    # A large batch is linked row by row, so a query gets the lock before it finishes
+    more = [f"n{i}" for i in range(1500)]
+    writer = threading.Thread(target=hnsw.upsert, args=(more, vecs))
+    writer.start()
+    while not hnsw._unlinked and writer.is_alive():
+        time.sleep(0.001)
+    hnsw.query(queries[0], 10)
+    assert hnsw._unlinked and writer.is_alive()
+    writer.join()
+    assert not hnsw._unlinked and len(hnsw) == 3000
@@ -0,0 +1,68 @@
+from backend.app.config import sqlite_conn
+from backend.app.core import conflict_engine
+from backend.app.core.conflict_engine import extract_claims, find_conflicts, sentence_quantities
+from backend.app.models.query import Citation
+from backend.app.services.citation_service import validate_citations
+
+SPEC = ("A. Liquidated damages of $2,000 per calendar day shall be assessed for each day of delay.\n"
+        "B. A bid bond of five percent (5%) of the bid amount shall accompany each bid.\n"
+        "C. A performance bond of 100% of the Contract Sum is required.")
+ADDENDUM = ("1.1 Section 01 10 00: Revise to read: Liquidated damages of $2,500 per calendar day shall be assessed for each day of delay.\n"
+            "1.2 A bid bond of 10 percent of the bid amount shall accompany each bid.\n"
+            "1.3 Section 03 30 00: Revise to read: Concrete shall achieve a minimum 28-day compressive strength of 4500 psi.")
+CONCRETE = "Concrete shall achieve a minimum 28-day compressive strength of 4,000 psi. Submit mix designs 14 days before placement."
+
+def test_sentence_quantities():
+    assert sentence_quantities("Submit within fourteen (14) calendar days, with a 5.5% fee and $2,000.00 cap.") == {
+        "$": frozenset({2000.0}), "%": frozenset({5.5}), "days": frozenset({14.0})}
+    assert sentence_quantities("A 28-day compressive strength test per Section 03 30 00.") == {}
+
+def test_conflicts_are_found_within_topic_and_section_blocks():
+    rows = [
+        {"id": "s1", "document_id": "spec", "filename": "spec.pdf", "page_number": 3, "section": "SECTION 01 10 00 - SUMMARY", "text": SPEC},
+        {"id": "s2", "document_id": "spec", "filename": "spec.pdf", "page_number": 40, "section": "SECTION 03 30 00 - CONCRETE", "text": CONCRETE},
+        {"id": "a1", "document_id": "add1", "filename": "add1.pdf", "page_number": 1, "section": "ADDENDUM NO. 1", "text": ADDENDUM},
+    ]
+    findings = find_conflicts(extract_claims(rows))
+    pairs = {(f["claim"].split(":")[0], f["contradicts"].split(":")[0]) for f in findings}
+    # Bid and performance bonds are blocked apart, so 5% vs 100% is not a conflict
+    assert pairs == {("5%", "10%"), ("$2,000", "$2,500"), ("4,000 psi", "4,500 psi")}
+    concrete = next(f for f in findings if "psi" in f["claim"])
+    assert [c["chunk_id"] for c in concrete["citations_left"]] == ["s2"]
+    assert [c["chunk_id"] for c in concrete["citations_right"]] == ["a1"]
+    assert all(0 < f["confidence"] <= 1 for f in findings)
+    # A topic narrows the scan to its own block
+    only_ld = find_conflicts(extract_claims(rows, topic="liquidated_damages"))
+    assert [f["claim"].split(":")[0] for f in only_ld] == ["$2,000"]
+
+def test_conflicts_endpoint_returns_valid_citations(client, seed_chunks):
+    seed_chunks("cspec", "Spec.pdf", [("cs1", 1, "SECTION 01 10 00 - SUMMARY", SPEC), ("cs2", 2, "SECTION 01 10 00 - SUMMARY", SPEC)])
+    seed_chunks("cadd", "Addendum.pdf", [("ca1", 1, "ADDENDUM NO. 1", ADDENDUM)])
+    resp = client.post("/conflicts", json={"scope": "filtered", "topic": "liquidated_damages", "doc_filter": {"doc_ids": ["cspec", "cadd"]}})
+    assert resp.status_code == 200
+    (finding,) = resp.json()
+    # The amount stated twice is the claim; the addendum contradicts it
+    assert finding["claim"].startswith("$2,000") and len(finding["citations_left"]) == 2
+    assert [c["chunk_id"] for c in finding["citations_right"]] == ["ca1"]
+    citations = [Citation(**c) for c in finding["citations_left"] + finding["citations_right"]]
+    assert validate_citations(citations, sqlite_conn)
+    assert client.post("/conflicts", json={"scope": "all", "topic": "weather"}).status_code == 400
+    assert client.post("/conflicts", json={"scope": "some"}).status_code == 400
+
+def test_topic_is_pushed_into_the_chunk_query(client, seed_chunks, monkeypatch):
+    seed_chunks("tspec", "Spec.pdf", [("ts1", 1, "SECTION 01 10 00 - SUMMARY", SPEC), ("ts2", 2, "SECTION 03 30 00 - CONCRETE", CONCRETE)])
+    loaded = []
+    real_load = conflict_engine.load_chunk_rows
+
+    def load(conn, filters=None):
+        for row in real_load(conn, filters):
+            loaded.append(row["id"])
+            yield row
+
+    monkeypatch.setattr(conflict_engine, "load_chunk_rows", load)
+    for scope in ("all", "filtered"):
+        loaded.clear()
+        resp = client.post("/conflicts", json={"scope": scope, "topic": "liquidated_damages", "doc_filter": {"doc_ids": ["tspec"]}})
+        assert resp.status_code == 200
+        # The concrete chunk carries no liquidated damages tag, so it is never read
+        assert "ts1" in loaded and "ts2" not in loaded
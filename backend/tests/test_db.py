@@ -0,0 +1,33 @@
+import sqlite3
+import threading
+import pytest
+from backend.app.config import get_sqlite_conn, init_sqlite_schema
+from backend.app.core.db import ReadPool, Writer
+
+@pytest.mark.asyncio
+async def test_reads_use_per_thread_read_only_connections(tmp_path):
+    path = str(tmp_path / "pool.db")
+    conn = get_sqlite_conn(path)
+    init_sqlite_schema(conn)
+    pool = ReadPool(path, size=2)
+    ident = lambda c: (threading.get_ident(), id(c))
+    seen = {await pool.run(ident) for _ in range(20)}
+    assert threading.get_ident() not in {t for t, _ in seen}
+    assert len({t for t, _ in seen}) == len({c for _, c in seen}) <= 2
+    with pytest.raises(sqlite3.OperationalError):
+        await pool.run(lambda c: c.execute("INSERT INTO ingest_jobs (id, filename, path, created_at, updated_at) VALUES ('j', 'f', 'p', '', '')"))
+
+@pytest.mark.asyncio
+async def test_writer_rolls_back_failed_writes(tmp_path):
+    conn = get_sqlite_conn(str(tmp_path / "w.db"))
+    init_sqlite_schema(conn)
+    writer = Writer(conn)
+
+    def failing(c):
+        c.execute("INSERT INTO ingest_jobs (id, filename, path, created_at, updated_at) VALUES ('j', 'f', 'p', '', '')")
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        await writer.run(failing)
+    assert not conn.in_transaction
+    assert await writer.run(lambda c: c.execute("SELECT COUNT(*) FROM ingest_jobs").fetchone()[0]) == 0
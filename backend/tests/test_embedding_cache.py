@@ -0,0 +1,50 @@
+import sqlite3
+import uuid
+import numpy as np
+import pytest
+from backend.app.config import init_sqlite_schema
+from backend.app.core import embeddings
+from backend.app.core.embedding_cache import EmbeddingCache
+
+def test_cache_lru_eviction():
+    conn = sqlite3.connect(":memory:")
+    init_sqlite_schema(conn)
+    cache = EmbeddingCache(conn, max_entries=3)
+    cache.put_many("m", ["a", "b", "c"], np.eye(3, dtype=np.float32))
+    assert set(cache.get_many("m", ["a"])) == {"a"}
+    cache.put_many("m", ["d"], np.ones((1, 3), dtype=np.float32))
+    # "b" is the least recently used entry once "a" has been read
+    assert set(cache.get_many("m", ["a", "b", "c", "d"])) == {"a", "c", "d"}
+    assert cache.get_many("other-model", ["a"]) == {}
+    assert cache.stats() == {"hits": 4, "misses": 2, "evictions": 1}
+
+@pytest.mark.asyncio
+async def test_upsert_embeddings_only_embeds_misses(monkeypatch):
+    sent = []
+    real_embed = embeddings.embed_texts
+
+    async def counting_embed(texts, model, api_key):
+        sent.extend(texts)
+        return await real_embed(texts, model=model, api_key=api_key)
+
+    monkeypatch.setattr(embeddings, "embed_texts", counting_embed)
+    tag = uuid.uuid4().hex
+    first = [{"id": f"{tag}-{i}", "text": f"{tag} clause {i}"} for i in range(4)]
+    stats = await embeddings.upsert_embeddings(first, model="m", api_key=None, persist=False)
+    assert stats["cache_misses"] == 4 and len(sent) == 4
+    # A revised upload repeats three clauses and adds one
+    revised = [{"id": f"{tag}-r{i}", "text": f"{tag} clause {i}"} for i in (0, 1, 2, 9)]
+    stats = await embeddings.upsert_embeddings(revised, model="m", api_key=None, persist=False)
+    assert stats == {"chunks": 4, "cache_hits": 3, "cache_misses": 1}
+    assert sent[4:] == [f"{tag} clause 9"]
+
+@pytest.mark.asyncio
+async def test_upsert_embeddings_uses_the_given_connection(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "own.db"))
+    init_sqlite_schema(conn)
+    tag = uuid.uuid4().hex
+    await embeddings.upsert_embeddings([{"id": f"{tag}-0", "text": f"{tag} clause"}], model="m", api_key=None, conn=conn)
+    # Cache entry and vector both land on conn
+    assert conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0] == 1
+    assert conn.execute("SELECT COUNT(*) FROM chunk_vectors").fetchone()[0] == 1
+    embeddings.global_vector_index.delete([f"{tag}-0"])
@@ -0,0 +1,55 @@
+import asyncio
+import time
+import numpy as np
+import pytest
+from backend.app.core import metrics
+from backend.app.core.embeddings import _hash_to_vec
+from backend.app.core import embedding_client
+from backend.app.core.embedding_client import EmbeddingClient, TokenBucket, get_embedding_client, pack_batches
+from backend.benchmarks.fake_openai import FakeEmbeddingServer
+
+def test_pack_batches_respects_token_budget():
+    texts = ["x" * 400] * 10  # ~100 tokens each
+    batches = pack_batches(texts, max_tokens=250, max_inputs=100)
+    assert batches == [[0, 1], [2, 3], [4, 5], [6, 7], [8, 9]]
+    assert pack_batches(texts, max_tokens=10_000, max_inputs=3)[0] == [0, 1, 2]
+
+@pytest.mark.asyncio
+async def test_concurrent_batches_keep_order_and_retry_429():
+    texts = [f"Section 01 {i:02d} 00 clause {i} " + "y" * 200 for i in range(60)]
+    retried, embedded = metrics.embedding_calls.value(outcome="retried"), metrics.embedding_texts.value()
+    with FakeEmbeddingServer(latency=0.05, fail_every=4) as server:
+        client = EmbeddingClient("test-key", base_url=server.base_url, concurrency=4, rpm=100_000,
+                                 max_batch_tokens=300, max_batch_inputs=64)
+        start = time.perf_counter()
+        out = await client.embed(texts, model="text-embedding-3-large")
+        elapsed = time.perf_counter() - start
+    assert np.allclose(out, np.stack([_hash_to_vec(t) for t in texts]), atol=1e-6)
+    assert server.rate_limited > 0 and client.retries == server.rate_limited
+    assert metrics.embedding_calls.value(outcome="retried") - retried == server.rate_limited
+    assert metrics.embedding_texts.value() - embedded == len(texts)
+    assert 1 < server.peak_in_flight <= 4
+    # 12 batches at 50ms each would take >0.6s one after another
+    assert elapsed < 0.6
+
+@pytest.mark.asyncio
+async def test_token_bucket_throttles():
+    bucket = TokenBucket(rate_per_minute=600)  # 10 per second, burst of 600
+    bucket.tokens = 0
+    start = time.perf_counter()
+    for _ in range(3):
+        await bucket.acquire(1)
+    assert time.perf_counter() - start >= 0.25
+
+def test_clients_are_per_loop_and_dropped_with_it():
+    async def get():
+        client = get_embedding_client("test-key")
+        assert get_embedding_client("test-key") is client
+        return client, asyncio.get_running_loop()
+
+    first, first_loop = asyncio.run(get())
+    second, second_loop = asyncio.run(get())
+    assert second is not first
+    # The loops are still referenced here; the next lookup drops them because they are closed
+    asyncio.run(get())
+    assert first_loop not in embedding_client._clients and second_loop not in embedding_client._clients
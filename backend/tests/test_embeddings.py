@@ -0,0 +1,86 @@
+import sqlite3
+import numpy as np
+from backend.app.config import init_sqlite_schema
+from backend.app.core.embeddings import VectorIndex, cosine_similarity, persist_vectors, load_vectors
+from backend.app.core.ann_index import IVFFlatIndex, HNSWIndex
+from backend.app.core.vector_store import MmapVectorIndex
+from backend.app.utils.tags import chunk_tags
+
+def test_vector_index_matches_brute_force_and_compacts():
+    rng = np.random.default_rng(0)
+    vecs = rng.normal(size=(500, 32)).astype(np.float32)
+    ids = [f"c{i}" for i in range(500)]
+    index = VectorIndex(initial_capacity=16)
+    # Upsert in uneven batches to exercise growth
+    for start in range(0, 500, 97):
+        index.upsert(ids[start:start + 97], vecs[start:start + 97])
+    assert len(index) == 500 and index.capacity >= 500
+
+    q = rng.normal(size=32).astype(np.float32)
+    expected = sorted(((cid, cosine_similarity(v, q)) for cid, v in zip(ids, vecs)), key=lambda x: x[1], reverse=True)[:10]
+    got = index.query(q, top_k=10)
+    assert [cid for cid, _ in got] == [cid for cid, _ in expected]
+    assert np.allclose([s for _, s in got], [s for _, s in expected], atol=1e-5)
+
+    # Deleting the best hits removes them; enough tombstones trigger compaction
+    index.delete([cid for cid, _ in got[:5]] + ids[:200])
+    assert len(index) == len(set(ids[200:]) - {cid for cid, _ in got[:5]})
+    remaining = index.query(q, top_k=10)
+    assert not {cid for cid, _ in remaining} & ({cid for cid, _ in got[:5]} | set(ids[:200]))
+
+    # Upserting an existing id overwrites in place
+    index.upsert([ids[300]], q[None, :])
+    assert index.query(q, top_k=1)[0][0] == ids[300]
+
+def test_persisted_vectors_round_trip():
+    conn = sqlite3.connect(":memory:")
+    init_sqlite_schema(conn)
+    rng = np.random.default_rng(1)
+    vecs = rng.normal(size=(20, 16)).astype(np.float32)
+    ids = [f"p{i}" for i in range(20)]
+    persist_vectors(conn, ids, vecs)
+    index = VectorIndex()
+    stats = load_vectors(conn, index, batch_size=7)
+    assert stats["vectors"] == 20 and len(index) == 20
+    assert index.query(vecs[3], top_k=1)[0][0] == "p3"
+
+def test_filters_are_pushed_into_every_backend(tmp_path):
+    rng = np.random.default_rng(4)
+    vecs = rng.normal(size=(3000, 16)).astype(np.float32)
+    ids = [f"f{i}" for i in range(3000)]
+    docs = [f"doc{i % 50}" for i in range(3000)]
+    sections = ["DIVISION 01" if i % 2 else None for i in range(3000)]
+    tags = [chunk_tags("Retainage is withheld." if i % 3 == 0 else "", section) for i, section in enumerate(sections)]
+    for index in (VectorIndex(), IVFFlatIndex(nlist=16, nprobe=2), HNSWIndex(m=8), MmapVectorIndex(str(tmp_path))):
+        index.upsert(ids, vecs, document_ids=docs, sections=sections, tags=tags)
+        hits = index.query(vecs[7], top_k=10, filters={"doc_ids": ["doc3", "doc7"]})
+        # 60 rows match, so a full top_k comes back and every hit is from the filtered docs
+        assert len(hits) == 10 and hits[0][0] == "f7"
+        assert {docs[int(cid[1:])] for cid, _ in hits} <= {"doc3", "doc7"}
+        both = index.query(vecs[7], top_k=100, filters={"doc_ids": ["doc7", "doc8"], "sections": ["DIVISION 01"]})
+        # Only doc7's (odd) rows are in DIVISION 01
+        assert len(both) == 60 and all(int(cid[1:]) % 2 for cid, _ in both)
+        assert index.query(vecs[7], top_k=5, filters={"doc_ids": ["missing"]}) == []
+        tagged = index.query(vecs[7], top_k=100, filters={"doc_ids": ["doc3"], "topics": ["retainage"], "divisions": ["01"]})
+        # doc3 rows are 3 mod 50; retainage and Division 01 keep those that are also odd and a multiple of 3
+        assert sorted(int(cid[1:]) for cid, _ in tagged) == [i for i in range(3, 3000, 50) if i % 3 == 0 and i % 2]
+        assert index.query(vecs[7], top_k=5, filters={"topics": ["weather"]}) == []
+
+def test_query_batch_matches_single_queries(tmp_path):
+    rng = np.random.default_rng(6)
+    vecs = rng.normal(size=(2000, 16)).astype(np.float32)
+    ids = [f"b{i}" for i in range(2000)]
+    docs = [f"doc{i % 20}" for i in range(2000)]
+    queries = rng.normal(size=(7, 16)).astype(np.float32)
+    small = VectorIndex()
+    small.batch_block_rows = 300  # several blocks, the last one partial
+    mmap = MmapVectorIndex(str(tmp_path), segment_rows=700, block_rows=250)
+    for index in (small, mmap, HNSWIndex(m=8)):
+        index.upsert(ids, vecs, document_ids=docs)
+        index.delete(ids[:50:3])
+        for filters in (None, {"doc_ids": ["doc3", "doc4"]}):
+            batch = index.query_batch(queries, top_k=12, filters=filters)
+            single = [index.query(q, top_k=12, filters=filters) for q in queries]
+            assert [[cid for cid, _ in hits] for hits in batch] == [[cid for cid, _ in hits] for hits in single]
+            assert np.allclose([s for hits in batch for _, s in hits], [s for hits in single for _, s in hits], atol=1e-5)
+    assert VectorIndex().query_batch(queries, top_k=3) == [[]] * 7
@@ -0,0 +1,28 @@
+import sqlite3
+import pytest
+from backend.app.core.fts_query import compile_match
+
+@pytest.mark.parametrize("text, expected", [
+    ("What are the liquidated damages?", '"liquidated" OR "damages"'),
+    ("LDs of $2,000 per day", '"lds" OR "2 000" OR "per" OR "day"'),
+    ("Section 03-30-00 concrete", '"section" OR ("03 30 00" OR "033000") OR "concrete"'),
+    ("033000", '("03 30 00" OR "033000")'),
+    ("Dated 2024 01 01", '"dated" OR "2024" OR "01"'),
+    ('"shop drawings" review', '"shop drawings" AND ("review" OR "shop drawings")'),
+    ("pre-bid NEAR col:value AND", '"pre bid" OR "near" OR "col" OR "value"'),
+    ("submitt*", '"submitt"*'),
+    ("to be or not", '"to" OR "be" OR "or" OR "not"'),
+    ('" ?', None),
+])
+def test_compile_match(text, expected):
+    assert compile_match(text) == expected
+
+def test_compiled_queries_are_valid_fts5():
+    conn = sqlite3.connect(":memory:")
+    for detail in ("full", "none"):
+        conn.execute(f"CREATE VIRTUAL TABLE f_{detail} USING fts5(text, tokenize='porter', detail={detail})")
+        conn.execute(f"INSERT INTO f_{detail} VALUES ('SECTION 03 30 00. Shop drawings; damages of $2,000 per day.')")
+        for q in ("damages of $2,000?", "Section 03-30-00 \"shop drawings\"", "NOT ( AND", "owner's 5.5% retainage"):
+            match = compile_match(q, phrases=detail == "full")
+            hits = conn.execute(f"SELECT COUNT(*) FROM f_{detail} WHERE f_{detail} MATCH ?", (match,)).fetchone()[0]
+            assert hits == (0 if q.startswith(("NOT", "owner")) else 1), (detail, q)
@@ -0,0 +1,167 @@
+import pytest
+from backend.app.config import settings, sqlite_conn
+from backend.app.core import metrics
+from backend.app.core.embeddings import global_vector_index
+from backend.app.services import document_service
+from backend.benchmarks.specgen import generate_spec_pdf
+
+@pytest.mark.asyncio
+async def test_streaming_ingest_indexes_every_chunk(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_QUEUE_PAGES", 2)
+    monkeypatch.setattr(settings, "INGEST_EMBED_BATCH_CHUNKS", 8)
+    monkeypatch.setattr(settings, "PDF_PAGES_PER_TASK", 4)
+    path = tmp_path / "manual.pdf"
+    generate_spec_pdf(str(path), pages=20, seed=11)
+    pages_before, docs_before = metrics.ingest_pages.value(), metrics.ingest_pages_per_second.count()
+    res = await document_service.process_pdf(str(path), "manual.pdf")
+    assert res["pages_count"] == 20
+    assert metrics.ingest_pages.value() - pages_before == 20 and metrics.ingest_pages_per_second.count() == docs_before + 1
+    ids = [r["id"] for r in sqlite_conn.execute("SELECT id FROM chunks WHERE document_id = ?", (res["id"],))]
+    assert ids and all(cid in global_vector_index for cid in ids)
+    # A spec page is ~1.5k chars: a couple of overlapping chunks, not one per character
+    assert len(ids) <= 20 * 3
+    sections = {r[0] for r in sqlite_conn.execute("SELECT DISTINCT section FROM chunks WHERE document_id = ?", (res["id"],))}
+    assert "01 10 00" in sections
+    again = await document_service.process_pdf(str(path), "manual.pdf")
+    assert again["id"] == res["id"]
+
+@pytest.mark.asyncio
+async def test_failed_ingest_leaves_no_partial_document(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "INGEST_EMBED_BATCH_CHUNKS", 4)
+    real_upsert = document_service.upsert_embeddings
+    embedded = []
+
+    async def flaky(chunks, model, api_key, **kwargs):
+        if embedded:
+            raise RuntimeError("embedding outage")
+        embedded.extend(c["id"] for c in chunks)
+        return await real_upsert(chunks, model=model, api_key=api_key, **kwargs)
+
+    monkeypatch.setattr(document_service, "upsert_embeddings", flaky)
+    path = tmp_path / "broken.pdf"
+    generate_spec_pdf(str(path), pages=6, seed=12)
+    with pytest.raises(RuntimeError):
+        await document_service.process_pdf(str(path), "broken.pdf")
+    assert sqlite_conn.execute("SELECT COUNT(*) FROM documents WHERE filename = 'broken.pdf'").fetchone()[0] == 0
+    assert embedded and not any(cid in global_vector_index for cid in embedded)
+
+@pytest.mark.asyncio
+async def test_pages_without_chunks_still_flush(tmp_path, monkeypatch):
+    from backend.app.core.pdf_processor import ExtractedPage
+    monkeypatch.setattr(settings, "INGEST_QUEUE_PAGES", 4)
+
+    async def blank_pages(filepath, max_pages=None):
+        for n in range(1, 11):
+            yield ExtractedPage(page_number=n, text="", width=1.0, height=1.0, blocks=[])
+
+    monkeypatch.setattr(document_service, "extract_pdf", blank_pages)
+    path = tmp_path / "scanned.pdf"
+    path.write_bytes(b"%PDF-1.4 scanned drawings")
+    reported = []
+
+    async def progress(doc_id, counts):
+        reported.append(counts["pages"])
+
+    res = await document_service.process_pdf(str(path), "scanned.pdf", progress=progress)
+    assert res["pages_count"] == 10
+    assert [4, 8, 10] == sorted(set(reported) - {0})
+
+def test_deferred_fts_indexes_batch_and_restores_trigger(tmp_path):
+    from backend.app.config import get_sqlite_conn, init_sqlite_schema
+    from backend.app.core.pdf_processor import ExtractedPage
+    from backend.app.core.search_engine import deferred_fts, init_indices
+    from backend.app.core.text_chunker import chunk_page
+    conn = get_sqlite_conn(str(tmp_path / "fts.db"))
+    init_sqlite_schema(conn)
+    init_indices(conn)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    conn.execute("INSERT INTO documents (id, filename, file_hash, pages_count, uploaded_at) VALUES ('d', 'f.pdf', 'h', 1, '')")
+    page = ExtractedPage(page_number=1, text="Liquidated damages apply per day.", width=1.0, height=1.0, blocks=[])
+    document_service.write_batch(conn, "d", [page], chunk_page("d", "f.pdf", 1, "", page.text))
+    match = "SELECT COUNT(*) FROM chunks_fts WHERE chunks_fts MATCH ?"
+    assert conn.execute(match, ("liquidated",)).fetchone()[0] == 1
+    trigger = "SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger' AND name = 'chunks_ai'"
+    assert conn.execute(trigger).fetchone()[0] == 1
+    with pytest.raises(RuntimeError):
+        with conn:
+            with deferred_fts(conn):
+                raise RuntimeError("abort")
+    assert conn.execute(trigger).fetchone()[0] == 1
+
+def _text_pdf(path, pages):
+    import fitz
+    doc = fitz.open()
+    for text in pages:
+        doc.new_page().insert_textbox(fitz.Rect(50, 50, 550, 800), text, fontsize=10)
+    doc.save(str(path))
+    doc.close()
+
+@pytest.mark.asyncio
+async def test_replace_reindexes_only_changed_chunks(tmp_path):
+    pages = [f"SECTION 0{i} 10 00 page {i}. The Contractor shall provide item {i} of the work." for i in range(1, 4)]
+    _text_pdf(tmp_path / "rev1.pdf", pages)
+    first = await document_service.process_pdf(str(tmp_path / "rev1.pdf"), "rev1.pdf")
+    old_ids = {r[0] for r in sqlite_conn.execute("SELECT id FROM chunks WHERE document_id = ?", (first["id"],))}
+    # Revision: page 2 changes, page 3 is withdrawn
+    _text_pdf(tmp_path / "rev2.pdf", [pages[0], "SECTION 02 10 00 page 2. Retainage is withheld monthly."])
+    res = await document_service.process_pdf(str(tmp_path / "rev2.pdf"), "rev2.pdf", replace=first["id"])
+    assert res["id"] == first["id"] and res["pages_count"] == 2
+    assert (res["chunks_kept"], res["chunks_added"], res["chunks_removed"]) == (1, 1, 2)
+    rows = sqlite_conn.execute("SELECT c.id, t.text FROM chunks c JOIN chunks_text t ON t.chunk_rowid = c.rowid WHERE c.document_id = ?",
+                               (first["id"],)).fetchall()
+    assert len(rows) == 2 and all(r["id"] in global_vector_index for r in rows)
+    assert not any(cid in global_vector_index for cid in old_ids - {r["id"] for r in rows})
+    fts = "SELECT COUNT(*) FROM chunks_fts JOIN chunks c ON c.rowid = chunks_fts.rowid WHERE c.document_id = ? AND chunks_fts MATCH ?"
+    assert sqlite_conn.execute(fts, (first["id"], "retainage")).fetchone()[0] == 1
+    assert sqlite_conn.execute(fts, (first["id"], "item")).fetchone()[0] == 1
+    assert sqlite_conn.execute("SELECT filename, pages_count FROM documents WHERE id = ?", (first["id"],)).fetchone()[:] == ("rev2.pdf", 2)
+    # The entries of rewritten pages' old chunks were removed with the old page text
+    with sqlite_conn:
+        sqlite_conn.execute("INSERT INTO chunks_fts(chunks_fts) VALUES('integrity-check')")
+
+    retainage = "SELECT COUNT(*) FROM chunks_fts WHERE chunks_fts MATCH 'retainage'"
+    indexed = sqlite_conn.execute(retainage).fetchone()[0]
+    removed = await document_service.delete_document(first["id"])
+    assert removed["chunks_removed"] == 2
+    assert sqlite_conn.execute("SELECT COUNT(*) FROM chunks WHERE document_id = ?", (first["id"],)).fetchone()[0] == 0
+    assert sqlite_conn.execute(retainage).fetchone()[0] == indexed - 1
+    assert not any(r["id"] in global_vector_index for r in rows)
+    with sqlite_conn:
+        sqlite_conn.execute("INSERT INTO chunks_fts(chunks_fts) VALUES('integrity-check')")
+    with pytest.raises(FileNotFoundError):
+        await document_service.delete_document(first["id"])
+
+def test_old_databases_move_chunk_text_into_compressed_pages(tmp_path):
+    import sqlite3
+    from backend.app.config import get_sqlite_conn, init_sqlite_schema, table_columns
+    from backend.app.core.search_engine import bm25_keyword_search, init_indices
+    path = str(tmp_path / "old.db")
+    old = sqlite3.connect(path)
+    old.executescript("""
+        CREATE TABLE documents (id TEXT PRIMARY KEY, filename TEXT NOT NULL, file_hash TEXT NOT NULL UNIQUE, pages_count INTEGER NOT NULL, uploaded_at TEXT NOT NULL);
+        CREATE TABLE pages (document_id TEXT NOT NULL, page_number INTEGER NOT NULL, text TEXT NOT NULL, width REAL, height REAL,
+            PRIMARY KEY (document_id, page_number), FOREIGN KEY(document_id) REFERENCES documents(id) ON DELETE CASCADE);
+        CREATE TABLE chunks (id TEXT PRIMARY KEY, document_id TEXT NOT NULL, filename TEXT NOT NULL, page_number INTEGER NOT NULL, section TEXT,
+            text TEXT NOT NULL, char_start INTEGER NOT NULL, char_end INTEGER NOT NULL, hash TEXT NOT NULL, created_at TEXT NOT NULL,
+            FOREIGN KEY(document_id) REFERENCES documents(id) ON DELETE CASCADE);
+        CREATE VIRTUAL TABLE chunks_fts USING fts5(text, content='chunks', content_rowid='rowid', tokenize = 'porter');
+        CREATE TRIGGER chunks_ai AFTER INSERT ON chunks BEGIN INSERT INTO chunks_fts(rowid, text) VALUES (new.rowid, new.text); END;
+        INSERT INTO documents VALUES ('d', 'old.pdf', 'h', 1, '');
+        INSERT INTO pages VALUES ('d', 1, 'Bid security. The Contractor shall furnish a bid bond.', 612, 792);
+        INSERT INTO chunks VALUES ('c', 'd', 'old.pdf', 1, NULL, 'The Contractor shall furnish a bid bond.', 14, 54, 'h', '');
+    """)
+    old.close()
+    conn = get_sqlite_conn(path)
+    init_sqlite_schema(conn)
+    init_indices(conn)
+    assert "text" not in table_columns(conn, "pages") and "text" not in table_columns(conn, "chunks")
+    assert document_service.get_page_text("d", 1, conn)["text"].startswith("Bid security.")
+    [hit] = bm25_keyword_search("bid bond", top_k=5, conn=conn)
+    assert hit["chunk_id"] == "c" and hit["text"] == "The Contractor shall furnish a bid bond." and hit["has_modal"] == 1
+    # Tags are backfilled from the migrated text
+    assert [r["chunk_id"] for r in bm25_keyword_search("bid bond", top_k=5, filters={"topics": ["bonds"]}, conn=conn)] == ["c"]
+    assert bm25_keyword_search("bid bond", top_k=5, filters={"topics": ["insurance"]}, conn=conn) == []
+    with conn:
+        conn.execute("DELETE FROM documents WHERE id = 'd'")
+    conn.execute("INSERT INTO chunks_fts(chunks_fts) VALUES('integrity-check')")
+    assert conn.execute("SELECT COUNT(*) FROM chunks_fts WHERE chunks_fts MATCH 'bond'").fetchone()[0] == 0
@@ -0,0 +1,81 @@
+import os
+import time
+from fastapi.testclient import TestClient
+from backend.app.config import get_sqlite_conn, init_sqlite_schema, settings, sqlite_conn
+from backend.app.main import app
+from backend.app.api.routes import upload
+from backend.app.services import job_service
+from backend.benchmarks.specgen import generate_spec_pdf
+
+def wait_for(client, job_id, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f"/jobs/{job_id}").json()
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f"job {job_id} still {job['status']}")
+
+def test_upload_queues_jobs_and_reports_progress(tmp_path):
+    paths = []
+    for i in range(2):
+        p = tmp_path / f"manual{i}.pdf"
+        generate_spec_pdf(str(p), pages=8, seed=100 + i)
+        paths.append(p)
+    with TestClient(app) as client:
+        resp = client.post("/upload", files=[("files", (p.name, p.read_bytes(), "application/pdf")) for p in paths])
+        assert resp.status_code == 202
+        jobs = resp.json()
+        # Workers may already have claimed a job by the time the response is built
+        assert len(jobs) == 2 and all(j["status"] in ("queued", "running", "done") for j in jobs)
+        done = [wait_for(client, j["id"]) for j in jobs]
+        assert client.get("/jobs/missing").status_code == 404
+        # A re-upload resolves to the existing document and its stored copy is dropped
+        again = client.post("/upload", files=[("files", (paths[0].name, paths[0].read_bytes(), "application/pdf"))]).json()[0]
+        dup = wait_for(client, again["id"])
+        assert dup["status"] == "done" and dup["document_id"] == done[0]["document_id"]
+        stored = sqlite_conn.execute("SELECT path FROM ingest_jobs WHERE id = ?", (again["id"],)).fetchone()[0]
+        assert not os.path.exists(stored)
+    for job in done:
+        assert job["status"] == "done" and job["document_id"]
+        assert job["pages_extracted"] == 8
+        assert job["chunks_indexed"] >= 8 and job["vectors_embedded"] == job["chunks_indexed"]
+
+def test_upload_rejects_non_pdf(client):
+    resp = client.post("/upload", files=[("files", ("notes.txt", b"hello", "text/plain"))])
+    assert resp.status_code == 400
+
+def test_claims_are_exclusive_and_only_stale_jobs_recover(tmp_path):
+    # Two connections stand in for two processes sharing the database
+    path = str(tmp_path / "jobs.db")
+    a, b = get_sqlite_conn(path), get_sqlite_conn(path)
+    init_sqlite_schema(a)
+    for i in range(2):
+        job_service._insert_job(a, f"j{i}", f"p{i}", f"f{i}.pdf")
+    claimed = {job_service._claim(a, "proc-a")["id"], job_service._claim(b, "proc-b")["id"]}
+    assert claimed == {"j0", "j1"} and job_service._claim(a, "proc-a") is None
+    with a:
+        a.execute("UPDATE ingest_jobs SET heartbeat_at = '2000-01-01T00:00:00' WHERE owner = 'proc-a'")
+    # proc-b is still heartbeating, so only proc-a's job goes back on the queue
+    assert job_service._recover(b, "proc-b", 60)[0] == 1
+    rows = dict(a.execute("SELECT owner, status FROM ingest_jobs").fetchall())
+    assert rows == {None: "queued", "proc-b": "running"}
+
+def test_upload_rejects_batch_before_queueing_any(client, monkeypatch):
+    monkeypatch.setattr(upload, "MAX_FILE_SIZE_MB", 0.001)
+    jobs_before = _job_count()
+    files = [("files", ("small.pdf", b"%PDF-1.4 small", "application/pdf")),
+             ("files", ("big.pdf", b"%PDF-1.4 " + b"x" * 4096, "application/pdf"))]
+    resp = client.post("/upload", files=files)
+    assert resp.status_code == 400
+    assert _job_count() == jobs_before
+    assert not [f for f in os.listdir(settings.STORAGE_PATH) if f.endswith(".part")]
+
+def _job_count():
+    return sqlite_conn.execute("SELECT COUNT(*) FROM ingest_jobs").fetchone()[0]
+
+def test_delete_and_replace_need_an_existing_document(client):
+    assert client.delete("/documents/missing").status_code == 404
+    pdf = ("files", ("rev.pdf", b"%PDF-1.4 rev", "application/pdf"))
+    assert client.post("/upload?replace=missing", files=[pdf]).status_code == 404
+    assert client.post("/upload?replace=missing", files=[pdf, pdf]).status_code == 400
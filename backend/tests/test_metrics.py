@@ -0,0 +1,36 @@
+from backend.app.core import metrics
+from backend.app.core.metrics import Counter, Gauge, Histogram, Registry
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    hist = registry.register(Histogram("t_seconds", "Test latency.", ("stage",), buckets=(0.01, 0.1)))
+    count = registry.register(Counter("t_calls_total", "Test calls.", ("outcome",)))
+    registry.register(Gauge("t_rows", "Test rows.", collect=lambda: 42))
+    for v in (0.005, 0.05, 0.05, 3.0):
+        hist.observe(v, stage="fts")
+    count.inc(outcome="ok")
+    count.inc(2, outcome='quote"d')
+    lines = registry.render().splitlines()
+    assert "# TYPE t_seconds histogram" in lines
+    assert 't_seconds_bucket{stage="fts",le="0.01"} 1' in lines
+    assert 't_seconds_bucket{stage="fts",le="0.1"} 3' in lines
+    assert 't_seconds_bucket{stage="fts",le="+Inf"} 4' in lines
+    assert 't_seconds_count{stage="fts"} 4' in lines and hist.count(stage="fts") == 4
+    assert 't_calls_total{outcome="quote\\"d"} 2' in lines
+    assert "t_rows 42" in lines
+
+def test_requests_report_stage_timings_and_metrics(client):
+    before = metrics.stage_seconds.count(route="/search", stage="fts")
+    resp = client.post("/search", json={"query": "bid bond metrics probe", "top_k": 3})
+    assert resp.status_code == 200
+    names = [part.split(";")[0] for part in resp.headers["server-timing"].split(", ")]
+    assert "total" in names and "fts" in names
+    assert metrics.stage_seconds.count(route="/search", stage="fts") == before + 1
+    scrape = client.get("/metrics")
+    assert scrape.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = scrape.text
+    assert 'specscope_http_request_duration_seconds_count{method="POST",route="/search",status="200"}' in body
+    assert "specscope_vector_index_vectors " in body
+    # Unmatched paths share one series instead of one per URL
+    client.get("/no/such/path")
+    assert metrics.http_request_seconds.count(method="GET", route="unmatched", status="404") >= 1
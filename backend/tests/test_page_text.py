@@ -0,0 +1,23 @@
+import pytest
+from backend.app.utils import page_text
+from backend.app.utils.page_text import compress_text, decompress_text, page_slice, resolve_codec
+
+@pytest.mark.parametrize("codec", ["zlib", "none"] + (["zstd"] if page_text.zstandard else []))
+def test_page_round_trip_and_slices(codec):
+    text = "SECTION 01 29 00 – PAYMENT PROCEDURES\nRetainage: 5%.\n" * 20
+    content = compress_text(text, codec)
+    assert decompress_text(content, codec) == text
+    assert page_slice(content, codec, 0, 16) == "SECTION 01 29 00"
+    # Served from the last-page memo the second time
+    assert page_slice(content, codec, 17, 38) == "– PAYMENT PROCEDURES\n"
+    assert page_slice(None, codec, 0, 1) is None
+    if codec == "zlib":
+        assert len(content) < len(text.encode()) / 4
+
+def test_codec_selection(monkeypatch):
+    monkeypatch.setattr(page_text, "zstandard", None)
+    assert resolve_codec("auto") == "zlib"
+    with pytest.raises(RuntimeError):
+        resolve_codec("zstd")
+    with pytest.raises(ValueError):
+        resolve_codec("lz4")
@@ -18,8 +18,28 @@ def create_sample_pdf(path: str):
 async def test_extract_pdf(tmp_path):
     p = tmp_path / "sample.pdf"
     create_sample_pdf(str(p))
-    pages, sections = await extract_pdf(str(p))
+    pages = [pg async for pg in extract_pdf(str(p))]
     assert len(pages) == 2
-    assert any("DIVISION" in (s or "") for s in sections)
+    assert any("DIVISION" in (pg.section or "") for pg in pages)
     assert "Liquidated damages" in pages[0].text
     assert pages[0].width > 0 and pages[0].height > 0
+
+@pytest.mark.asyncio
+async def test_parallel_extract_matches_serial(tmp_path, monkeypatch):
+    from backend.app.config import settings
+    from backend.app.core import pdf_processor
+    from backend.benchmarks.specgen import generate_spec_pdf
+    p = tmp_path / "manual.pdf"
+    generate_spec_pdf(str(p), pages=12)
+    serial = [pg async for pg in extract_pdf(str(p))]
+    monkeypatch.setattr(settings, "MAX_WORKERS", 2)
+    monkeypatch.setattr(settings, "PDF_PARALLEL_MIN_PAGES", 2)
+    monkeypatch.setattr(settings, "PDF_PAGES_PER_TASK", 5)
+    try:
+        pages = [pg async for pg in extract_pdf(str(p))]
+    finally:
+        pdf_processor.shutdown_extract_pool()
+    assert [pg.page_number for pg in pages] == list(range(1, 13))
+    assert [pg.text for pg in pages] == [pg.text for pg in serial]
+    assert [pg.section for pg in pages] == [pg.section for pg in serial]
+    assert pages[0].section == "01 10 00"
@@ -0,0 +1,59 @@
+import sqlite3
+import numpy as np
+import pytest
+from backend.app.config import init_sqlite_schema
+from backend.app.core.embeddings import VectorIndex, persist_vectors, load_vectors, normalize_rows
+from backend.app.core.ann_index import QuantizedVectorIndex
+
+def _corpus(rows=3000, dim=64, seed=5):
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(30, dim))
+    vecs = normalize_rows((centres[rng.integers(0, 30, rows)] + 0.5 * rng.normal(size=(rows, dim))).astype(np.float32))
+    return [f"q{i}" for i in range(rows)], vecs, vecs[rng.choice(rows, 25)]
+
+def _recall(index, exact, queries, k=10):
+    return np.mean([len({c for c, _ in exact.query(q, k)} & {c for c, _ in index.query(q, k)}) / k for q in queries])
+
+def test_quantized_index_memory_and_recall():
+    ids, vecs, queries = _corpus()
+    exact = VectorIndex()
+    exact.upsert(ids, vecs)
+    full = dict(zip(ids, vecs))
+    sq8 = QuantizedVectorIndex(codec="sq8")
+    sq8.upsert(ids, vecs)
+    pq = QuantizedVectorIndex(codec="pq", pq_m=16, train_min_rows=1000, rerank_factor=8,
+                              rerank_source=lambda hit_ids: {c: full[c] for c in hit_ids})
+    for start in range(0, len(ids), 500):
+        pq.upsert(ids[start:start + 500], vecs[start:start + 500])
+    assert sq8._codes.shape[1] == 4 + 64 and pq._codes.shape[1] == 16
+    assert _recall(sq8, exact, queries) >= 0.9
+    assert _recall(pq, exact, queries) >= 0.9
+    # Reranked scores are exact cosine similarities
+    cid, score = pq.query(queries[0], 1)[0]
+    assert abs(score - float(full[cid] @ queries[0])) < 1e-4
+
+@pytest.mark.asyncio
+async def test_aquery_awaits_full_vectors_for_rerank():
+    ids, vecs, queries = _corpus(rows=500)
+    full = dict(zip(ids, vecs))
+    fetched = []
+
+    async def fetch(hit_ids):
+        fetched.append(len(hit_ids))
+        return {c: full[c] for c in hit_ids}
+
+    index = QuantizedVectorIndex(codec="sq8", rerank_factor=4, rerank_fetch=fetch)
+    index.upsert(ids, vecs)
+    cid, score = (await index.aquery(queries[0], 1))[0]
+    assert fetched == [4] and abs(score - float(full[cid] @ queries[0])) < 1e-4
+
+def test_mixed_codec_blobs_load():
+    conn = sqlite3.connect(":memory:")
+    init_sqlite_schema(conn)
+    ids, vecs, _ = _corpus(rows=40)
+    persist_vectors(conn, ids[:20], vecs[:20], codec="f32")
+    persist_vectors(conn, ids[20:], vecs[20:], codec="sq8")
+    index = VectorIndex()
+    assert load_vectors(conn, index)["vectors"] == 40
+    assert index.query(vecs[5], 1)[0][0] == ids[5]
+    assert index.query(vecs[30], 1)[0][0] == ids[30]
@@ -0,0 +1,79 @@
+import asyncio
+import numpy as np
+import pytest
+from backend.app.core.embeddings import _hash_to_vec
+from backend.app.core.query_embedder import QueryEmbedder
+
+class RecordingEmbed:
+    def __init__(self):
+        self.calls = []
+
+    async def __call__(self, texts, model, api_key):
+        self.calls.append(list(texts))
+        await asyncio.sleep(0.01)
+        return np.stack([_hash_to_vec(t) for t in texts])
+
+@pytest.mark.asyncio
+async def test_concurrent_queries_share_one_call():
+    fn = RecordingEmbed()
+    embedder = QueryEmbedder(fn, window_ms=20, max_batch=64)
+    queries = [f"liquidated damages {i}" for i in range(10)] + ["liquidated damages 0"]
+    out = await asyncio.gather(*(embedder.embed(q, "m", None) for q in queries))
+    assert len(fn.calls) == 1 and len(fn.calls[0]) == 10
+    for q, vec in zip(queries, out):
+        assert np.allclose(vec, _hash_to_vec(q))
+
+@pytest.mark.asyncio
+async def test_max_batch_flushes_early_and_cache_hits():
+    fn = RecordingEmbed()
+    embedder = QueryEmbedder(fn, window_ms=1000, max_batch=4, cache_size=2)
+    await asyncio.wait_for(asyncio.gather(*(embedder.embed(f"q{i}", "m", None) for i in range(8))), timeout=0.5)
+    assert [len(c) for c in fn.calls] == [4, 4]
+    await asyncio.wait_for(embedder.embed("q7", "m", None), timeout=0.5)
+    assert len(fn.calls) == 2 and embedder.hits == 1
+
+@pytest.mark.asyncio
+async def test_errors_reach_every_waiter():
+    async def failing(texts, model, api_key):
+        raise RuntimeError("boom")
+    embedder = QueryEmbedder(failing, window_ms=1)
+    results = await asyncio.gather(embedder.embed("a", "m", None), embedder.embed("b", "m", None), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+@pytest.mark.asyncio
+async def test_cancelled_embed_call_releases_waiters():
+    started = asyncio.Event()
+
+    async def slow(texts, model, api_key):
+        started.set()
+        await asyncio.sleep(10)
+
+    embedder = QueryEmbedder(slow, window_ms=1)
+    waiter = asyncio.ensure_future(embedder.embed("a", "m", None))
+    await started.wait()
+    for task in list(embedder._tasks):
+        task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await asyncio.wait_for(waiter, timeout=1)
+
+def test_pending_batch_from_closed_loop_is_not_reused():
+    embedder = QueryEmbedder(RecordingEmbed(), window_ms=1000)
+    loop = asyncio.new_event_loop()
+    task = loop.create_task(embedder.embed("q", "m", None))
+    loop.run_until_complete(asyncio.sleep(0))
+    task.cancel()
+    loop.close()
+    embedder.window = 0.001
+    vec = asyncio.run(asyncio.wait_for(embedder.embed("q", "m", None), timeout=2))
+    assert np.allclose(vec, _hash_to_vec("q"))
+
+@pytest.mark.asyncio
+async def test_embed_many_makes_one_call_for_uncached_queries():
+    fn = RecordingEmbed()
+    embedder = QueryEmbedder(fn, window_ms=1)
+    await embedder.embed("bid bond", "m", None)
+    queries = ["bid bond", "retainage", "liquidated damages", "retainage"]
+    out = await embedder.embed_many(queries, "m", None)
+    assert fn.calls == [["bid bond"], ["retainage", "liquidated damages"]]
+    assert out.shape[0] == 4 and all(np.allclose(v, _hash_to_vec(q)) for q, v in zip(queries, out))
+    assert embedder.hits == 1
@@ -0,0 +1,41 @@
+import pytest
+from backend.app.core import result_cache
+from backend.app.core.result_cache import SearchResultCache, bump_corpus_version, corpus_version
+from backend.app.services import search_service
+
+def test_cache_keys_hits_and_invalidation(monkeypatch):
+    cache = SearchResultCache(max_entries=2, ttl_seconds=60)
+    key = cache.key("  Liquidated   Damages ", 5, 0.5, {"doc_ids": ["b", "a"], "sections": []})
+    assert key == cache.key("liquidated damages", 5, 0.5, {"doc_ids": ["a", "b"]})
+    cache.put(key, [{"chunk_id": "c1"}], corpus_version())
+    hit = cache.get(key)
+    assert hit == [{"chunk_id": "c1"}]
+    hit[0]["chunk_id"] = "mutated"
+    assert cache.get(key) == [{"chunk_id": "c1"}]
+    # New content anywhere in the corpus retires every cached result
+    bump_corpus_version()
+    assert cache.get(key) is None and cache.stats()["stale"] == 1
+    # Results computed against an older version are never stored
+    cache.put(key, [], corpus_version() - 1)
+    assert cache.get(key) is None
+    for q in ("a", "b", "c"):
+        cache.put(cache.key(q, 5, 0.5, None), [], corpus_version())
+    assert cache.stats()["evictions"] == 1 and cache.get(cache.key("a", 5, 0.5, None)) is None
+    now = result_cache.time.monotonic()
+    monkeypatch.setattr(result_cache.time, "monotonic", lambda: now + 61)
+    assert cache.get(cache.key("c", 5, 0.5, None)) is None
+
+@pytest.mark.asyncio
+async def test_search_service_serves_repeats_from_cache(monkeypatch):
+    calls = []
+
+    async def fake_search(query, top_k, alpha, filters):
+        calls.append(query)
+        return [{"chunk_id": f"hit-{len(calls)}"}]
+
+    monkeypatch.setattr(search_service, "hybrid_search", fake_search)
+    monkeypatch.setattr(search_service, "global_result_cache", SearchResultCache(8, 60))
+    first = await search_service.search("bid bond", top_k=3)
+    assert await search_service.search("Bid  Bond", top_k=3) == first and len(calls) == 1
+    bump_corpus_version()
+    assert await search_service.search("bid bond", top_k=3) != first and len(calls) == 2
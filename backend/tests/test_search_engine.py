@@ -2,27 +2,14 @@ import pytest
 from backend.app.config import sqlite_conn
 from backend.app.core.search_engine import bm25_keyword_search, hybrid_search
 from backend.app.core.embeddings import upsert_embeddings
-
-def seed_simple_corpus():
-    # Create a fake document, pages, chunks
-    sqlite_conn.execute(
-        "INSERT INTO documents (id, filename, file_hash, pages_count, uploaded_at) VALUES (?, ?, ?, ?, ?)",
-        ("doc1", "Specs.pdf", "hash1", 2, "2024-01-01T00:00:00Z")
-    )
-    sqlite_conn.execute(
-        "INSERT INTO chunks (id, document_id, filename, page_number, section, text, char_start, char_end, hash, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-        ("c1", "doc1", "Specs.pdf", 1, "Division 01", "Liquidated damages: $2,000 per calendar day.", 0, 44, "h1", "2024-01-01T00:00:00Z")
-    )
-    sqlite_conn.execute(
-        "INSERT INTO chunks (id, document_id, filename, page_number, section, text, char_start, char_end, hash, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
-        ("c2", "doc1", "Specs.pdf", 2, "Addendum", "Submittals due 14 days after award.", 0, 34, "h2", "2024-01-01T00:00:00Z")
-    )
-    sqlite_conn.commit()
+from backend.app.utils.tags import chunk_tags
 
 @pytest.mark.asyncio
-async def test_keyword_and_hybrid_search():
-    # Seed
-    seed_simple_corpus()
+async def test_keyword_and_hybrid_search(seed_chunks):
+    seed_chunks("doc1", "Specs.pdf", [
+        ("c1", 1, "Division 01", "Liquidated damages: $2,000 per calendar day."),
+        ("c2", 2, "Addendum", "Submittals due 14 days after award."),
+    ])
     # Upsert vectors offline (hash-based)
     await upsert_embeddings([
         {"id": "c1", "text": "Liquidated damages: $2,000 per calendar day."},
@@ -37,3 +24,118 @@ async def test_keyword_and_hybrid_search():
     # Deterministic: ensure ordering stable on multiple runs
     res2 = await hybrid_search("What are the liquidated damages?", top_k=2, alpha=0.5, filters=None)
     assert [r["chunk_id"] for r in res] == [r["chunk_id"] for r in res2]
+
+def test_keyword_search_applies_section_filter(seed_chunks):
+    seed_chunks("secdoc", "Sections.pdf", [
+        ("sc1", 1, "Division 01", "Retainage of five percent applies."),
+        ("sc2", 2, "Addendum", "Retainage of five percent applies."),
+    ])
+    kw = bm25_keyword_search("retainage", top_k=5, filters={"doc_ids": ["secdoc"], "sections": ["Addendum"]})
+    assert [r["chunk_id"] for r in kw] == ["sc2"]
+
+@pytest.mark.asyncio
+async def test_topic_and_division_filters_match_chunk_tags(seed_chunks):
+    rows = [
+        ("tg1", 1, "SECTION 01 29 00 - PAYMENT PROCEDURES", "Retainage of five percent shall be withheld from each payment."),
+        ("tg2", 2, "SECTION 03 30 00 - CONCRETE", "Payment for concrete is made per cubic yard; retainage per Section 01 29 00."),
+        ("tg3", 3, "DIVISION 03 - CONCRETE", "Warranty: the Contractor shall warrant concrete work for two years."),
+    ]
+    seed_chunks("tagdoc", "Tags.pdf", rows)
+    await upsert_embeddings([{"id": cid, "text": text, "document_id": "tagdoc", "section": section, "tags": chunk_tags(text, section)}
+                             for cid, _, section, text in rows], model="text-embedding-3-large", api_key=None)
+    base = {"doc_ids": ["tagdoc"]}
+    kw = bm25_keyword_search("payment", top_k=5, filters={**base, "topics": ["retainage"]})
+    assert sorted(r["chunk_id"] for r in kw) == ["tg1", "tg2"]
+    # The division comes from the section header, not from a section the text cites
+    kw = bm25_keyword_search("payment", top_k=5, filters={**base, "divisions": ["01"]})
+    assert [r["chunk_id"] for r in kw] == ["tg1"]
+    res = await hybrid_search("concrete", top_k=5, alpha=0.5, filters={**base, "divisions": ["Division 03"]})
+    assert sorted(r["chunk_id"] for r in res) == ["tg2", "tg3"]
+    res = await hybrid_search("concrete", top_k=5, alpha=0.5, filters={**base, "divisions": [3], "topics": ["warranties"]})
+    assert [r["chunk_id"] for r in res] == ["tg3"]
+    assert bm25_keyword_search("concrete", top_k=5, filters={**base, "topics": ["weather"]}) == []
+
+def test_highlights_and_snippet_position():
+    from backend.app.core.search_engine import build_snippet, compile_highlighter, find_highlights, highlight_terms
+    terms = highlight_terms("Are damages or DAMAGE and bonds due?")
+    text = "x" * 300 + " Liquidated Damages apply. Bonds are due at award."
+    highlights, pos = find_highlights(text, terms, compile_highlighter(terms))
+    assert highlights == ["damages", "DAMAGE", "bonds"] and pos == 312
+    assert build_snippet(text, highlights, pos=pos).startswith("xxx")
+    assert "Damages" in build_snippet(text, highlights, pos=pos)
+    assert find_highlights(text, {}, None) == ([], -1)
+
+def test_chunks_carry_precomputed_modal_flag():
+    from backend.app.core.text_chunker import chunk_page
+    from backend.app.core.search_engine import map_confidence
+    flagged = chunk_page("d", "f.pdf", 1, "", "The Contractor shall submit shop drawings.")[0]
+    plain = chunk_page("d", "f.pdf", 1, "", "Drawings are listed in the index.")[0]
+    assert flagged["has_modal"] and not plain["has_modal"]
+    assert map_confidence(0.5, "ignored", True) == map_confidence(0.5, "ignored", False) + 0.15
+
+def test_keyword_search_accepts_punctuated_questions(seed_chunks):
+    seed_chunks("puncdoc", "Punc.pdf", [("pc1", 1, "03 30 00", "SECTION 03 30 00 - CAST-IN-PLACE CONCRETE. Penalty: $1,500 per day.")])
+    filters = {"doc_ids": ["puncdoc"]}
+    for q in ('Is the penalty "$1,500"?', "Section 03-30-00: cast-in-place?", "NEAR( AND", "What's the"):
+        kw = bm25_keyword_search(q, top_k=5, filters=filters)
+        assert [r["chunk_id"] for r in kw] == ([] if q in ("NEAR( AND", "What's the") else ["pc1"]), q
+
+@pytest.mark.asyncio
+async def test_fts_maintenance_merges_segments_until_done(seed_chunks):
+    from backend.app.core.search_engine import FtsMaintenance
+    # One FTS segment per committed batch
+    for i in range(6):
+        seed_chunks("segdoc", "Seg.pdf", [(f"seg{i}", i + 1, None, f"Segment {i} mentions waterproofing.")])
+    maintenance = FtsMaintenance(idle_seconds=0, merge_pages=16, optimize_chunks=6)
+    maintenance.pending_chunks = 6
+    assert (await maintenance.run())["optimized"] == 1
+    assert (await maintenance.run())["steps"] == 0
+    with sqlite_conn:
+        sqlite_conn.execute("INSERT INTO chunks_fts(chunks_fts) VALUES('integrity-check')")
+    assert len(bm25_keyword_search("waterproofing", top_k=10, filters={"doc_ids": ["segdoc"]})) == 6
+
+def test_changed_fts_options_rebuild_the_index(tmp_path, monkeypatch, seed_chunks):
+    from backend.app.config import ensure_fts_table, get_sqlite_conn, init_sqlite_schema, settings
+    from backend.app.core.search_engine import init_indices
+    conn = get_sqlite_conn(str(tmp_path / "fts.db"))
+    init_sqlite_schema(conn)
+    init_indices(conn)
+    seed_chunks("d", "f.pdf", [("c", 1, None, "Waterstops at joints.")], conn=conn)
+    assert not ensure_fts_table(conn)
+    monkeypatch.setattr(settings, "FTS_PREFIX", "2  3")
+    monkeypatch.setattr(settings, "FTS_DETAIL", "column")
+    assert ensure_fts_table(conn) and not ensure_fts_table(conn)
+    assert "prefix='2 3'" in conn.execute("SELECT sql FROM sqlite_master WHERE name = 'chunks_fts'").fetchone()[0]
+    assert conn.execute("SELECT COUNT(*) FROM chunks_fts WHERE chunks_fts MATCH 'wa*'").fetchone()[0] == 1
+
+def test_batch_search_streams_one_line_per_query(client, seed_chunks):
+    import asyncio
+    import json
+    from backend.app.core.result_cache import global_result_cache
+    texts = {"bc1": "Bid bond of five percent is required.", "bc2": "Retainage is held until final completion.",
+             "bc3": "Liquidated damages accrue per calendar day."}
+    rows = {"batchdoc": [(cid, i + 1, "Division 00", t) for i, (cid, t) in enumerate(texts.items())],
+            "batchother": [("bo1", 1, "Division 00", "Performance bond of one hundred percent is required.")]}
+    for doc_id, doc_rows in rows.items():
+        seed_chunks(doc_id, f"{doc_id}.pdf", doc_rows)
+        asyncio.run(upsert_embeddings([{"id": cid, "text": t, "document_id": doc_id, "section": section, "tags": chunk_tags(t, section)}
+                                       for cid, _, section, t in doc_rows], model="text-embedding-3-large", api_key=None))
+    queries = ["bid bond", "retainage held", "liquidated damages per day"]
+    global_result_cache.clear()
+    resp = client.post("/search/batch", json={"queries": queries, "top_k": 2, "filters": {"doc_ids": ["batchdoc"]}})
+    assert resp.status_code == 200 and resp.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert sorted(line["index"] for line in lines) == [0, 1, 2]
+    global_result_cache.clear()
+    for line in lines:
+        assert line["query"] == queries[line["index"]]
+        single = client.post("/search", json={"query": line["query"], "top_k": 2, "filters": {"doc_ids": ["batchdoc"]}}).json()
+        assert [r["chunk_id"] for r in line["results"]] == [r["chunk_id"] for r in single]
+    assert lines[0]["results"][0]["chunk_id"] in texts
+    # No keyword matches: every hit comes from the filtered vector scan, and only from batchdoc
+    assert bm25_keyword_search("xylophone quartzite", top_k=10) == []
+    resp = client.post("/search/batch", json={"queries": ["xylophone quartzite"], "top_k": 10, "filters": {"doc_ids": ["batchdoc"]}})
+    (line,) = [json.loads(line) for line in resp.text.splitlines()]
+    assert sorted(r["chunk_id"] for r in line["results"]) == sorted(texts)
+    assert client.post("/search/batch", json={"queries": []}).text == ""
+    assert client.post("/search/batch", json={"queries": ["q"] * 1000}).status_code == 400
@@ -0,0 +1,27 @@
+import asyncio
+import pytest
+from backend.app.utils.timing import current_timings, stage, start_timings
+
+@pytest.mark.asyncio
+async def test_stages_from_gathered_tasks_share_request_timings():
+    timings = start_timings()
+
+    async def branch(name: str, delay: float) -> None:
+        with stage(name):
+            await asyncio.sleep(delay)
+
+    await asyncio.gather(branch("fts", 0.02), branch("embed", 0.01))
+    assert set(timings) == {"fts", "embed"} and timings["fts"] >= 15
+    assert current_timings() is timings
+
+@pytest.mark.asyncio
+async def test_hybrid_search_reports_stage_timings(seed_chunks):
+    from backend.app.core.embeddings import upsert_embeddings
+    from backend.app.core.search_engine import hybrid_search
+    seed_chunks("tdoc", "T.pdf", [("tc1", 1, None, "Bid bond shall be five percent of the bid amount.")])
+    await upsert_embeddings([{"id": "tc1", "document_id": "tdoc", "text": "Bid bond shall be five percent of the bid amount."}], model="m", api_key=None)
+    timings = start_timings()
+    # Scoped to this test's document: earlier tests ingest manuals that also mention bid bonds
+    res = await hybrid_search("bid bond", top_k=3, alpha=0.5, filters={"doc_ids": ["tdoc"]})
+    assert res and res[0]["chunk_id"] == "tc1"
+    assert {"fts", "embed", "vector_scan", "hydrate", "rank", "snippet"} <= set(timings)
@@ -0,0 +1,39 @@
+import numpy as np
+from backend.app.core.vector_store import MmapVectorIndex
+
+def test_mmap_index_shared_between_instances(tmp_path):
+    rng = np.random.default_rng(2)
+    vecs = rng.normal(size=(300, 24)).astype(np.float32)
+    ids = [f"m{i}" for i in range(300)]
+    writer = MmapVectorIndex(str(tmp_path), segment_rows=128, block_rows=50)
+    writer.upsert(ids[:200], vecs[:200])
+    # A second instance stands in for another worker process mapping the same files
+    reader = MmapVectorIndex(str(tmp_path), segment_rows=128, block_rows=50)
+    assert len(reader) == 200
+    writer.upsert(ids[200:], vecs[200:])
+    assert reader.query(vecs[250], top_k=1)[0][0] == "m250"
+
+    writer.delete(["m250"])
+    assert "m250" not in reader
+    assert reader.query(vecs[250], top_k=1)[0][0] != "m250"
+    # Re-upserting a deleted id appends a fresh row that is live again
+    writer.upsert(["m250"], vecs[250:251])
+    assert reader.query(vecs[250], top_k=1)[0][0] == "m250"
+    assert len(MmapVectorIndex(str(tmp_path))) == 300
+
+def test_mmap_index_recovers_from_torn_append(tmp_path):
+    rng = np.random.default_rng(5)
+    vecs = rng.normal(size=(12, 16)).astype(np.float32)
+    ids = [f"t{i}" for i in range(12)]
+    MmapVectorIndex(str(tmp_path)).upsert(ids[:10], vecs[:10])
+    # A writer died after appending vectors but mid-way through the id lines
+    with open(tmp_path / "seg-00000.f32", "ab") as fh:
+        fh.write(rng.normal(size=(3, 16)).astype(np.float32).tobytes())
+    with open(tmp_path / "seg-00000.ids", "a") as fh:
+        fh.write("ghost\tdo")
+    index = MmapVectorIndex(str(tmp_path))
+    assert len(index) == 10
+    index.upsert(ids[10:], vecs[10:])
+    fresh = MmapVectorIndex(str(tmp_path))
+    assert len(fresh) == 12 and "ghost" not in fresh
+    assert [fresh.query(v, top_k=1)[0][0] for v in vecs] == ids